@@ -1,14 +1,57 @@
-from django.contrib import admin
-from django.contrib.admin import ModelAdmin
+import io
+
+from django.contrib import admin, messages
+from django.contrib.admin import ModelAdmin, helpers
+from django.core.exceptions import PermissionDenied
 from django.db.models import ImageField
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils.html import format_html
 
-from . import utils
-from .models import Booking, Room, User
+from . import exports, images, pricing, search, utils
+from .forms import BookingImportForm, RollupDashboardForm, RoomRepriceForm
+from .imports import BookingImporter, detect_format, read_rows
+from .models import ArchivedBooking, Booking, DailyRollup, NotificationOutbox, Room, SearchDocument, User
+from .rollups import dashboard
+
+
+class SearchDocumentMixin:
+    """
+    Answer the changelist search box from the indexed search documents instead of ``icontains`` on each field.
+
+    Attributes:
+        search_kind (str): The ``SearchDocument`` kind of the admin's model.
+    """
+
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        return search.filter_queryset(queryset, self.search_kind, search_term), False
+
+
+class BookingExportMixin:
+    """
+    Admin actions streaming the selected bookings, live or archived, as a file.
+
+    Attributes:
+        export_chunk_size (int): Rows fetched from the database at a time.
+    """
+
+    actions = ("export_csv", "export_jsonl")
+    export_chunk_size = 2000
+
+    @admin.action(description="Export selected bookings as CSV", permissions=["view"])
+    def export_csv(self, request, queryset):
+        return exports.export_response(request, queryset, "csv", self.export_chunk_size)
+
+    @admin.action(description="Export selected bookings as JSON Lines", permissions=["view"])
+    def export_jsonl(self, request, queryset):
+        return exports.export_response(request, queryset, "jsonl", self.export_chunk_size)
 
 
 @admin.register(Room)
-class RoomAdmin(ModelAdmin):
+class RoomAdmin(SearchDocumentMixin, ModelAdmin):
     """
     Customizes the admin interface for the Room model.
 
@@ -16,40 +59,87 @@ class RoomAdmin(ModelAdmin):
         list_display (tuple): Specifies the fields to display in the admin list view.
         list_filter (tuple): Specifies the fields to use for filtering in the admin list view.
         search_fields (tuple): Specifies the fields to search for in the admin list view.
+        search_kind (str): The search documents that answer the search box, built from those fields.
+        actions (tuple): Bulk actions, each a single ``UPDATE`` however many rooms are selected.
+
+    Methods:
+        open_rooms(request, queryset): Makes the selected rooms available for booking.
+        close_rooms(request, queryset): Takes the selected rooms off sale.
+        reprice(request, queryset): Asks for a price change, then applies it to the selected rooms.
     """
 
     list_display = ("name", "room_number", "room_type", "price_per_night", "is_available", "display_image")
     list_filter = ("room_type", "is_available")
-    search_fields = ("room_number",)
+    search_fields = ("name", "room_number", "room_type", "description")
+    search_kind = SearchDocument.ROOM
     formfield_overrides = {
         ImageField: {"widget": utils.ImagePreviewAdminWidget},
     }
     list_per_page = 5
+    actions = ("open_rooms", "close_rooms", "reprice")
+
+    @admin.action(description="Open selected rooms for booking", permissions=["change"])
+    def open_rooms(self, request, queryset):
+        changed = pricing.set_availability(queryset, True)
+        self.message_user(request, f"{changed} rooms opened.", messages.SUCCESS)
+
+    @admin.action(description="Close selected rooms", permissions=["change"])
+    def close_rooms(self, request, queryset):
+        changed = pricing.set_availability(queryset, False)
+        self.message_user(request, f"{changed} rooms closed.", messages.SUCCESS)
+
+    @admin.action(description="Change the price of selected rooms", permissions=["change"])
+    def reprice(self, request, queryset):
+        form = RoomRepriceForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            change = {form.cleaned_data["change"]: form.cleaned_data["value"]}
+            room_ids = pricing.reprice_rooms(queryset, **change)
+            repriced = pricing.recompute_totals(room_ids) if form.cleaned_data["update_bookings"] else 0
+            self.message_user(request, f"{len(room_ids)} rooms and {repriced} bookings repriced.", messages.SUCCESS)
+            return None
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Change room prices",
+            "form": form,
+            "rooms": queryset.count(),
+            "selected": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            "select_across": request.POST.get("select_across", "0"),
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, "admin/apps/room/reprice.html", context)
 
     @staticmethod
     def display_image(obj):
         if obj.image:
             return format_html(
-                f'<img src="{obj.image.url}" width="200" height="150" style="border-radius: 5px;">'
+                '<img src="{}" width="200" height="150" style="border-radius: 5px; object-fit: cover;" loading="lazy">',
+                images.thumbnail_url(obj.image.name, 200),
             )
         else:
             return "No image available"
 
 
 @admin.register(Booking)
-class BookingAdmin(ModelAdmin):
+class BookingAdmin(BookingExportMixin, SearchDocumentMixin, ModelAdmin):
     """
     Customizes the admin interface for the Booking model.
 
     Attributes:
         list_display (tuple): Fields displayed in the admin list view.
         list_filter (tuple): Fields available for filtering in the admin list view.
+        list_select_related (tuple): Relations joined into the changelist query.
         search_fields (tuple): Fields available for searching in the admin list view.
+        search_kind (str): The search documents that answer the search box, built from those fields.
         readonly_fields (tuple): Fields that are read-only in the admin interface.
 
     Methods:
+        get_urls(): Adds the bulk import view to the booking admin URLs.
+        add_view(request, form_url="", extra_context=None): Redirects to the import, the one way to add bookings.
+        import_view(request): Uploads a CSV or JSON file of bookings and reports the outcome.
         get_user_full_name(obj): Returns the full name of the user associated with the booking.
-        has_add_permission(request): Determines if the user has permission to add a new booking.
+        has_add_permission(request): Determines if the user may add bookings, that is import them.
         has_change_permission(request, obj=None): Determines if the user has permission to change a booking.
         has_delete_permission(request, obj=None): Determines if the user has permission to delete a booking.
     """
@@ -63,7 +153,17 @@ class BookingAdmin(ModelAdmin):
         "created_at",
     )
     list_filter = ("check_in", "check_out")
-    search_fields = ("user__username", "room__room_number", "room__hotel__name")
+    ordering = ("-check_in",)
+    list_select_related = ("user", "room")
+    search_fields = (
+        "user__first_name",
+        "user__last_name",
+        "user__username",
+        "user__email",
+        "room__room_number",
+        "room__name",
+    )
+    search_kind = SearchDocument.BOOKING
     readonly_fields = (
         "user",
         "room",
@@ -73,13 +173,54 @@ class BookingAdmin(ModelAdmin):
         "created_at",
     )
 
+    change_list_template = "admin/apps/booking/change_list.html"
+    import_errors_shown = 100
+
+    def get_urls(self):
+        return [
+            path("import/", self.admin_site.admin_view(self.import_view), name="apps_booking_import"),
+        ] + super().get_urls()
+
+    def add_view(self, request, form_url="", extra_context=None):
+        # Bookings are added by importing them, which runs the overlap checks the add form would skip.
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        return HttpResponseRedirect(reverse("admin:apps_booking_import"))
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        report = None
+        form = BookingImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+            importer = BookingImporter(dry_run=form.cleaned_data["dry_run"])
+            try:
+                report = importer.run(read_rows(stream, form.cleaned_data["format"] or detect_format(upload.name)))
+            except (UnicodeDecodeError, ValueError) as e:
+                messages.error(request, f"Could not read {upload.name}: {e}")
+            else:
+                level = messages.WARNING if report.errors else messages.SUCCESS
+                messages.add_message(request, level, str(report))
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Import bookings",
+            "form": form,
+            "report": report,
+            "errors": report.errors[: self.import_errors_shown] if report else [],
+        }
+        return TemplateResponse(request, "admin/apps/booking/import.html", context)
+
     def get_user_full_name(self, obj):
-        return obj.user.full_name
+        return obj.user.full_name if obj.user else "-"
 
     get_user_full_name.short_description = "User Full Name"
 
     def has_add_permission(self, request):
-        return False
+        return request.user.has_perm("apps.add_booking")
 
     def has_change_permission(self, request, obj=None):
         return True
@@ -88,14 +229,53 @@ class BookingAdmin(ModelAdmin):
         return False
 
 
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(BookingExportMixin, ModelAdmin):
+    """
+    Read-only view of the bookings moved out of ``Booking`` by ``archive_bookings``.
+
+    The archive grows without bound, so searches match room numbers and
+    usernames exactly, which the unique indexes answer, and the changelist
+    skips counting every archived row.
+
+    Attributes:
+        list_display (tuple): Fields displayed in the admin list view.
+        list_filter (tuple): Fields available for filtering in the admin list view.
+        list_select_related (tuple): Relations joined into the changelist query.
+        search_fields (tuple): Fields matched exactly against the search term.
+    """
+
+    list_display = ("id", "get_user_full_name", "room", "check_in", "check_out", "total_price", "archived_at")
+    list_filter = ("check_in",)
+    ordering = ("-check_in",)
+    list_select_related = ("user", "room")
+    search_fields = ("=room__room_number", "=user__username")
+    show_full_result_count = False
+
+    def get_user_full_name(self, obj):
+        return obj.user.full_name if obj.user else "-"
+
+    get_user_full_name.short_description = "User Full Name"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(User)
-class UserAdmin(ModelAdmin):
+class UserAdmin(SearchDocumentMixin, ModelAdmin):
     """
     Customizes the User admin interface with specific display, search, and exclusion settings.
 
     Attributes:
         list_display (tuple): Fields to display in the admin list view.
         search_fields (tuple): Fields to enable search functionality in the admin.
+        search_kind (str): The search documents that answer the search box, built from those fields.
         exclude (tuple): Fields to exclude from the admin interface.
 
     Methods:
@@ -107,7 +287,9 @@ class UserAdmin(ModelAdmin):
         "last_name",
         "email",
     )
-    search_fields = ("first_name", "email")
+    search_fields = ("first_name", "last_name", "username", "email", "phone")
+    search_kind = SearchDocument.USER
+    ordering = ("-date_joined",)
     exclude = (
         "last_login",
         "date_joined",
@@ -123,3 +305,72 @@ class UserAdmin(ModelAdmin):
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         return queryset.filter(is_superuser=False)
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(ModelAdmin):
+    """
+    Read-only view of queued Telegram notifications.
+
+    Attributes:
+        list_display (tuple): Fields displayed in the admin list view.
+        list_filter (tuple): Fields available for filtering in the admin list view.
+    """
+
+    list_display = ("chat_id", "status", "attempts", "next_attempt_at", "sent_at", "created_at")
+    list_filter = ("status",)
+    readonly_fields = (
+        "chat_id",
+        "message",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "last_error",
+        "sent_at",
+        "created_at",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(ModelAdmin):
+    """
+    Occupancy and revenue dashboard in place of a changelist.
+
+    Registered on ``DailyRollup`` for its menu entry, but the figures come
+    from ``RoomTypeRollup`` (see ``apps.rollups.dashboard``), at most one row
+    per room type and day, plus a count of rooms. A year of charts therefore
+    costs the same few queries however many bookings or rooms exist.
+
+    Methods:
+        changelist_view(request, extra_context=None): Renders the dashboard for the selected dates and room type.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        form = RollupDashboardForm(request.GET)
+        figures = None
+        if form.is_valid():
+            figures = dashboard(form.cleaned_data["start"], form.cleaned_data["end"], form.cleaned_data["room_type"])
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Occupancy and revenue",
+            "form": form,
+            "figures": figures,
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, "admin/apps/dailyrollup/dashboard.html", context)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,91 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from apps import search
+from apps.models import ArchivedBooking, Booking, SearchDocument
+
+FIELDS = ("id", "user_id", "room_id", "check_in", "check_out", "total_price", "created_at")
+
+_archiving = ContextVar("archiving", default=False)
+
+
+@contextmanager
+def archiving():
+    """
+    Mark the bookings deleted inside as archived rather than cancelled.
+
+    The ``post_delete`` handlers in ``apps.signals`` check ``is_archiving()``
+    and leave the calendars, rollups and search documents to the caller.
+    """
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def is_archiving():
+    return _archiving.get()
+
+
+class ArchiveReport:
+    """
+    Outcome of an archive run.
+
+    Attributes:
+        archived (int): Bookings moved to the archive, or that would be with a dry run.
+        batches (int): Transactions committed.
+        seconds (float): Wall time of the run.
+    """
+
+    def __init__(self):
+        self.archived = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return f"{self.archived} bookings archived in {self.batches} batches in {self.seconds:.1f}s"
+
+
+def archive_bookings(before, batch_size=1000, limit=None, dry_run=False, progress=None):
+    """
+    Move the bookings that checked out before ``before`` to ``ArchivedBooking``.
+
+    Each batch is read in primary key order, copied and deleted in its own
+    transaction, so an interrupted run keeps what it moved and the next run
+    carries on with the rest. The calendars and rollups keep the archived
+    stays: they are deleted inside ``archiving()``, which stops the signals
+    that would take them out.
+    ``progress(report)`` is called after every batch.
+    """
+    report = ArchiveReport()
+    started = time.perf_counter()
+    candidates = Booking.objects.filter(check_out__lt=before).order_by("pk")
+    last = 0
+    while limit is None or report.archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - report.archived)
+        with transaction.atomic():
+            rows = list(candidates.select_for_update().filter(pk__gt=last).values_list(*FIELDS)[:size])
+            if not rows:
+                break
+            if not dry_run:
+                archive_rows(rows)
+        last = rows[-1][0]
+        report.archived += len(rows)
+        report.batches += 1
+        if progress:
+            progress(report)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def archive_rows(rows):
+    """Copy ``FIELDS`` rows of ``Booking`` to the archive and delete them; call inside a transaction."""
+    ArchivedBooking.objects.bulk_create(ArchivedBooking(**dict(zip(FIELDS, row))) for row in rows)
+    ids = [row[0] for row in rows]
+    with archiving():
+        Booking.objects.filter(pk__in=ids).delete()
+    search.unindex(SearchDocument.BOOKING, ids)
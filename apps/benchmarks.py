@@ -0,0 +1,377 @@
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import django
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.utils import timezone
+
+from apps import notifications, seeding
+from apps.models import Booking, NotificationOutbox, Room, User
+from apps.occupancy import rebuild_calendars
+from apps.rollups import rebuild_rollups
+
+# (users, rooms, bookings) each scale grows the benchmark database to.
+SCALES = {
+    "small": (100, 50, 1000),
+    "medium": (1000, 500, 20000),
+    "large": (10000, 5000, 200000),
+}
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+# Benchmark bookings start long after every seeded stay so they never overlap one.
+BOOKING_EPOCH = datetime(2100, 1, 1, 14)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(latencies):
+    """Mean and p50/p95/p99 of latencies in milliseconds."""
+    return {
+        "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "p50": round(percentile(latencies, 0.50), 2),
+        "p95": round(percentile(latencies, 0.95), 2),
+        "p99": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def reservation_time(slot, rng):
+    """A ``reservationtime`` form value in the ``slot``-th free week after ``BOOKING_EPOCH``."""
+    check_in = BOOKING_EPOCH + timedelta(days=8 * slot)
+    check_out = check_in + timedelta(days=rng.randint(1, 7), hours=-2)
+    return f"{check_in:%m/%d/%Y %I:%M %p} - {check_out:%m/%d/%Y %I:%M %p}"
+
+
+def environment():
+    """Describe what produced a result so runs from different commits can be compared."""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "revision": revision,
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """
+    Run the block against a throwaway test database, never the configured one.
+
+    SQLite gets a file database instead of the in-memory default so the load
+    test's server threads can share it.
+    """
+    old_name = connection.settings_dict["NAME"]
+    if connection.vendor == "sqlite" and not connection.settings_dict["TEST"].get("NAME"):
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), "benchmarks.sqlite3")
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def grow_to(users, rooms, bookings, seed=0, batch_size=5000):
+    """
+    Seed rows until the database holds at least the given counts; returns the row counts.
+
+    Rooms point at the images already in ``SEED_IMAGES_DIR`` rather than
+    storing copies.
+    """
+    missing = users - User.objects.count()
+    if missing > 0:
+        first_number = (User.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        list(seeding.run_tasks(seeding.user_tasks(seed, first_number, missing, "!", batch_size)))
+
+    missing = rooms - Room.objects.count()
+    if missing > 0:
+        first_number = Room.objects.count() + 1
+        folder = os.path.relpath(settings.SEED_IMAGES_DIR, settings.MEDIA_ROOT)
+        image_names = [f"{folder}/{name}" for name in seeding.source_images(settings.SEED_IMAGES_DIR)]
+        list(seeding.run_tasks(seeding.room_tasks(seed, first_number, missing, image_names, batch_size)))
+
+    missing = bookings - Booking.objects.count()
+    if missing > 0:
+        start = timezone.localdate() - timedelta(days=365)
+        seeded = Booking.objects.filter(check_out__lt=timezone.make_aware(BOOKING_EPOCH))
+        last_stays = dict(seeded.values("room_id").annotate(last=Max("check_out")).values_list("room_id", "last"))
+        schedules = [
+            (room_id, price, last_stays[room_id].date() + timedelta(days=1) if room_id in last_stays else start)
+            for room_id, price in Room.objects.order_by("id").values_list("id", "price_per_night")
+        ]
+        tasks = seeding.booking_tasks(seed, schedules, missing, batch_size)
+        user_ids = list(User.objects.filter(is_superuser=False).values_list("id", flat=True))
+        list(seeding.run_tasks(tasks, user_ids=user_ids))
+        rebuild_calendars()
+        rebuild_rollups()
+
+    return {"users": User.objects.count(), "rooms": Room.objects.count(), "bookings": Booking.objects.count()}
+
+
+def measure(client, method, url, data=None, repeat=50):
+    """
+    Time ``repeat`` requests after one warm-up request.
+
+    ``data`` may be a callable taking the iteration number, for requests
+    that must differ every time. Query counts come from the
+    ``X-DB-Query-Count`` header set by ``QueryCountMiddleware``.
+    """
+    latencies, queries, statuses = [], [], set()
+    first_ms = None
+    for iteration in range(repeat + 1):
+        payload = data(iteration) if callable(data) else data
+        started = time.perf_counter()
+        response = getattr(client, method)(url, payload)
+        elapsed = (time.perf_counter() - started) * 1000
+        statuses.add(response.status_code)
+        if first_ms is None:
+            first_ms = round(elapsed, 2)
+            continue
+        latencies.append(elapsed)
+        queries.append(int(response["X-DB-Query-Count"]))
+    return {
+        "status": sorted(statuses),
+        "first_ms": first_ms,
+        "latency_ms": summarize(latencies),
+        "queries": {"min": min(queries), "max": max(queries), "mean": round(statistics.fmean(queries), 2)},
+    }
+
+
+def run_endpoints(repeat=50, seed=0, slots=None):
+    """Measure the public pages, booking GET/POST and the admin changelists at the current scale."""
+    rng = random.Random(seed)
+    slots = slots or itertools.count()
+    user_ids = list(User.objects.filter(is_superuser=False).values_list("id", flat=True)[:1000])
+    room_ids = list(Room.objects.values_list("id", flat=True)[:1000])
+    admin = User.objects.filter(username="benchmark-admin").first() or User.objects.create_superuser(
+        username="benchmark-admin", password="!", email="admin@example.com"
+    )
+
+    public, staff = Client(), Client()
+    staff.force_login(admin)
+
+    def booking(iteration):
+        return {
+            "user_id": rng.choice(user_ids),
+            "room_id": rng.choice(room_ids),
+            "reservationtime": reservation_time(next(slots), rng),
+        }
+
+    cache.clear()
+    return {
+        "index": measure(public, "get", "/", repeat=repeat),
+        "booking_get": measure(public, "get", "/booking/", repeat=repeat),
+        "booking_get_room": measure(public, "get", f"/booking/?room_id={room_ids[0]}", repeat=repeat),
+        "booking_post": measure(public, "post", "/booking/", booking, repeat=repeat),
+        "admin_rooms": measure(staff, "get", "/admin/apps/room/", repeat=repeat),
+        "admin_bookings": measure(staff, "get", "/admin/apps/booking/", repeat=repeat),
+        "admin_users": measure(staff, "get", "/admin/apps/user/", repeat=repeat),
+    }
+
+
+class TelegramStub:
+    """
+    Local stand-in for the Telegram ``sendMessage`` endpoint.
+
+    While active, ``apps.notifications`` posts to it instead of Telegram and
+    every configured chat id is replaced by ``chat_ids``.
+
+    Attributes:
+        delay (float): Seconds each response is held back, to mimic network latency.
+        received (int): Messages accepted so far.
+    """
+
+    def __init__(self, delay=0.0, chat_ids="1 2"):
+        self.delay = delay
+        self.chat_ids = chat_ids
+        self.received = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if stub.delay:
+                    time.sleep(stub.delay)
+                with stub._lock:
+                    stub.received += 1
+                body = b'{"ok":true,"result":{}}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._previous = notifications.TELEGRAM_API_URL, os.environ.get("TELEGRAM_USER_IDS")
+        notifications.TELEGRAM_API_URL = f"http://127.0.0.1:{self.server.server_port}/bot{{token}}/sendMessage"
+        os.environ["TELEGRAM_USER_IDS"] = self.chat_ids
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        notifications.TELEGRAM_API_URL, chat_ids = self._previous
+        if chat_ids is None:
+            os.environ.pop("TELEGRAM_USER_IDS", None)
+        else:
+            os.environ["TELEGRAM_USER_IDS"] = chat_ids
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def live_server():
+    """Serve the WSGI application from a thread on a free local port; yields its base URL."""
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietRequestHandler, allow_reuse_address=False)
+    server.set_app(get_internal_wsgi_application())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def booking_load(url, jobs, concurrency):
+    """
+    POST every job to ``<url>/booking/`` from ``concurrency`` clients at once.
+
+    Each client thread keeps one session and fetches a CSRF token once.
+    Returns the report with throughput, latency percentiles of the bookings
+    made, rejected reservations (``conflicts``, HTTP 409) and other errors.
+    """
+    booking_url = f"{url.rstrip('/')}/booking/"
+    local = threading.local()
+
+    def post(job):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+            page = session.get(booking_url, timeout=30)
+            session.csrf_token = CSRF_INPUT.search(page.text).group(1)
+        began = time.perf_counter()
+        try:
+            response = session.post(
+                booking_url, data=dict(job, csrfmiddlewaretoken=session.csrf_token), allow_redirects=False, timeout=30
+            )
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        return status, time.perf_counter() - began
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(post, jobs))
+    elapsed = time.perf_counter() - began
+
+    return {
+        "url": booking_url,
+        "requests": len(results),
+        "concurrency": concurrency,
+        "conflicts": sum(1 for status, _ in results if status == 409),
+        "errors": sum(1 for status, _ in results if status not in (302, 409)),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(results) / elapsed, 1),
+        "latency_ms": summarize([latency * 1000 for status, latency in results if status == 302]),
+    }
+
+
+def booking_jobs(count, seed=0, slots=None, rooms=1000):
+    """
+    Booking form posts spread over the first ``rooms`` rooms.
+
+    Every job gets its own week, so jobs never overlap each other and
+    ``rooms=1`` measures pure contention on a single room lock.
+    """
+    rng = random.Random(seed)
+    slots = slots or itertools.count()
+    user_ids = list(User.objects.filter(is_superuser=False).values_list("id", flat=True)[:1000])
+    room_ids = list(Room.objects.order_by("id").values_list("id", flat=True)[:rooms])
+    return [
+        {
+            "user_id": rng.choice(user_ids),
+            "room_id": rng.choice(room_ids),
+            "reservationtime": reservation_time(next(slots), rng),
+            "idempotency_key": f"{rng.getrandbits(128):032x}",
+        }
+        for _ in range(count)
+    ]
+
+
+def run_load(requests_count=500, concurrency=20, seed=0, slots=None, telegram_delay=0.05):
+    """Drive concurrent booking POSTs through a live server, then deliver the notifications to a Telegram stub."""
+    NotificationOutbox.objects.all().delete()
+    jobs = booking_jobs(requests_count, seed=seed, slots=slots)
+    with TelegramStub(delay=telegram_delay) as stub, live_server() as url:
+        report = booking_load(url, jobs, concurrency)
+
+        began = time.perf_counter()
+        sent = failed = 0
+        while True:
+            batch_sent, retried, batch_failed = notifications.drain_outbox(batch_size=100, workers=8)
+            sent, failed = sent + batch_sent, failed + batch_failed
+            if not (batch_sent or retried or batch_failed):
+                break
+        elapsed = time.perf_counter() - began
+        report["notifications"] = {
+            "sent": sent,
+            "failed": failed,
+            "received_by_stub": stub.received,
+            "seconds": round(elapsed, 3),
+            "per_second": round(sent / elapsed, 1) if elapsed else 0.0,
+        }
+    return report
+
+
+def compare(baseline, current):
+    """Yield ``(scale, endpoint, old, new)`` for every endpoint measured in both result files."""
+    for scale, result in current.get("scales", {}).items():
+        old_endpoints = baseline.get("scales", {}).get(scale, {}).get("endpoints", {})
+        for endpoint, new in result["endpoints"].items():
+            if endpoint in old_endpoints:
+                yield scale, endpoint, old_endpoints[endpoint], new
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template import engines
+from django.templatetags.static import static
+
+BUNDLE_DIR = "bundles"
+MANIFEST_NAME = f"{BUNDLE_DIR}/manifest.json"
+
+BUNDLE_BLOCK = re.compile(r"{%\s*bundle\s+[\"']([^\"']+)[\"']\s*%}(.*?){%\s*endbundle\s*%}", re.S)
+STATIC_REFERENCE = re.compile(r"{%\s*static\s+[\"']([^\"']+)[\"']\s*%}")
+HTML_COMMENT = re.compile(r"<!--.*?-->", re.S)
+CSS_URL = re.compile(r"url\(\s*([\"']?)(?!data:|https?:|//|/|#)([^\"')]+)\1\s*\)")
+CSS_STRING = r"\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'"
+# Strings and /*! licence comments are matched first, so "/*" in a string or a quote in a comment is left alone.
+CSS_COMMENT = re.compile(rf"({CSS_STRING}|/\*!.*?\*/)|/\*.*?\*/", re.S)
+CSS_VERBATIM = re.compile(rf"({CSS_STRING}|/\*!.*?\*/)", re.S)
+CSS_CHARSET = re.compile(r"@charset\s+[^;]+;\s*", re.I)
+CSS_IMPORT = re.compile(r"@import\s+[^;]+;", re.I)
+
+
+class BundleError(Exception):
+    pass
+
+
+def template_sources():
+    """Yield ``(path, source)`` for every HTML template the Django engines can load."""
+    seen = set()
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    if filename.endswith(".html") and path not in seen:
+                        seen.add(path)
+                        with open(path, encoding="utf-8") as f:
+                            yield path, f.read()
+
+
+def collect_bundles():
+    """Return ``{bundle_name: [static paths]}`` from the ``{% bundle %}`` blocks of all templates."""
+    bundles = {}
+    for path, source in template_sources():
+        for name, body in BUNDLE_BLOCK.findall(source):
+            assets = [asset.strip().lstrip("/") for asset in STATIC_REFERENCE.findall(HTML_COMMENT.sub("", body))]
+            if name in bundles and bundles[name] != assets:
+                raise BundleError(f"Bundle {name!r} is declared with different assets in {path}")
+            bundles[name] = assets
+    return bundles
+
+
+def find_asset(path):
+    """Locate a static path in ``STATIC_ROOT`` or through the staticfiles finders."""
+    candidate = os.path.join(settings.STATIC_ROOT, path)
+    if os.path.isfile(candidate):
+        return candidate
+    found = finders.find(path)
+    if not found:
+        raise BundleError(f"Static file {path!r} not found")
+    return found
+
+
+def minified_source(path):
+    """Prefer a ``.min`` sibling shipped by the plugin over the unminified file."""
+    root, extension = os.path.splitext(path)
+    if not root.endswith(".min"):
+        try:
+            return find_asset(f"{root}.min{extension}")
+        except BundleError:
+            pass
+    return find_asset(path)
+
+
+def rebase_css_urls(css, path):
+    """Point relative ``url()`` references at their original location under ``STATIC_URL``."""
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        quote, reference = match.groups()
+        path, suffix = re.match(r"([^?#]*)(.*)", reference).groups()
+        url = static(posixpath.normpath(posixpath.join(directory, path)))
+        return f"url({quote}{url}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, css)
+
+
+def minify_css(css):
+    """
+    Drop comments and collapse whitespace.
+
+    Strings, such as ``content: "a  b"`` or a quoted ``url()``, and ``/*!``
+    licence comments are copied unchanged.
+    """
+    css = CSS_COMMENT.sub(lambda match: match.group(1) or "", css)
+    parts = CSS_VERBATIM.split(css)
+    for i in range(0, len(parts), 2):
+        code = re.sub(r"\s+", " ", parts[i])
+        parts[i] = re.sub(r"\s*([{};,>])\s*", r"\1", code).replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def build_css(assets):
+    imports, parts = [], []
+    for asset in assets:
+        filename = minified_source(asset)
+        with open(filename, encoding="utf-8") as f:
+            css = rebase_css_urls(f.read(), asset)
+        css = CSS_CHARSET.sub("", css)
+        imports.extend(CSS_IMPORT.findall(css))
+        parts.append(minify_css(CSS_IMPORT.sub("", css)))
+    return '@charset "UTF-8";' + "".join(imports) + "\n".join(parts)
+
+
+def build_js(assets):
+    parts = []
+    for asset in assets:
+        filename = minified_source(asset)
+        with open(filename, encoding="utf-8") as f:
+            source = f.read()
+        # Drop source map comments, they point at paths relative to the original file.
+        source = re.sub(r"^//# sourceMappingURL=.*$", "", source, flags=re.M)
+        parts.append(source.strip())
+    return ";\n".join(parts) + ";\n"
+
+
+def write_bundle(name, content):
+    """Write a content-hashed bundle plus ``.gz`` (and ``.br`` if brotli is installed) siblings."""
+    data = content.encode("utf-8")
+    stem, extension = os.path.splitext(name)
+    relative = f"{BUNDLE_DIR}/{stem}.{hashlib.md5(data, usedforsecurity=False).hexdigest()[:12]}{extension}"
+    path = os.path.join(settings.STATIC_ROOT, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "wb") as f:
+        f.write(data)
+    with open(f"{path}.gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        with open(f"{path}.br", "wb") as f:
+            f.write(brotli.compress(data))
+    return relative
+
+
+def build(names=None):
+    """Build every declared bundle (or ``names``) and write the manifest; returns it."""
+    declared = collect_bundles()
+    read_manifest.cache_clear()
+    manifest = dict(read_manifest()) if names else {}
+    for name, assets in declared.items():
+        if names and name not in names:
+            continue
+        if name.endswith(".css"):
+            content = build_css(assets)
+        elif name.endswith(".js"):
+            content = build_js(assets)
+        else:
+            raise BundleError(f"Bundle {name!r} must end in .css or .js")
+        manifest[name] = write_bundle(name, content)
+
+    with open(os.path.join(settings.STATIC_ROOT, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    read_manifest.cache_clear()
+    return manifest
+
+
+def prune(manifest):
+    """Delete built bundles (and their compressed siblings) the manifest no longer references."""
+    directory = os.path.join(settings.STATIC_ROOT, BUNDLE_DIR)
+    current = {os.path.basename(path) for path in manifest.values()}
+    removed = []
+    for filename in os.listdir(directory):
+        base = re.sub(r"\.(gz|br)$", "", filename)
+        if filename != os.path.basename(MANIFEST_NAME) and base not in current:
+            os.remove(os.path.join(directory, filename))
+            removed.append(filename)
+    return removed
+
+
+@lru_cache(maxsize=1)
+def read_manifest():
+    """Return the bundle manifest, read once per process."""
+    try:
+        with open(os.path.join(settings.STATIC_ROOT, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def bundle_url(name):
+    """Return the URL of a built bundle, or None to fall back to the individual assets."""
+    if not getattr(settings, "STATIC_BUNDLES", False):
+        return None
+    relative = read_manifest().get(name)
+    return static(relative) if relative else None
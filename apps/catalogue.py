@@ -0,0 +1,80 @@
+import os
+import time
+
+from django.core.cache import cache, caches
+from django.template.loader import render_to_string
+
+from apps.models import Room
+
+VERSION_KEY = "catalogue:version"
+HITS_KEY = "catalogue:hits"
+MISSES_KEY = "catalogue:misses"
+TIMEOUT = 60 * 60 * 24
+ROOM_GRID_TEMPLATE = "room_grid.html"
+
+
+def get_version():
+    """
+    Return the current catalogue version, starting a new one if it was evicted.
+
+    The version lives in the ``shared`` cache, so a room saved in one worker
+    process invalidates the entries cached by every other one.
+    """
+    shared = caches["shared"]
+    version = shared.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not shared.add(VERSION_KEY, version, timeout=None):
+            version = shared.get(VERSION_KEY, version)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached catalogue entry; called when a room changes."""
+    caches["shared"].set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def _cached(name, build):
+    key = f"catalogue:{get_version()}:{name}"
+    value = cache.get(key)
+    if value is None:
+        _count(MISSES_KEY)
+        value = build()
+        cache.set(key, value, timeout=TIMEOUT)
+    else:
+        _count(HITS_KEY)
+    return value
+
+
+def get_rooms():
+    """Return all rooms, newest first, from the cache when possible."""
+    return _cached("rooms", lambda: list(Room.objects.order_by("-created_at")))
+
+
+def get_room_grid():
+    """Return the rendered room grid of the landing page from the cache when possible."""
+    return _cached("room_grid", lambda: render_to_string(ROOM_GRID_TEMPLATE, {"rooms": get_rooms()}))
+
+
+def get_stats():
+    """
+    Return the catalogue version and its hit/miss counters.
+
+    The counters are kept in the default cache next to the entries they
+    count. With the default per-process ``locmem`` backend they only cover
+    the worker process that answers, which is reported as ``pid``.
+    """
+    return {
+        "version": get_version(),
+        "hits": cache.get(HITS_KEY, 0),
+        "misses": cache.get(MISSES_KEY, 0),
+        "pid": os.getpid(),
+    }
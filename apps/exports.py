@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+import os
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+# Rows are written out in pieces of about this many characters.
+WRITE_SIZE = 64 * 1024
+
+# The names match what ``import_bookings`` reads, so an export can be imported again.
+HEADER = (
+    "id",
+    "user_id",
+    "user_full_name",
+    "room_id",
+    "room_number",
+    "check_in",
+    "check_out",
+    "total_price",
+    "created_at",
+)
+FIELDS = (
+    "id",
+    "user_id",
+    "user__first_name",
+    "user__last_name",
+    "room_id",
+    "room__room_number",
+    "check_in",
+    "check_out",
+    "total_price",
+    "created_at",
+)
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    if extension in ("json", "jsonl", "ndjson"):
+        return "jsonl"
+    return "csv"
+
+
+def _fetch(queryset, fields, chunk_size):
+    """
+    Yield ``values_list`` rows of ``queryset`` in primary key order, ``chunk_size`` at a time.
+
+    Rows are read through ``iterator()``, a server-side cursor where the
+    database has one. Behind a pooler that cannot keep cursors open
+    (``DISABLE_SERVER_SIDE_CURSORS``), the driver would buffer the whole
+    result, so pages are read by primary key instead.
+    """
+    rows = queryset.order_by("pk").values_list(*fields)
+    if not connections[rows.db].settings_dict.get("DISABLE_SERVER_SIDE_CURSORS"):
+        yield from rows.iterator(chunk_size=chunk_size)
+        return
+    last = None
+    while True:
+        page = list((rows if last is None else rows.filter(pk__gt=last))[:chunk_size])
+        yield from page
+        if len(page) < chunk_size:
+            return
+        last = page[-1][0]
+
+
+def booking_rows(queryset, chunk_size=2000):
+    """
+    Yield one tuple per booking in ``queryset``, with the values of ``HEADER``.
+
+    Only the exported columns are selected, joined from the user and room
+    tables in the same query. Timestamps are ISO 8601 in the current time
+    zone and prices are decimal strings.
+    """
+    tz = timezone.get_current_timezone()
+    for pk, user_id, first_name, last_name, room_id, room_number, check_in, check_out, price, created in _fetch(
+        queryset, FIELDS, chunk_size
+    ):
+        yield (
+            pk,
+            user_id,
+            f"{first_name} {last_name}" if user_id else "",
+            room_id,
+            room_number or "",
+            check_in.astimezone(tz).isoformat(),
+            check_out.astimezone(tz).isoformat(),
+            "" if price is None else str(price),
+            created.astimezone(tz).isoformat(),
+        )
+
+
+def write_chunks(rows, format, write_size=WRITE_SIZE):
+    """
+    Serialize rows as CSV with a header line or as JSON Lines, yielding strings of about ``write_size``.
+
+    The CSV header is yielded on its own so a response starts right away.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format {format!r}")
+    buffer = io.StringIO()
+    if format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(HEADER)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        write = writer.writerow
+    else:
+
+        def write(row):
+            buffer.write(json.dumps(dict(zip(HEADER, row)), separators=(",", ":")))
+            buffer.write("\n")
+
+    for row in rows:
+        if buffer.tell() >= write_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        write(row)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def _async_chunks(chunks):
+    # Each chunk is produced in the request's sync thread, where its database connection lives.
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def export_response(request, queryset, format, chunk_size=2000):
+    """
+    Stream the bookings of ``queryset`` as a downloadable file.
+
+    Under ASGI the rows are handed over through an async iterator; Django
+    would otherwise collect a synchronous one into a list before sending it.
+    """
+    chunks = write_chunks(booking_rows(queryset, chunk_size), format)
+    if isinstance(request, ASGIRequest):
+        chunks = _async_chunks(chunks)
+    filename = f"bookings-{timezone.localtime():%Y%m%d-%H%M%S}.{format}"
+    return StreamingHttpResponse(
+        chunks,
+        content_type=f"{CONTENT_TYPES[format]}; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
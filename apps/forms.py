@@ -1,6 +1,9 @@
+from datetime import timedelta
+
 from django import forms
+from django.utils import timezone
 
-from .models import Booking
+from .models import Booking, Room
 
 
 class BookingForm(forms.ModelForm):
@@ -14,3 +17,80 @@ class BookingForm(forms.ModelForm):
     class Meta:
         model = Booking
         fields = ["room", "check_in", "check_out"]
+
+
+class AvailabilitySearchForm(forms.Form):
+    check_in = forms.DateTimeField(
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"})
+    )
+    check_out = forms.DateTimeField(
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"})
+    )
+    room_type = forms.ChoiceField(
+        choices=[("", "Any type")] + Room.ROOM_TYPE_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    min_price = forms.DecimalField(min_value=0, decimal_places=2, required=False)
+    max_price = forms.DecimalField(min_value=0, decimal_places=2, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get("check_in")
+        check_out = cleaned_data.get("check_out")
+        if check_in and check_out and check_out <= check_in:
+            raise forms.ValidationError("Check out must be after check in.")
+        return cleaned_data
+
+    def search(self):
+        """Return the rooms matching the cleaned search parameters."""
+        data = self.cleaned_data
+        rooms = Room.objects.available_between(data["check_in"], data["check_out"])
+        if data.get("room_type"):
+            rooms = rooms.filter(room_type=data["room_type"])
+        if data.get("min_price") is not None:
+            rooms = rooms.filter(price_per_night__gte=data["min_price"])
+        if data.get("max_price") is not None:
+            rooms = rooms.filter(price_per_night__lte=data["max_price"])
+        return rooms.order_by("price_per_night", "id")
+
+
+class BookingImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, a JSON array or JSON Lines.")
+    format = forms.ChoiceField(
+        choices=[("", "From file extension"), ("csv", "CSV"), ("json", "JSON")], required=False
+    )
+    dry_run = forms.BooleanField(required=False, help_text="Validate and report without saving.")
+
+
+class RollupDashboardForm(forms.Form):
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    room_type = forms.ChoiceField(choices=[("", "All room types")] + Room.ROOM_TYPE_CHOICES, required=False)
+
+    max_days = 731
+
+    def clean(self):
+        cleaned_data = super().clean()
+        end = cleaned_data.get("end") or timezone.localdate()
+        start = cleaned_data.get("start") or end - timedelta(days=364)
+        if start > end:
+            raise forms.ValidationError("Start must not be after end.")
+        if (end - start).days >= self.max_days:
+            raise forms.ValidationError(f"Pick at most {self.max_days} days.")
+        cleaned_data["start"], cleaned_data["end"] = start, end
+        return cleaned_data
+
+
+class RoomRepriceForm(forms.Form):
+    change = forms.ChoiceField(choices=[("percent", "Percentage"), ("amount", "Amount per night")])
+    value = forms.DecimalField(max_digits=10, decimal_places=2, help_text="Negative values lower the price.")
+    update_bookings = forms.BooleanField(
+        required=False, initial=True, help_text="Reprice the bookings that have not checked in yet."
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("change") == "percent" and cleaned_data.get("value", 0) <= -100:
+            raise forms.ValidationError("A price cannot drop by 100% or more.")
+        return cleaned_data
@@ -0,0 +1,158 @@
+import logging
+import os
+from base64 import b64encode
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 960)
+PLACEHOLDER_WIDTH = 16
+WEBP_QUALITY = 80
+# How long to remember an image's renditions, and that it has none yet.
+RENDITIONS_TIMEOUT = 60 * 60 * 24
+MISSING_TIMEOUT = 60
+
+_executor = None
+
+
+def derivative_name(name, width):
+    """Return the storage name of the ``width`` pixel WebP rendition of ``name``."""
+    root, _ = os.path.splitext(name)
+    return f"{root}.w{width}.webp"
+
+
+def placeholder_name(name):
+    root, _ = os.path.splitext(name)
+    return f"{root}.placeholder.webp"
+
+
+def render_derivatives(path, force=False):
+    """
+    Write the WebP renditions and the placeholder next to the image at ``path``.
+
+    Runs in worker processes, so it only takes and returns plain paths.
+    Widths larger than the original are skipped rather than upscaled, and a
+    missing original is logged as a warning and renders nothing.
+    """
+    from PIL import Image, ImageOps
+
+    targets = [(width, derivative_name(path, width)) for width in WIDTHS]
+    targets.append((PLACEHOLDER_WIDTH, placeholder_name(path)))
+    if not force and all(os.path.exists(target) for _, target in targets):
+        return []
+
+    written = []
+    try:
+        original = Image.open(path)
+    except FileNotFoundError:
+        logger.warning("Cannot render derivatives of %s: the file does not exist", path)
+        return written
+    with original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for width, target in targets:
+            if width > image.width or (not force and os.path.exists(target)):
+                continue
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            quality = 30 if width == PLACEHOLDER_WIDTH else WEBP_QUALITY
+            resized.save(target, "WEBP", quality=quality, method=4)
+            written.append(target)
+    return written
+
+
+def render_many(paths, workers=None, force=False):
+    """Render derivatives for many images across a process pool, yielding ``(path, written)``."""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render_derivatives, path, force): path for path in paths}
+        for future, path in futures.items():
+            try:
+                yield path, future.result()
+            except (OSError, ValueError) as e:
+                yield path, e
+
+
+def schedule_derivatives(name):
+    """
+    Render derivatives for a freshly uploaded image without blocking the request.
+
+    The work runs on one background thread of the web worker rather than in
+    a process pool, which would fork a process that already runs threads;
+    Pillow releases the GIL while it resizes and encodes. Failures are logged.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-derivatives")
+    future = _executor.submit(render_derivatives, default_storage.path(name))
+    future.add_done_callback(lambda future: _rendered(name, future))
+    return future
+
+
+def _rendered(name, future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Rendering derivatives of %s failed", name, exc_info=error)
+    forget_renditions([name])
+
+
+def _renditions_key(name):
+    return f"images:renditions:{name}"
+
+
+def renditions(name):
+    """
+    Return the widths rendered for ``name`` and its placeholder data URI, from the cache when possible.
+
+    The placeholder is written last, so until it exists the image is served
+    as the original. Found renditions are cached for ``RENDITIONS_TIMEOUT``
+    and missing ones for ``MISSING_TIMEOUT``, so storage is not checked on
+    every render.
+    """
+    key = _renditions_key(name)
+    found = cache.get(key)
+    if found is None:
+        placeholder = placeholder_name(name)
+        if default_storage.exists(placeholder):
+            widths = [width for width in WIDTHS if default_storage.exists(derivative_name(name, width))]
+            with default_storage.open(placeholder, "rb") as f:
+                found = (widths, f"data:image/webp;base64,{b64encode(f.read()).decode()}")
+            cache.set(key, found, timeout=RENDITIONS_TIMEOUT)
+        else:
+            found = ([], "")
+            cache.set(key, found, timeout=MISSING_TIMEOUT)
+    return found
+
+
+def forget_renditions(names):
+    """Drop the cached renditions of ``names`` after they are written or deleted."""
+    cache.delete_many([_renditions_key(name) for name in names])
+
+
+def available_widths(name):
+    return renditions(name)[0]
+
+
+def thumbnail_url(name, width):
+    """Return the URL of the smallest rendition at least ``width`` wide, or of the original."""
+    widths = available_widths(name)
+    for candidate in widths:
+        if candidate >= width:
+            return default_storage.url(derivative_name(name, candidate))
+    if widths:
+        return default_storage.url(derivative_name(name, widths[-1]))
+    return default_storage.url(name)
+
+
+def srcset(name):
+    return ", ".join(
+        f"{default_storage.url(derivative_name(name, width))} {width}w" for width in available_widths(name)
+    )
+
+
+def placeholder_data_uri(name):
+    """Return the tiny placeholder inlined as a data URI, or an empty string."""
+    return renditions(name)[1]
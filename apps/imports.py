@@ -0,0 +1,291 @@
+import bisect
+import csv
+import io
+import itertools
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps import search
+from apps.models import Booking, Room, SearchDocument, User
+from apps.occupancy import mark_stays
+from apps.rollups import add_stays
+
+FORMATS = ("csv", "json")
+READ_SIZE = 64 * 1024
+_total_price = Booking._meta.get_field("total_price")
+# Totals from this on overflow the column, which fails the whole transaction on PostgreSQL.
+MAX_TOTAL_PRICE = 10 ** (_total_price.max_digits - _total_price.decimal_places)
+
+
+class ImportReport:
+    """
+    Outcome of a bulk import.
+
+    Attributes:
+        created (int): Bookings written to the database, or that would be with a dry run.
+        rows (int): Rows read from the file.
+        errors (list): ``(row number, message)`` for every rejected row.
+        seconds (float): Wall time of the import.
+        dry_run (bool): Nothing was written.
+    """
+
+    def __init__(self, dry_run=False):
+        self.created = 0
+        self.rows = 0
+        self.errors = []
+        self.seconds = 0.0
+        self.dry_run = dry_run
+
+    @property
+    def outcome(self):
+        return "would be created" if self.dry_run else "imported"
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.created} of {self.rows} bookings {self.outcome} in {self.seconds:.1f}s "
+            f"({self.rows_per_second:.0f} rows/s), {len(self.errors)} rejected"
+        )
+
+
+def detect_format(filename):
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension in ("json", "jsonl", "ndjson"):
+        return "json"
+    return "csv"
+
+
+def iter_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def iter_json(stream):
+    """
+    Yield objects from a JSON array or from JSON Lines without loading the whole file.
+
+    Array elements are decoded one at a time from a sliding buffer.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(READ_SIZE).lstrip()
+    if not buffer.startswith("["):
+        # Finish the partially read line, then continue line by line.
+        for line in itertools.chain(io.StringIO(buffer + stream.readline()), stream):
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = stream.read(READ_SIZE)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def read_rows(stream, format):
+    """Yield ``(row number, dict)`` from a CSV or JSON text stream."""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown import format {format!r}")
+    rows = iter_csv(stream) if format == "csv" else iter_json(stream)
+    # CSV row 1 is the header, so data starts on line 2.
+    first = 2 if format == "csv" else 1
+    for number, row in enumerate(rows, first):
+        yield number, row
+
+
+def parse_moment(value):
+    """Parse an ISO 8601 date time; naive values are taken in the current time zone."""
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        moment = parse_datetime(str(value).strip())
+        if moment is None:
+            raise ValueError(f"invalid date time {value!r}")
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class BookingImporter:
+    """
+    Validate and insert bookings in batches.
+
+    Each batch resolves its users and rooms in two queries, prices every
+    stay from the prefetched room rate with ``Booking.price_for``, rejects
+    stays that overlap each other or an existing booking, and inserts the
+    rest with one ``bulk_create``. Rooms touched by a batch are locked for
+    its transaction so concurrent bookings cannot slip in between the
+    overlap check and the insert.
+
+    Rows identify the guest by ``user_id`` or ``username``, the room by
+    ``room_id`` or ``room_number``, and carry ISO 8601 ``check_in`` and
+    ``check_out`` values.
+    """
+
+    def __init__(self, batch_size=1000, dry_run=False, progress=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.progress = progress
+
+    def run(self, rows):
+        report = ImportReport(dry_run=self.dry_run)
+        started = time.perf_counter()
+        batch = []
+        for number, row in rows:
+            report.rows += 1
+            if not isinstance(row, dict):
+                report.errors.append((number, "expected an object with booking fields"))
+                continue
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, report)
+                batch = []
+        if batch:
+            self.import_batch(batch, report)
+        report.errors.sort()
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def import_batch(self, batch, report):
+        users = self.resolve(batch, "user_id", "username", User.objects.only("id", "username"))
+        rooms = self.resolve(
+            batch, "room_id", "room_number", Room.objects.only("id", "room_number", "room_type", "price_per_night")
+        )
+
+        stays = []
+        for number, row in batch:
+            try:
+                user = self.lookup(users, row, "user_id", "username", "user")
+                room = self.lookup(rooms, row, "room_id", "room_number", "room")
+                check_in, check_out = parse_moment(row.get("check_in")), parse_moment(row.get("check_out"))
+            except (ValueError, TypeError) as e:
+                report.errors.append((number, str(e)))
+                continue
+            if check_out <= check_in:
+                report.errors.append((number, "check_out must be after check_in"))
+                continue
+            stays.append((number, user, room, check_in, check_out))
+
+        if not stays:
+            return
+
+        with transaction.atomic():
+            room_ids = sorted({room.id for _, _, room, _, _ in stays})
+            list(Room.objects.select_for_update().filter(id__in=room_ids).values_list("id", flat=True))
+            taken = self.existing_stays(room_ids, stays)
+
+            bookings = []
+            for number, user, room, check_in, check_out in sorted(stays, key=lambda stay: (stay[2].id, stay[3])):
+                if self.overlaps(taken[room.id], check_in, check_out):
+                    report.errors.append((number, f"overlaps another booking of room {room.room_number}"))
+                    continue
+                total_price = Booking.price_for(check_in, check_out, room.price_per_night)
+                if abs(total_price) >= MAX_TOTAL_PRICE:
+                    report.errors.append((number, f"total price {total_price} does not fit in a booking"))
+                    continue
+                bisect.insort(taken[room.id], (check_in, check_out))
+                bookings.append(
+                    Booking(user=user, room=room, check_in=check_in, check_out=check_out, total_price=total_price)
+                )
+
+            if not self.dry_run:
+                Booking.objects.bulk_create(bookings)
+                # bulk_create skips the signals that keep the calendars, rollups and search in step.
+                mark_stays((booking.room_id, booking.check_in, booking.check_out) for booking in bookings)
+                add_stays(
+                    (booking.room_id, booking.room.room_type, booking.check_in, booking.check_out, booking.total_price)
+                    for booking in bookings
+                )
+                search.index(SearchDocument.BOOKING, [booking.pk for booking in bookings])
+            report.created += len(bookings)
+
+        if self.progress:
+            self.progress(report)
+
+    @staticmethod
+    def resolve(batch, id_field, key_field, queryset):
+        """Fetch the batch's referenced objects in one query, keyed by ``("id", pk)`` and ``("key", value)``."""
+        ids, keys = set(), set()
+        for _, row in batch:
+            if row.get(id_field) not in (None, ""):
+                try:
+                    ids.add(int(row[id_field]))
+                except (TypeError, ValueError):
+                    pass
+            elif row.get(key_field):
+                keys.add(str(row[key_field]).strip())
+        found = {}
+        if ids:
+            found.update((("id", obj.pk), obj) for obj in queryset.filter(pk__in=ids))
+        if keys:
+            objects = queryset.filter(**{f"{key_field}__in": keys})
+            found.update((("key", getattr(obj, key_field)), obj) for obj in objects)
+        return found
+
+    @staticmethod
+    def lookup(found, row, id_field, key_field, label):
+        if row.get(id_field) not in (None, ""):
+            try:
+                key = ("id", int(row[id_field]))
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid {id_field} {row[id_field]!r}")
+            value = row[id_field]
+        elif row.get(key_field):
+            value = str(row[key_field]).strip()
+            key = ("key", value)
+        else:
+            raise ValueError(f"missing {id_field} or {key_field}")
+        if key not in found:
+            raise ValueError(f"unknown {label} {value!r}")
+        return found[key]
+
+    @staticmethod
+    def existing_stays(room_ids, stays):
+        """Sorted, disjoint ``(check_in, check_out)`` runs of stored bookings per room within the batch's window."""
+        taken = defaultdict(list)
+        window_start = min(stay[3] for stay in stays)
+        window_end = max(stay[4] for stay in stays)
+        existing = Booking.objects.filter(
+            room_id__in=room_ids, check_in__lt=window_end, check_out__gt=window_start
+        ).values_list("room_id", "check_in", "check_out")
+        for room_id, check_in, check_out in existing:
+            taken[room_id].append((check_in, check_out))
+        # Stored bookings may overlap each other, the booking form never refused it; merge them into
+        # disjoint runs so that ``overlaps`` only has to look at the neighbours.
+        for room_id, intervals in taken.items():
+            merged = []
+            for check_in, check_out in sorted(intervals):
+                if merged and check_in < merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], check_out))
+                else:
+                    merged.append((check_in, check_out))
+            taken[room_id] = merged
+        return taken
+
+    @staticmethod
+    def overlaps(intervals, check_in, check_out):
+        """
+        Whether ``[check_in, check_out)`` overlaps the sorted, mutually disjoint ``intervals``.
+
+        Only the neighbours on either side of the insertion point can overlap.
+        """
+        position = bisect.bisect_left(intervals, (check_in, check_out))
+        if position < len(intervals) and intervals[position][0] < check_out:
+            return True
+        return position > 0 and intervals[position - 1][1] > check_in
@@ -0,0 +1,46 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.archive import archive_bookings
+
+
+class Command(BaseCommand):
+    help = 'Move completed bookings older than the retention horizon to the booking archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.BOOKING_RETENTION_DAYS,
+            help='Archive bookings that checked out more than this many days ago (BOOKING_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--before', type=lambda value: datetime.strptime(value, '%Y-%m-%d').date(),
+            help='Archive bookings that checked out before this date (YYYY-MM-DD) instead',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Bookings moved per transaction')
+        parser.add_argument('--limit', type=int, help='Stop after this many bookings; run again to continue')
+        parser.add_argument('--dry-run', action='store_true', help='Count the bookings without moving them')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            before = timezone.make_aware(datetime.combine(options['before'], time.min))
+        elif options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        else:
+            before = timezone.now() - timedelta(days=options['days'])
+
+        report = archive_bookings(
+            before,
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+            dry_run=options['dry_run'],
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{report}, checked out before {before:%Y-%m-%d %H:%M}{' (dry run)' if options['dry_run'] else ''}"
+        ))
+
+    def progress(self, report):
+        self.stdout.write(f'{report.archived} bookings archived')
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.benchmarks import booking_jobs, booking_load
+from apps.models import Room, User
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent booking POSTs at a running server and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test')
+        parser.add_argument('--requests', type=int, default=500, help='Total number of booking POSTs')
+        parser.add_argument('--concurrency', type=int, default=50, help='Simultaneous clients')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for picking users, rooms and dates')
+        parser.add_argument(
+            '--rooms', type=int, default=1000, help='Spread the bookings over this many rooms; 1 measures lock contention'
+        )
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+
+    def handle(self, *args, **options):
+        if not (User.objects.filter(is_superuser=False).exists() and Room.objects.exists()):
+            raise CommandError('Seed some users and rooms first, e.g. with populate_db')
+        jobs = booking_jobs(options['requests'], seed=options['seed'], rooms=options['rooms'])
+
+        report = booking_load(options['url'], jobs, options['concurrency'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            latency = report['latency_ms']
+            self.stdout.write(
+                f"{report['requests']} POSTs, concurrency {report['concurrency']}: "
+                f"{report['requests_per_second']} req/s, "
+                f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+                f"{report['conflicts']} conflicts, {report['errors']} errors"
+            )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bundles import BundleError, build, collect_bundles, prune
+
+
+class Command(BaseCommand):
+    help = 'Concatenate and minify the assets inside {% bundle %} blocks into hashed, precompressed bundles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only rebuild these bundles')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete bundles from earlier builds that the new manifest no longer references')
+        parser.add_argument('--list', action='store_true', help='Show the assets of each bundle without building')
+
+    def handle(self, *args, **options):
+        try:
+            if options['list']:
+                for name, assets in collect_bundles().items():
+                    self.stdout.write(name)
+                    for asset in assets:
+                        self.stdout.write(f'  {asset}')
+                return
+            manifest = build(options['names'])
+        except BundleError as e:
+            raise CommandError(e)
+
+        for name, path in sorted(manifest.items()):
+            self.stdout.write(self.style.SUCCESS(f'{name} -> {path}'))
+        if options['prune']:
+            for filename in prune(manifest):
+                self.stdout.write(f'Removed {filename}')
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.queryplans import check_pages
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries issued by the public pages and the admin and flag sequential scans and sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true', help='Refresh the planner statistics with ANALYZE first'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Query plans are not checked on {connection.vendor}')
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        try:
+            results = check_pages()
+        except RuntimeError as e:
+            raise CommandError(e)
+
+        flagged = [result for result in results if result['findings']]
+        for page in dict.fromkeys(result['page'] for result in results):
+            problems = [result for result in flagged if result['page'] == page]
+            queries = sum(result['page'] == page for result in results)
+            if not problems:
+                self.stdout.write(f'ok    {page} ({queries} queries)')
+                continue
+            self.stdout.write(self.style.ERROR(f'FLAG  {page}'))
+            for result in problems:
+                self.stdout.write(f"      {', '.join(result['findings'])}")
+                self.stdout.write(f"      {result['sql']}")
+                for line in result['plan']:
+                    self.stdout.write(f'        {line}')
+
+        if options['verbosity'] > 1:
+            for result in results:
+                self.stdout.write(f"\n[{result['page']}] {result['sql']}")
+                for line in result['plan']:
+                    self.stdout.write(f'  {line}')
+
+        if flagged:
+            raise CommandError(f'{len(flagged)} of {len(results)} queries scan a table or sort')
+        self.stdout.write(self.style.SUCCESS(f'No sequential scans or sorts in {len(results)} queries'))
@@ -0,0 +1,69 @@
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.images import WIDTHS, derivative_name, placeholder_name
+from apps.models import Room
+
+CONTENT_HASH_NAME = re.compile(r'^[0-9a-f]{64}(\.w\d+|\.placeholder)?\.\w+$')
+
+
+class Command(BaseCommand):
+    help = 'Delete uploaded images and renditions that no room references, never touching the seed images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='images', help='Media directory to sweep')
+        parser.add_argument('--min-age', type=float, default=1.0,
+                            help='Only delete files older than this many hours, to spare uploads in flight')
+        parser.add_argument('--include-legacy', action='store_true',
+                            help='Also delete files that are not content-hash named, such as old UUID uploads')
+        parser.add_argument('--dry-run', action='store_true', help='List what would be deleted without deleting')
+
+    def handle(self, *args, **options):
+        self.seed_directory = os.path.relpath(settings.SEED_IMAGES_DIR, settings.MEDIA_ROOT).replace(os.sep, '/')
+        directory = options['directory'].strip('/')
+        if directory == self.seed_directory or directory.startswith(f'{self.seed_directory}/'):
+            raise CommandError(f'{directory} holds the seed images of populate_db, pick another directory')
+
+        keep = set()
+        for name in Room.objects.exclude(image='').values_list('image', flat=True).iterator():
+            keep.add(name)
+            keep.add(placeholder_name(name))
+            keep.update(derivative_name(name, width) for width in WIDTHS)
+
+        cutoff = time.time() - options['min_age'] * 3600
+        deleted = freed = 0
+        for name in self.walk(directory):
+            if name in keep:
+                continue
+            if not options['include_legacy'] and not CONTENT_HASH_NAME.match(os.path.basename(name)):
+                continue
+            path = default_storage.path(name)
+            if os.path.getmtime(path) > cutoff:
+                continue
+            size = os.path.getsize(path)
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {name}')
+            else:
+                default_storage.delete(name)
+            deleted += 1
+            freed += size
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} files, {freed / 1024 / 1024:.1f} MB'))
+
+    def walk(self, directory):
+        """Storage names of the files under ``directory``, skipping the seed images."""
+        if directory and not default_storage.exists(directory):
+            return
+        subdirectories, files = default_storage.listdir(directory)
+        prefix = f'{directory}/' if directory else ''
+        for filename in files:
+            yield f'{prefix}{filename}'
+        for subdirectory in subdirectories:
+            if f'{prefix}{subdirectory}' != self.seed_directory:
+                yield from self.walk(f'{prefix}{subdirectory}')
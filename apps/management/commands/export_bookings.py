@@ -0,0 +1,59 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.exports import FORMATS, booking_rows, detect_format, write_chunks
+from apps.models import ArchivedBooking, Booking
+
+
+class Command(BaseCommand):
+    help = 'Stream bookings to a CSV or JSON Lines file with the guest name, room number, price and timestamps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file, or - for standard output')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, CSV for standard output')
+        parser.add_argument('--since', help='Only bookings checking in on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Only bookings checking in before this date (YYYY-MM-DD)')
+        parser.add_argument('--archived', action='store_true', help='Export the archived bookings instead')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        bookings = (ArchivedBooking if options['archived'] else Booking).objects.all()
+        if options['since']:
+            bookings = bookings.filter(check_in__gte=self.midnight(options['since']))
+        if options['until']:
+            bookings = bookings.filter(check_in__lt=self.midnight(options['until']))
+
+        self.exported = 0
+        chunks = write_chunks(
+            self.count(booking_rows(bookings, options['chunk_size'])),
+            options['format'] or ('csv' if path == '-' else detect_format(path)),
+        )
+        if path == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        try:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.writelines(chunks)
+        except OSError as e:
+            raise CommandError(f'Cannot export to {path}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'{self.exported} bookings exported to {path}'))
+
+    def count(self, rows):
+        for row in rows:
+            self.exported += 1
+            yield row
+
+    @staticmethod
+    def midnight(value):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+        return timezone.make_aware(datetime.combine(day, time.min))
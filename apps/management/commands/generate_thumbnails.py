@@ -0,0 +1,29 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.images import forget_renditions, render_many
+from apps.models import Room
+
+
+class Command(BaseCommand):
+    help = 'Generate WebP renditions and placeholders for existing room images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (defaults to CPU count)')
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that already exist')
+
+    def handle(self, *args, **options):
+        names = set(Room.objects.exclude(image='').values_list('image', flat=True))
+        names = [name for name in names if default_storage.exists(name)]
+        paths = [default_storage.path(name) for name in names]
+
+        written = failed = 0
+        for path, result in render_many(paths, workers=options['workers'], force=options['force']):
+            if isinstance(result, Exception):
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'{path}: {result}'))
+            else:
+                written += len(result)
+        forget_renditions(names)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} renditions for {len(paths)} images, {failed} failed'))
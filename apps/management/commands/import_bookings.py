@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.imports import FORMATS, BookingImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import bookings from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV with a header row, a JSON array or JSON Lines')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows validated and inserted per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        importer = BookingImporter(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                report = importer.run(read_rows(f, options['format'] or detect_format(path)))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot import {path}: {e}')
+
+        for number, message in report.errors:
+            self.stderr.write(f'Row {number}: {message}')
+        style = self.style.WARNING if report.errors else self.style.SUCCESS
+        self.stdout.write(style(str(report)))
+
+    def progress(self, report):
+        self.stdout.write(f'{report.rows} rows read, {report.created} {report.outcome}, {len(report.errors)} rejected')
@@ -1,69 +1,114 @@
-import os
-import random
+import re
+import time
+from datetime import date, timedelta
 
-from django.core.files.base import ContentFile
-from django.core.management.base import BaseCommand
-from faker import Faker
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from apps import catalogue, seeding
+from apps.images import render_many
+from apps.models import Room, User
+from apps.occupancy import rebuild_calendars
+from apps.rollups import rebuild_rollups
+from apps.search import rebuild as rebuild_search
 
-from apps.models import User, Room
 
 class Command(BaseCommand):
     help = 'Populate the database with dummy data'
 
-    def handle(self, *args, **kwargs):
-        fake = Faker()
-        image_folder = 'media/images/'  # Path to your image folder
-        image_files = [f for f in os.listdir(image_folder) if f.endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users to create')
+        parser.add_argument('--rooms', type=int, default=30, help='Number of rooms to create')
+        parser.add_argument('--bookings', type=int, default=0, help='Number of bookings spread over all rooms')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per bulk_create')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating batches in parallel')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for Faker and random, for reproducible data')
+        parser.add_argument('--password', default='password123', help='Password shared by every created user')
+        parser.add_argument('--images', default=settings.SEED_IMAGES_DIR, help='Folder with the room images to use')
+        parser.add_argument(
+            '--start', type=date.fromisoformat, default=None,
+            help='First check-in date for rooms without bookings (defaults to January 1 of this year)',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        batch_size, workers, seed = options['batch_size'], options['workers'], options['seed']
+        if workers > 1 and connection.vendor == 'sqlite':
+            raise CommandError('SQLite allows a single writer, run with --workers 1 or use PostgreSQL')
+
+        if options['users']:
+            first_number = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+            # Hash once: a full PBKDF2 round per user would dominate the run.
+            password_hash = make_password(options['password'])
+            tasks = seeding.user_tasks(seed, first_number, options['users'], password_hash, batch_size)
+            self.run('users', tasks, workers)
+
+        if options['rooms']:
+            image_names = seeding.store_seed_images(options['images'])
+            if not image_names:
+                raise CommandError(f"No images found in {options['images']}")
+            first_number = self.next_room_number()
+            tasks = seeding.room_tasks(seed, first_number, options['rooms'], image_names, batch_size)
+            self.run('rooms', tasks, workers)
+            # bulk_create skips the post_save hooks that render renditions and refresh the catalogue.
+            list(render_many([default_storage.path(name) for name in image_names]))
+            catalogue.bump_version()
+
+        if options['bookings']:
+            user_ids = list(User.objects.filter(is_superuser=False).values_list('id', flat=True))
+            rooms = self.room_schedules(options['start'] or date(timezone.localdate().year, 1, 1))
+            if not user_ids or not rooms:
+                raise CommandError('Bookings need at least one non-superuser and one room')
+            tasks = seeding.booking_tasks(seed, rooms, options['bookings'], batch_size)
+            self.run('bookings', tasks, workers, user_ids=user_ids)
+            written = rebuild_calendars()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} room calendars'))
+            written = rebuild_rollups()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily rollups'))
 
-        # Create users
-        for _ in range(10):
-            user = User.objects.create_user(
-                username=fake.user_name(),
-                password='password123',
-                email=fake.email(),
-                first_name=fake.first_name(),
-                last_name=fake.last_name(),
-                is_superuser=False,
-                is_staff=True
-            )
-            user.save()
-            self.stdout.write(self.style.SUCCESS(f'User {user.username} created'))
+        # bulk_create skips the signals that keep the search documents in step.
+        kinds = [kind for kind, option in (('user', 'users'), ('room', 'rooms'), ('booking', 'bookings')) if options[option]]
+        if kinds:
+            written = rebuild_search(kinds, batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} search documents'))
 
-        # Create rooms
-        existing_room_numbers = set(Room.objects.values_list('room_number', flat=True))
-        existing_names = set(Room.objects.values_list('name', flat=True))  # Track existing names
-        for i in range(30):
-            room_number = f"Room-{i + 1}"
-            # Ensure the room number is unique
-            while room_number in existing_room_numbers:
-                i += 1
-                room_number = f"Room-{i + 1}"
+    def run(self, label, tasks, workers, user_ids=None):
+        started = time.perf_counter()
+        created = 0
+        for count in seeding.run_tasks(tasks, workers=workers, user_ids=user_ids):
+            created += count
+            if self.verbosity > 1:
+                self.stdout.write(f'{created} {label} created')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} {label} in {elapsed:.1f}s ({created / max(elapsed, 1e-6):.0f} rows/s)'
+        ))
 
-            image_file_name = random.choice(image_files)
+    def next_room_number(self):
+        """One past the highest number used by ``Room-<n>`` or ``R<n>`` room numbers."""
+        highest = 0
+        for number in Room.objects.values_list('room_number', flat=True).iterator(chunk_size=10000):
+            match = re.fullmatch(r'(?:Room-|R)(\d+)', number)
+            if match:
+                highest = max(highest, int(match.group(1)))
+        return highest + 1
 
-            # Open the image file
-            image_path = os.path.join(image_folder, image_file_name)
-            with open(image_path, 'rb') as img_file:
-                image_content = ContentFile(img_file.read(), name=image_file_name)
-                name = fake.catch_phrase()
-                while name in existing_names:
-                    name = fake.catch_phrase()
-                room = Room.objects.create(
-                    room_number=room_number,
-                    name=name,
-                    room_type=random.choice([
-                        Room.STANDARD_DOUBLE,
-                        Room.STANDARD_TWIN,
-                        Room.SUPERIOR_DOUBLE,
-                        Room.SUPERIOR_TWIN,
-                        Room.JUNIOR_SUITE_DOUBLE,
-                        Room.JUNIOR_SUITE_TWIN,
-                    ]),
-                    description=fake.paragraph(),
-                    price_per_night=round(random.uniform(50.0, 500.0), 2),
-                    image=image_content,
-                    is_available=random.choice([True, False])
-                )
-                room.save()
-                existing_room_numbers.add(room_number)  # Add to the existing room numbers
-                self.stdout.write(self.style.SUCCESS(f'Room {room.room_number} created'))
+    def room_schedules(self, start):
+        """``(room_id, price, first_day)`` per room, with ``first_day`` after the room's last stay."""
+        rooms = []
+        for room_id, price, last_check_out in (
+            Room.objects.annotate(last_check_out=Max('bookings__check_out'))
+            .values_list('id', 'price_per_night', 'last_check_out')
+            .order_by('id')
+            .iterator(chunk_size=10000)
+        ):
+            first_day = start
+            if last_check_out:
+                first_day = max(start, timezone.localtime(last_check_out).date() + timedelta(days=1))
+            rooms.append((room_id, price, first_day))
+        return rooms
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.startup import LAZY_MODULES, profile_startup
+
+
+class Command(BaseCommand):
+    help = 'Boot fresh worker processes and report the time spent per start-up phase and per imported module'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Boots to time; the fastest is reported')
+        parser.add_argument('--limit', type=int, default=15, help='Slowest imports to list')
+        parser.add_argument('--budget', type=float, help='Fail when a boot takes longer than this many milliseconds')
+
+    def handle(self, *args, **options):
+        try:
+            report = profile_startup(max(1, options['repeat']))
+        except RuntimeError as e:
+            raise CommandError(e)
+
+        self.stdout.write(f"Cold start, fastest of {max(1, options['repeat'])} boots:")
+        self.stdout.write(f'  {"python":<12}{report.interpreter:8.1f} ms')
+        for phase, ms in report.phases.items():
+            self.stdout.write(f'  {phase:<12}{ms:8.1f} ms')
+        self.stdout.write(f'  {"total":<12}{report.total:8.1f} ms')
+
+        self.stdout.write('\nSlowest modules (own and cumulative ms, under -X importtime):')
+        slowest = sorted(report.modules, key=lambda module: -module[1])
+        for name, own, cumulative, _ in slowest[: options['limit']]:
+            self.stdout.write(f'  {own:8.1f}{cumulative:8.1f}  {name}')
+        self.stdout.write('\nBy top-level package:')
+        for package, ms in report.packages()[: options['limit']]:
+            self.stdout.write(f'  {ms:8.1f}  {package}')
+
+        if report.lazy_loaded:
+            raise CommandError(
+                f"{', '.join(report.lazy_loaded)} imported at start-up; "
+                f"import {', '.join(LAZY_MODULES)} where they are used"
+            )
+        if options['budget'] and report.total > options['budget']:
+            raise CommandError(f"Cold start took {report.total:.0f} ms, over the {options['budget']:.0f} ms budget")
+        self.stdout.write(self.style.SUCCESS(f'Cold start in {report.total:.0f} ms'))
@@ -0,0 +1,52 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+# Engines that keep visitor sessions out of the database.
+VISITOR_FREE_ENGINES = ('apps.sessions', 'django.contrib.sessions.backends.signed_cookies')
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions and, once visitors use cookie sessions, the visitor rows left in django_session'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows decoded and deleted per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Count the rows without deleting them')
+
+    def handle(self, *args, **options):
+        batch_size, dry_run = options['batch_size'], options['dry_run']
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        expired_count = expired.count() if dry_run else expired.delete()[0]
+
+        visitors = 0
+        if settings.SESSION_ENGINE in VISITOR_FREE_ENGINES:
+            decoder = import_module(settings.SESSION_ENGINE).SessionStore()
+            last_key = ''
+            while True:
+                # Page by key rather than holding a cursor open while deleting.
+                rows = list(
+                    Session.objects.filter(session_key__gt=last_key)
+                    .order_by('session_key')
+                    .values_list('session_key', 'session_data')[:batch_size]
+                )
+                if not rows:
+                    break
+                last_key = rows[-1][0]
+                visitors += self.delete(
+                    [key for key, data in rows if SESSION_KEY not in decoder.decode(data)], dry_run
+                )
+        else:
+            self.stdout.write(f'Keeping visitor sessions: {settings.SESSION_ENGINE} stores them in the database')
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {expired_count} expired and {visitors} visitor sessions'))
+
+    def delete(self, session_keys, dry_run):
+        if dry_run or not session_keys:
+            return len(session_keys)
+        Session.objects.filter(session_key__in=session_keys).delete()
+        return len(session_keys)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily occupancy and revenue rollups from existing bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room', type=int, action='append', dest='rooms', help='Only rebuild this room id')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows fetched and written per batch')
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(room_ids=options['rooms'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily rollups'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.models import SearchDocument
+from apps.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search documents of rooms, users and bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', action='append', dest='kinds', choices=[kind for kind, _ in SearchDocument.KIND_CHOICES],
+            help='Only rebuild this kind of document',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows read and documents written per batch')
+
+    def handle(self, *args, **options):
+        written = rebuild(kinds=options['kinds'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} search documents'))
@@ -0,0 +1,92 @@
+import itertools
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the public and admin hot paths on a throwaway database and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='small,medium',
+            help=f"Comma separated scales ({', '.join(benchmarks.SCALES)}) or users:rooms:bookings triples",
+        )
+        parser.add_argument('--repeat', type=int, default=50, help='Timed requests per endpoint and scale')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the generated data and requests')
+        parser.add_argument('--load-requests', type=int, default=500, help='Booking POSTs in the load test, 0 to skip')
+        parser.add_argument('--concurrency', type=int, default=20, help='Simultaneous clients in the load test')
+        parser.add_argument('--telegram-delay', type=float, default=0.05, help='Seconds the Telegram stub waits')
+        parser.add_argument('--output', default='benchmarks.json', help='Where to write the JSON results')
+        parser.add_argument('--compare', help='Earlier results file to compare against')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database between runs')
+
+    def handle(self, *args, **options):
+        scales = [self.parse_scale(scale) for scale in options['scales'].split(',') if scale]
+        baseline = benchmarks.load_results(options['compare']) if options['compare'] else None
+        seed = options['seed']
+        # Booking POSTs share one sequence of free weeks so they never overlap across scales.
+        slots = itertools.count()
+        results = {'environment': benchmarks.environment(), 'seed': seed, 'scales': {}}
+
+        with benchmarks.benchmark_database(keepdb=options['keepdb']):
+            for name, counts in scales:
+                started = time.perf_counter()
+                rows = benchmarks.grow_to(*counts, seed=seed)
+                self.stdout.write(f"{name}: seeded {rows} in {time.perf_counter() - started:.1f}s")
+                endpoints = benchmarks.run_endpoints(repeat=options['repeat'], seed=seed, slots=slots)
+                results['scales'][name] = {'rows': rows, 'endpoints': endpoints}
+                for endpoint, result in endpoints.items():
+                    latency = result['latency_ms']
+                    self.stdout.write(
+                        f"  {endpoint:<18} p50 {latency['p50']:>8} ms  p95 {latency['p95']:>8} ms  "
+                        f"p99 {latency['p99']:>8} ms  queries {result['queries']['max']}"
+                    )
+
+            if options['load_requests']:
+                load = benchmarks.run_load(
+                    requests_count=options['load_requests'], concurrency=options['concurrency'], seed=seed,
+                    slots=slots, telegram_delay=options['telegram_delay'],
+                )
+                results['load'] = load
+                self.stdout.write(
+                    f"load: {load['requests']} POSTs at concurrency {load['concurrency']}: "
+                    f"{load['requests_per_second']} req/s, p95 {load['latency_ms']['p95']} ms, "
+                    f"{load['errors']} errors; {load['notifications']['sent']} notifications delivered "
+                    f"at {load['notifications']['per_second']}/s"
+                )
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if baseline:
+            self.report_comparison(baseline, results)
+
+    def parse_scale(self, scale):
+        if scale in benchmarks.SCALES:
+            return scale, benchmarks.SCALES[scale]
+        try:
+            users, rooms, bookings = (int(part) for part in scale.split(':'))
+        except ValueError:
+            raise CommandError(f'Unknown scale {scale!r}, use a named scale or users:rooms:bookings')
+        return scale, (users, rooms, bookings)
+
+    def report_comparison(self, baseline, results):
+        """Print p50/p95 changes and fail if any endpoint now issues more queries."""
+        regressions = []
+        for scale, endpoint, old, new in benchmarks.compare(baseline, results):
+            old_latency, new_latency = old['latency_ms'], new['latency_ms']
+            change = (new_latency['p50'] / old_latency['p50'] - 1) * 100 if old_latency['p50'] else 0.0
+            self.stdout.write(
+                f"{scale:<8} {endpoint:<18} p50 {old_latency['p50']} -> {new_latency['p50']} ms ({change:+.0f}%)  "
+                f"p95 {old_latency['p95']} -> {new_latency['p95']} ms  "
+                f"queries {old['queries']['max']} -> {new['queries']['max']}"
+            )
+            if new['queries']['max'] > old['queries']['max']:
+                regressions.append(f'{scale}/{endpoint}')
+        if regressions:
+            raise CommandError(f"Query count increased for {', '.join(regressions)}")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued Telegram reservation notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Rows claimed per batch')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent HTTP requests per batch')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain everything that is due and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        workers = options['workers']
+
+        while True:
+            sent, retried, failed = drain_outbox(batch_size=batch_size, workers=workers)
+            if sent or retried or failed:
+                self.stdout.write(f'Sent {sent}, retrying {retried}, failed {failed}')
+            if sent + retried + failed < batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps import pricing
+from apps.models import Room
+
+
+class Command(BaseCommand):
+    help = 'Open, close or reprice rooms in bulk, each change a single UPDATE however many rooms it covers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room-type', choices=[choice for choice, _ in Room.ROOM_TYPE_CHOICES])
+        parser.add_argument('--room', nargs='+', dest='rooms', metavar='ROOM_NUMBER', help='Only these rooms')
+        parser.add_argument('--all', action='store_true', help='Every room')
+        availability = parser.add_mutually_exclusive_group()
+        availability.add_argument('--open', action='store_true', help='Make the rooms available for booking')
+        availability.add_argument('--close', action='store_true', help='Take the rooms off sale')
+        price = parser.add_mutually_exclusive_group()
+        price.add_argument('--percent', type=Decimal, help='Change the nightly price by this percentage, e.g. 10 or -5')
+        price.add_argument('--amount', type=Decimal, help='Change the nightly price by this amount, e.g. 20 or -15.50')
+        parser.add_argument(
+            '--keep-booking-prices', action='store_true', help='Leave the prices of upcoming bookings as they are'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Bookings repriced per transaction')
+
+    def handle(self, *args, **options):
+        if not (options['room_type'] or options['rooms'] or options['all']):
+            raise CommandError('Pick the rooms with --room-type, --room or --all')
+        changes_price = options['percent'] is not None or options['amount'] is not None
+        if not (options['open'] or options['close'] or changes_price):
+            raise CommandError('Nothing to do: pass --open, --close, --percent or --amount')
+        if options['percent'] is not None and options['percent'] <= -100:
+            raise CommandError('A price cannot drop by 100% or more')
+
+        rooms = Room.objects.all()
+        if options['room_type']:
+            rooms = rooms.filter(room_type=options['room_type'])
+        if options['rooms']:
+            rooms = rooms.filter(room_number__in=options['rooms'])
+
+        if options['open'] or options['close']:
+            changed = pricing.set_availability(rooms, options['open'])
+            self.stdout.write(f"{changed} rooms {'opened' if options['open'] else 'closed'}")
+        if changes_price:
+            room_ids = pricing.reprice_rooms(rooms, percent=options['percent'], amount=options['amount'])
+            self.stdout.write(f'{len(room_ids)} rooms repriced')
+            if room_ids and not options['keep_booking_prices']:
+                repriced = pricing.recompute_totals(room_ids, batch_size=options['batch_size'])
+                self.stdout.write(f'{repriced} upcoming bookings repriced')
+        self.stdout.write(self.style.SUCCESS('Rooms updated'))
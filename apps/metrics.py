@@ -0,0 +1,254 @@
+import atexit
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from django.template.backends.django import Template, reraise
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds: requests and outbound calls, then queries and renders, which are usually sub-millisecond.
+SLOW_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# name: (help, label names, buckets)
+HISTOGRAMS = {
+    "http_request_duration_seconds": (
+        "Time Django spent producing a response, by route.",
+        ("route", "method"),
+        SLOW_BUCKETS,
+    ),
+    "db_query_duration_seconds": ("Time spent executing SQL statements.", ("alias", "operation"), FAST_BUCKETS),
+    "template_render_duration_seconds": ("Time spent rendering templates.", ("template",), FAST_BUCKETS),
+    "outbound_request_duration_seconds": ("Time spent on outbound HTTP requests.", ("host",), SLOW_BUCKETS),
+}
+# name: (help, label names)
+COUNTERS = {
+    "http_requests_total": ("Responses returned, by route and status code.", ("route", "method", "status")),
+    "outbound_requests_total": ("Outbound HTTP requests, by status code or error.", ("host", "status")),
+}
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE"}
+
+
+class Registry:
+    """
+    In-process counters and histograms, shared with other worker processes through files.
+
+    Observations only take a lock and bump a few numbers. Every
+    ``METRICS_FLUSH_INTERVAL`` seconds, and when the process exits, the
+    totals are written to ``METRICS_DIR/<pid>-<token>.json``; :meth:`collect`
+    adds up every process's file, so any worker can answer a scrape for all
+    of them. Files of exited processes are kept, as their counts are part of
+    the totals, and the random token keeps a later process reusing the pid
+    from overwriting them. ``gunicorn.conf.py`` gives every server run its
+    own ``METRICS_DIR`` and removes it when the server stops.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.flushed_at = time.monotonic()
+        self.pid = None
+        self.filename = None
+
+    def observe(self, name, labels, seconds):
+        if not settings.METRICS_ENABLED:
+            return
+        buckets = HISTOGRAMS[name][2]
+        with self.lock:
+            series = self.histograms.get((name, labels))
+            if series is None:
+                # One count per bucket plus +Inf, then the sum.
+                series = self.histograms[name, labels] = [0] * (len(buckets) + 1) + [0.0]
+            series[bisect.bisect_left(buckets, seconds)] += 1
+            series[-1] += seconds
+
+    def inc(self, name, labels, amount=1):
+        if not settings.METRICS_ENABLED:
+            return
+        with self.lock:
+            self.counters[name, labels] = self.counters.get((name, labels), 0) + amount
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "histograms": [[name, list(labels), list(series)] for (name, labels), series in self.histograms.items()],
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+            }
+
+    def path(self):
+        """This process's file, named afresh in a forked child."""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.filename = f"{self.pid}-{uuid.uuid4().hex[:12]}.json"
+        return os.path.join(settings.METRICS_DIR, self.filename)
+
+    def flush(self):
+        self.flushed_at = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = self.path()
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        try:
+            self.flush()
+        except OSError:
+            logger.warning("Could not write metrics to %s", settings.METRICS_DIR, exc_info=True)
+
+    def collect(self):
+        """Return ``(histograms, counters)`` summed over this process and the files of all others."""
+        snapshots = [self.snapshot()]
+        own = os.path.basename(self.path())
+        try:
+            names = [name for name in os.listdir(settings.METRICS_DIR) if name.endswith(".json") and name != own]
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            try:
+                with open(os.path.join(settings.METRICS_DIR, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+        histograms, counters = {}, {}
+        for snapshot in snapshots:
+            for name, labels, series in snapshot["histograms"]:
+                if name not in HISTOGRAMS:
+                    continue
+                total = histograms.setdefault((name, tuple(labels)), [0] * len(series))
+                for i, value in enumerate(series):
+                    total[i] += value
+            for name, labels, value in snapshot["counters"]:
+                if name in COUNTERS:
+                    counters[name, tuple(labels)] = counters.get((name, tuple(labels)), 0) + value
+        return histograms, counters
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, *extra):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join([*pairs, *extra]) + "}"
+
+
+def render(histograms, counters):
+    """Format collected metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, (help_text, label_names, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(label_names, labels)} {series[-1]}")
+            lines.append(f"{name}_count{_labels(label_names, labels)} {cumulative}")
+    for name, (help_text, label_names) in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f"{name}{_labels(label_names, labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper recording ``db_query_duration_seconds``; see ``apps.signals``."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        operation = (sql[:16].split(None, 1) or [""])[0].upper()
+        registry.observe(
+            "db_query_duration_seconds",
+            (context["connection"].alias, operation if operation in OPERATIONS else "OTHER"),
+            time.perf_counter() - started,
+        )
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            registry.observe(
+                "template_render_duration_seconds", (self.template.name or "<string>",), time.perf_counter() - started
+            )
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """Django's template backend, recording ``template_render_duration_seconds`` for each top-level render."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def time_outbound(send):
+    """
+    Wrap a ``requests`` adapter's ``send`` to record the outbound request metrics.
+
+    A wrapper rather than an ``HTTPAdapter`` subclass, so that importing this
+    module, as every worker does, does not import ``requests``.
+    """
+
+    @functools.wraps(send)
+    def timed_send(request, *args, **kwargs):
+        host = urlsplit(request.url).hostname or ""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = send(request, *args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            registry.observe("outbound_request_duration_seconds", (host,), time.perf_counter() - started)
+            registry.inc("outbound_requests_total", (host, status))
+
+    return timed_send
+
+
+def method_label(method):
+    return method if method in METHODS else "OTHER"
+
+
+@atexit.register
+def _flush_at_exit():
+    if settings.configured and settings.METRICS_ENABLED and (registry.histograms or registry.counters):
+        try:
+            registry.flush()
+        except OSError:
+            pass
@@ -0,0 +1,191 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from apps import metrics
+from apps.routers import replica_reads
+
+logger = logging.getLogger(__name__)
+
+_query_stats = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    """Count and time every SQL statement executed while installed as an execute wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def count_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper feeding the ``QueryStats`` of the current request; see ``apps.signals``.
+
+    Connections belong to a thread, and an async view runs its queries on
+    worker threads, so the stats travel in a context variable, which
+    ``sync_to_async`` carries over, rather than in per-connection wrappers.
+    """
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs in the sync (WSGI) and the async (ASGI) handler without switching threads.
+
+    Django adapts sync-only middleware under ASGI by running the request,
+    async views included, on a worker thread. Subclasses implement both
+    ``handle(request)`` and ``ahandle(request)``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Record ``http_request_duration_seconds`` and ``http_requests_total`` per route.
+
+    Requests are labelled with the URL name rather than the path, so that
+    ``/api/rooms/<pk>/calendar/`` is one series and not one per room; paths
+    matching no URL share the ``<unmatched>`` route. Installed first so the
+    timing covers the other middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, start)
+        return response
+
+    async def ahandle(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, start)
+        return response
+
+    @staticmethod
+    def record(request, response, start):
+        match = getattr(request, "resolver_match", None)
+        route = match.view_name if match else "<unmatched>"
+        method = metrics.method_label(request.method)
+        metrics.registry.observe("http_request_duration_seconds", (route, method), time.perf_counter() - start)
+        metrics.registry.inc("http_requests_total", (route, method, str(response.status_code)))
+        metrics.registry.maybe_flush()
+
+
+class QueryCountMiddleware(HybridMiddleware):
+    """
+    Report the number of queries and the time spent in the database per request.
+
+    The totals are sent back as ``X-DB-Query-Count`` and ``X-DB-Time-Ms``
+    headers, and requests issuing more than ``QUERY_COUNT_WARNING`` queries are
+    logged so that N+1 regressions show up without a profiler.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.warning_threshold = getattr(settings, "QUERY_COUNT_WARNING", 50)
+
+    def handle(self, request):
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        return self.report(request, response, stats)
+
+    async def ahandle(self, request):
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        response["X-DB-Query-Count"] = str(stats.count)
+        response["X-DB-Time-Ms"] = f"{stats.duration * 1000:.2f}"
+        if stats.count > self.warning_threshold:
+            logger.warning(
+                "%s %s issued %d queries in %.2f ms",
+                request.method,
+                request.path,
+                stats.count,
+                stats.duration * 1000,
+            )
+        return response
+
+
+class ReplicaMiddleware(HybridMiddleware):
+    """
+    Let read-only requests read from the replica database.
+
+    A ``GET`` or ``HEAD`` request is read-only when its view class (or
+    function) sets ``replica_reads = True`` or it is an admin changelist.
+    Everything else, and any read after a write in the same request, uses
+    the primary; see ``apps.routers.PrimaryReplicaRouter``.
+    """
+
+    read_methods = ("GET", "HEAD")
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.async_mode:
+            # Django would run a sync process_view on a worker thread; this one does no I/O.
+            self.process_view = self.aprocess_view
+
+    def handle(self, request):
+        with replica_reads() as state:
+            request.replica_reads = state
+            return self.get_response(request)
+
+    async def ahandle(self, request):
+        with replica_reads() as state:
+            request.replica_reads = state
+            return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in self.read_methods:
+            return None
+        view = getattr(view_func, "view_class", view_func)
+        match = request.resolver_match
+        is_changelist = match.namespace == "admin" and (match.url_name or "").endswith("_changelist")
+        request.replica_reads.enabled = getattr(view, "replica_reads", False) or is_changelist
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return ReplicaMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
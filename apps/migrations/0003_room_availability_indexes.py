@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0002_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room', 'check_in', 'check_out'], name='apps_bookin_room_id_1efc7d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['room_type', 'price_per_night'], name='apps_room_room_ty_990eb7_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-18 08:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0003_room_availability_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('days', models.BinaryField(max_length=46)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendars', to='apps.room')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='roomcalendar',
+            constraint=models.UniqueConstraint(fields=('room', 'year'), name='unique_room_calendar_year'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-18 09:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0004_roomcalendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomTypeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_type', models.CharField(choices=[('Standard Double', 'Standard Double'), ('Standard Twin', 'Standard Twin'), ('Superior Double', 'Superior Double'), ('Superior Twin', 'Superior Twin'), ('Junior Suite Double', 'Junior Suite Double'), ('Junior Suite Twin', 'Junior Suite Twin')], max_length=50)),
+                ('day', models.DateField()),
+                ('nights', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_type', models.CharField(choices=[('Standard Double', 'Standard Double'), ('Standard Twin', 'Standard Twin'), ('Superior Double', 'Superior Double'), ('Superior Twin', 'Superior Twin'), ('Junior Suite Double', 'Junior Suite Double'), ('Junior Suite Twin', 'Junior Suite Twin')], max_length=50)),
+                ('day', models.DateField()),
+                ('nights', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='apps.room')),
+            ],
+            options={
+                'verbose_name_plural': 'occupancy and revenue',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='roomtyperollup',
+            constraint=models.UniqueConstraint(fields=('day', 'room_type'), name='unique_room_type_rollup_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('room', 'day'), name='unique_room_rollup_day'),
+        ),
+    ]
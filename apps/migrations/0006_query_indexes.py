@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0005_dailyrollup'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['check_in'], name='apps_bookin_check_i_0ee647_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['check_out'], name='apps_bookin_check_o_35c480_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['room_type', 'id'], name='apps_room_open_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['price_per_night', 'id'], name='apps_room_open_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['created_at'], name='apps_room_created_18b54c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_superuser', False)), fields=['date_joined', 'id'], name='apps_user_guest_joined_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.0 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+# SQLite rebuilds a table to alter it, which drops its triggers: a later
+# migration altering apps_searchdocument has to create them again.
+SQLITE_FORWARD = [
+    # External content table: the text is stored once, in apps_searchdocument.
+    "CREATE VIRTUAL TABLE apps_searchdocument_fts USING fts5("
+    "title, body, content='apps_searchdocument', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER apps_searchdocument_ai AFTER INSERT ON apps_searchdocument BEGIN "
+    "INSERT INTO apps_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER apps_searchdocument_ad AFTER DELETE ON apps_searchdocument BEGIN "
+    "INSERT INTO apps_searchdocument_fts(apps_searchdocument_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER apps_searchdocument_au AFTER UPDATE ON apps_searchdocument BEGIN "
+    "INSERT INTO apps_searchdocument_fts(apps_searchdocument_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO apps_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS apps_searchdocument_au",
+    "DROP TRIGGER IF EXISTS apps_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS apps_searchdocument_ai",
+    "DROP TABLE IF EXISTS apps_searchdocument_fts",
+]
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX apps_searchdocument_trgm_idx ON apps_searchdocument "
+    "USING gin ((title || ' ' || body) gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARD = ["DROP INDEX IF EXISTS apps_searchdocument_trgm_idx"]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+
+    return operation
+
+
+# Per kind: the model, then the fields joined into the title and body, as apps.search.SOURCES has them.
+SOURCES = {
+    'room': ('Room', ('name', 'room_number', 'room_type'), ('description',)),
+    'user': ('User', ('first_name', 'last_name', 'username'), ('email', 'phone')),
+    'booking': (
+        'Booking',
+        ('user__first_name', 'user__last_name', 'room__room_number'),
+        ('user__username', 'user__email', 'room__name'),
+    ),
+}
+BATCH_SIZE = 2000
+
+
+def backfill(apps, schema_editor):
+    """Index the rows that exist already; the signals only index rows saved from now on."""
+    SearchDocument = apps.get_model('apps', 'SearchDocument')
+    using = schema_editor.connection.alias
+    for kind, (model_name, title, body) in SOURCES.items():
+        rows = apps.get_model('apps', model_name).objects.using(using).order_by().values_list('pk', *title, *body)
+        batch = []
+        for pk, *values in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(SearchDocument(
+                kind=kind,
+                object_id=pk,
+                title=' '.join(str(value) for value in values[:len(title)] if value),
+                body=' '.join(str(value) for value in values[len(title):] if value),
+            ))
+            if len(batch) >= BATCH_SIZE:
+                SearchDocument.objects.using(using).bulk_create(batch)
+                batch = []
+        SearchDocument.objects.using(using).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0007_booking_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('room', 'Room'), ('user', 'User'), ('booking', 'Booking')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.TextField(blank=True, default='')),
+                ('body', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+        # After the triggers, so that SQLite's full-text table is filled as the documents are written.
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0009_archivedbooking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='claim_token',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
@@ -1,13 +1,18 @@
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 
 from django.contrib.auth.models import AbstractUser
-from django.db.models import (SET_NULL, BooleanField, CharField, DateTimeField,
-                              DecimalField, ForeignKey, ImageField, Model,
-                              TextField)
+from django.db.models import (CASCADE, SET_NULL, BigIntegerField, BinaryField,
+                              BooleanField, CharField, DateField, DateTimeField,
+                              DecimalField, Exists, ForeignKey, ImageField,
+                              Index, Model, OuterRef, PositiveBigIntegerField,
+                              PositiveIntegerField, PositiveSmallIntegerField,
+                              Q, QuerySet, TextField, UniqueConstraint)
 from django.utils import timezone
 
 from apps.utils import generate_unique_filename
 
+CENT = Decimal("0.01")
+
 
 class CreatedBaseModel(Model):
     """
@@ -43,6 +48,12 @@ class User(AbstractUser):
     phone = CharField(max_length=15, blank=True, null=True)
     date_joined = DateTimeField(default=timezone.now)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Every user listing excludes superusers; a partial index matches ``WHERE NOT is_superuser``.
+            Index(fields=["date_joined", "id"], condition=Q(is_superuser=False), name="apps_user_guest_joined_idx"),
+        ]
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -53,6 +64,21 @@ class User(AbstractUser):
         super().save(*args, **kwargs)
 
 
+class RoomQuerySet(QuerySet):
+    """
+    QuerySet helpers for searching rooms.
+
+    Methods:
+        available_between(check_in, check_out): Rooms open for booking with no overlapping stay.
+    """
+
+    def available_between(self, check_in, check_out):
+        overlapping = Booking.objects.filter(
+            room=OuterRef("pk"), check_in__lt=check_out, check_out__gt=check_in
+        )
+        return self.filter(is_available=True).filter(~Exists(overlapping))
+
+
 class Room(CreatedBaseModel):
     """
     Model representing a room in a hotel.
@@ -94,6 +120,16 @@ class Room(CreatedBaseModel):
     image = ImageField(upload_to=generate_unique_filename)
     is_available = BooleanField(default=True)
 
+    objects = RoomQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            Index(fields=["room_type", "price_per_night"]),
+            Index(fields=["room_type", "id"], condition=Q(is_available=True), name="apps_room_open_type_idx"),
+            Index(fields=["price_per_night", "id"], condition=Q(is_available=True), name="apps_room_open_price_idx"),
+            Index(fields=["created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.room_number}"
 
@@ -108,8 +144,11 @@ class Booking(CreatedBaseModel):
         check_in (datetime): The check-in date and time.
         check_out (datetime): The check-out date and time.
         total_price (Decimal): The total price for the booking.
+        idempotency_key (str): Client-chosen key that makes retried reservations return the same booking.
 
     Methods:
+        price_for(check_in, check_out, price_per_night): Exact price of a stay, rounded to cents.
+        stored_stay(): The ``(room_id, check_in, check_out)`` last read from or written to the database.
         save(*args, **kwargs): Calculates the total price based on the duration of stay and room price per night.
     """
 
@@ -118,11 +157,244 @@ class Booking(CreatedBaseModel):
     check_in = DateTimeField()
     check_out = DateTimeField()
     total_price = DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    idempotency_key = CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            Index(fields=["room", "check_in", "check_out"]),
+            Index(fields=["check_in"]),
+            Index(fields=["check_out"]),
+        ]
 
     def __str__(self):
-        return f"Booking by {self.user.full_name} for {self.room.room_number} from {self.check_in} to {self.check_out}"
+        user = self.user.full_name if self.user_id else "deleted user"
+        room = self.room.room_number if self.room_id else "deleted room"
+        return f"Booking by {user} for {room} from {self.check_in} to {self.check_out}"
+
+    @staticmethod
+    def price_for(check_in, check_out, price_per_night):
+        duration = check_out - check_in
+        seconds = Decimal(duration.days * 86400 + duration.seconds) + Decimal(duration.microseconds) / 1000000
+        return (seconds / 86400 * price_per_night).quantize(CENT, ROUND_HALF_UP)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        booking = super().from_db(db, field_names, values)
+        booking._remember_stay()
+        return booking
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_stay()
+
+    def _remember_stay(self):
+        # Skipped when one of the fields is deferred; stored_stay() then returns None.
+        if all(name in self.__dict__ for name in ("room_id", "check_in", "check_out")):
+            self._stored_stay = (self.room_id, self.check_in, self.check_out)
+
+    def stored_stay(self):
+        return getattr(self, "_stored_stay", None)
 
     def save(self, *args, **kwargs):
-        duration = Decimal((self.check_out - self.check_in).total_seconds() / 86400)
-        self.total_price = duration * self.room.price_per_night
+        self.total_price = self.price_for(self.check_in, self.check_out, self.room.price_per_night)
         super().save(*args, **kwargs)
+        self._remember_stay()
+
+
+class ArchivedBooking(Model):
+    """
+    Model storing a completed booking moved out of ``Booking`` by ``archive_bookings``.
+
+    Keeps the booking's id and the columns reports need, so the hot table
+    only holds recent and upcoming stays.
+
+    Attributes:
+        id (int): The id the booking had in ``Booking``.
+        user (User): The user who made the booking.
+        room (Room): The room booked.
+        check_in (datetime): The check-in date and time.
+        check_out (datetime): The check-out date and time.
+        total_price (Decimal): The total price paid for the booking.
+        created_at (datetime): When the booking was made.
+        archived_at (datetime): When the booking was moved to the archive.
+    """
+
+    id = BigIntegerField(primary_key=True)
+    user = ForeignKey("User", SET_NULL, "archived_bookings", null=True, blank=True)
+    room = ForeignKey("Room", SET_NULL, "archived_bookings", null=True, blank=True)
+    check_in = DateTimeField()
+    check_out = DateTimeField()
+    total_price = DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    created_at = DateTimeField()
+    archived_at = DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            Index(fields=["room", "check_in", "check_out"]),
+            # With the id, as the changelist breaks ties by primary key.
+            Index(fields=["check_in", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Archived booking {self.pk} for {self.room_id} from {self.check_in} to {self.check_out}"
+
+
+class NotificationOutbox(CreatedBaseModel):
+    """
+    Model representing a pending Telegram notification for a single chat.
+
+    Rows are written in the same transaction as the booking they describe and
+    delivered later by the ``send_notifications`` management command.
+
+    Attributes:
+        chat_id (str): The Telegram chat the message is addressed to.
+        message (str): The Markdown formatted message text.
+        status (str): Delivery state chosen from predefined choices.
+        attempts (int): How many delivery attempts have been made.
+        next_attempt_at (datetime): Earliest time the row may be picked up again.
+        last_error (str): The error returned by the last failed attempt.
+        sent_at (datetime): When the message was accepted by Telegram.
+        claim_token (str): Identifies the batch that last claimed the row; see ``apps.notifications.claim_batch``.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    ]
+    chat_id = CharField(max_length=64)
+    message = TextField()
+    status = CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = PositiveSmallIntegerField(default=0)
+    next_attempt_at = DateTimeField(default=timezone.now)
+    last_error = TextField(blank=True, default="")
+    sent_at = DateTimeField(blank=True, null=True)
+    claim_token = CharField(max_length=32, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"Notification to {self.chat_id} ({self.status})"
+
+
+class RoomCalendar(Model):
+    """
+    Model storing one year of a room's occupancy as a bitmap of nights.
+
+    Bit ``n`` (least significant bit first) is set when the night starting on
+    day ``n`` of the year, counted from zero, is covered by a booking.
+
+    Attributes:
+        room (Room): The room the calendar belongs to.
+        year (int): The calendar year the bitmap covers.
+        days (bytes): 46 bytes, one bit per day of the year.
+    """
+
+    room = ForeignKey("Room", CASCADE, "calendars")
+    year = PositiveSmallIntegerField()
+    days = BinaryField(max_length=46)
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=["room", "year"], name="unique_room_calendar_year")]
+
+    def __str__(self):
+        return f"Calendar for {self.room_id} in {self.year}"
+
+
+class DailyRollup(Model):
+    """
+    Model storing what one room sold on one day, maintained from its bookings.
+
+    A stay's price is spread evenly over its nights, so summing ``revenue``
+    over any range of days gives the revenue earned in that range.
+
+    Attributes:
+        room (Room): The room the figures belong to.
+        room_type (str): The room's type, copied so reports can group without a join.
+        day (date): The local date whose night the figures cover.
+        nights (int): Nights sold, normally 0 or 1.
+        revenue (Decimal): The share of booking prices earned that night.
+        bookings (int): Bookings checking in on that day.
+    """
+
+    room = ForeignKey("Room", CASCADE, "rollups")
+    room_type = CharField(max_length=50, choices=Room.ROOM_TYPE_CHOICES)
+    day = DateField()
+    nights = PositiveIntegerField(default=0)
+    revenue = DecimalField(max_digits=12, decimal_places=2, default=0)
+    bookings = PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=["room", "day"], name="unique_room_rollup_day")]
+        verbose_name_plural = "occupancy and revenue"
+
+    def __str__(self):
+        return f"Rollup for {self.room_id} on {self.day}"
+
+
+class RoomTypeRollup(Model):
+    """
+    Model storing the daily rollups of all rooms of one type, summed.
+
+    Kept in step with ``DailyRollup`` so reports read at most one row per
+    room type and day, whatever the number of rooms.
+
+    Attributes:
+        room_type (str): The room type the figures belong to.
+        day (date): The local date whose night the figures cover.
+        nights (int): Nights sold across rooms of this type.
+        revenue (Decimal): Revenue earned that night across rooms of this type.
+        bookings (int): Bookings checking in on that day.
+    """
+
+    room_type = CharField(max_length=50, choices=Room.ROOM_TYPE_CHOICES)
+    day = DateField()
+    nights = PositiveIntegerField(default=0)
+    revenue = DecimalField(max_digits=14, decimal_places=2, default=0)
+    bookings = PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=["day", "room_type"], name="unique_room_type_rollup_day")]
+
+    def __str__(self):
+        return f"Rollup for {self.room_type} on {self.day}"
+
+
+class SearchDocument(Model):
+    """
+    Model storing the searchable text of one room, user or booking.
+
+    Kept in step with the rows it describes by ``apps.search`` and indexed
+    for substring search: trigrams on PostgreSQL, an FTS5 table on SQLite.
+
+    Attributes:
+        kind (str): Which model the document describes, chosen from predefined choices.
+        object_id (int): Primary key of the described row.
+        title (str): The text results are mostly found by, such as names and room numbers; ranked higher.
+        body (str): Further text to match, such as descriptions and email addresses.
+    """
+
+    ROOM = "room"
+    USER = "user"
+    BOOKING = "booking"
+
+    KIND_CHOICES = [
+        (ROOM, "Room"),
+        (USER, "User"),
+        (BOOKING, "Booking"),
+    ]
+    kind = CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = PositiveBigIntegerField()
+    title = TextField(blank=True, default="")
+    body = TextField(blank=True, default="")
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=["kind", "object_id"], name="unique_search_document")]
+
+    def __str__(self):
+        return f"Search document for {self.kind} {self.object_id}"
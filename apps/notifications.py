@@ -0,0 +1,221 @@
+import logging
+import math
+import os
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps import metrics
+from apps.models import NotificationOutbox
+
+TELEGRAM_API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+
+CONNECT_TIMEOUT = float(os.environ.get("TELEGRAM_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.environ.get("TELEGRAM_READ_TIMEOUT", 10))
+MAX_ATTEMPTS = int(os.environ.get("TELEGRAM_MAX_ATTEMPTS", 8))
+BACKOFF_BASE = 2
+BACKOFF_MAX = 15 * 60
+# Added to the worst case delivery time of a batch, for the database round trips around it.
+CLAIM_MARGIN = timedelta(seconds=30)
+
+logger = logging.getLogger(__name__)
+
+_session = None
+
+
+def get_chat_ids():
+    """Return the Telegram chat ids configured in ``TELEGRAM_USER_IDS``."""
+    return os.environ.get("TELEGRAM_USER_IDS", "").split()
+
+
+def enqueue_message(message):
+    """
+    Store one outbox row per configured chat.
+
+    Must be called inside the transaction that creates the booking so the
+    notification is only ever delivered for committed bookings.
+    """
+    return NotificationOutbox.objects.bulk_create(
+        [NotificationOutbox(chat_id=chat_id, message=message) for chat_id in get_chat_ids()]
+    )
+
+
+def get_session(pool_size=10):
+    """Return a process wide ``requests.Session`` with a pooled adapter."""
+    global _session
+    if _session is None:
+        # Imported here: web workers only enqueue messages and need not load requests.
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        adapter.send = metrics.time_outbound(adapter.send)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with full jitter, capped at ``BACKOFF_MAX`` seconds."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE ** attempts))
+
+
+class DeliveryError(Exception):
+    """
+    Raised when Telegram did not accept a message.
+
+    Attributes:
+        retry_after (float): Seconds to wait before retrying, or None to use backoff.
+        permanent (bool): True if retrying the same request cannot succeed.
+    """
+
+    def __init__(self, message, retry_after=None, permanent=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+
+def send_message(chat_id, message, session=None):
+    """Send a single message, raising ``DeliveryError`` on any failure."""
+    from requests.exceptions import RequestException
+
+    session = session or get_session()
+    url = TELEGRAM_API_URL.format(token=os.environ.get("BOT_TOKEN"))
+    payload = {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}
+    try:
+        response = session.post(url, json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    except RequestException as e:
+        raise DeliveryError(f"Request to Telegram API failed: {e}") from e
+
+    if response.status_code == 429:
+        raise DeliveryError("Rate limited by Telegram API", retry_after=_retry_after(response))
+    if response.status_code >= 500:
+        raise DeliveryError(f"Telegram API returned {response.status_code}")
+    if response.status_code >= 400:
+        raise DeliveryError(
+            f"Telegram API rejected message: {response.status_code} {response.text[:500]}",
+            permanent=True,
+        )
+
+
+def _retry_after(response):
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def claim_lease(batch_size, workers):
+    """
+    How long a batch may take to deliver when every request runs into its timeouts.
+
+    ``workers`` requests run at a time, so a batch takes at most
+    ``ceil(batch_size / workers)`` rounds of ``CONNECT_TIMEOUT + READ_TIMEOUT``.
+    """
+    rounds = math.ceil(batch_size / max(1, workers))
+    return timedelta(seconds=rounds * (CONNECT_TIMEOUT + READ_TIMEOUT)) + CLAIM_MARGIN
+
+
+def claim_batch(batch_size, workers=1):
+    """
+    Lease up to ``batch_size`` due rows to this worker.
+
+    Rows are pushed ``claim_lease`` into the future so other workers skip them;
+    if this worker dies mid-batch the rows simply become due again. Every
+    claim stamps the rows with a fresh ``claim_token``, so that a worker
+    outliving its lease cannot overwrite the outcome of a newer claim; see
+    ``record_results``.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=NotificationOutbox.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        if rows:
+            NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                next_attempt_at=now + claim_lease(batch_size, workers), claim_token=token
+            )
+            for row in rows:
+                row.claim_token = token
+    return rows
+
+
+def _deliver(row, session):
+    try:
+        send_message(row.chat_id, row.message, session=session)
+    except DeliveryError as e:
+        return row, e
+    return row, None
+
+
+def drain_outbox(batch_size=100, workers=8):
+    """
+    Deliver one batch of due notifications concurrently.
+
+    Returns a ``(sent, retried, failed)`` tuple of counts for the batch.
+    """
+    rows = claim_batch(batch_size, workers)
+    if not rows:
+        return 0, 0, 0
+
+    session = get_session(pool_size=workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda row: _deliver(row, session), rows))
+    return record_results(results)
+
+
+def record_results(results):
+    """
+    Store the outcome of ``(row, error)`` delivery results and return ``(sent, retried, failed)`` counts.
+
+    Only rows still holding the claim they were delivered under are written;
+    the others were reclaimed by another worker after the lease ran out.
+    """
+    now = timezone.now()
+    sent = retried = failed = 0
+    for row, error in results:
+        row.attempts += 1
+        row.updated_at = now
+        if error is None:
+            row.status = NotificationOutbox.SENT
+            row.sent_at = now
+            row.last_error = ""
+            sent += 1
+        elif error.permanent or row.attempts >= MAX_ATTEMPTS:
+            row.status = NotificationOutbox.FAILED
+            row.last_error = str(error)
+            failed += 1
+        else:
+            delay = error.retry_after if error.retry_after is not None else backoff_delay(row.attempts)
+            row.next_attempt_at = now + timedelta(seconds=delay)
+            row.last_error = str(error)
+            retried += 1
+
+    with transaction.atomic():
+        held = set(
+            NotificationOutbox.objects.select_for_update()
+            .filter(pk__in=[row.pk for row, _ in results])
+            .values_list("pk", "claim_token")
+        )
+        rows = [row for row, _ in results if (row.pk, row.claim_token) in held]
+        if len(rows) < len(results):
+            logger.warning(
+                "%d notifications were reclaimed before their delivery was recorded", len(results) - len(rows)
+            )
+        NotificationOutbox.objects.bulk_update(
+            rows, ["status", "attempts", "next_attempt_at", "last_error", "sent_at", "updated_at"]
+        )
+    return sent, retried, failed
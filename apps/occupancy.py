@@ -0,0 +1,165 @@
+from base64 import b64encode
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.models import ArchivedBooking, Booking, RoomCalendar
+
+BITMAP_SIZE = 46  # 366 days rounded up to whole bytes
+
+
+def stay_nights(check_in, check_out, tz=None):
+    """
+    Return the ``[first, last)`` range of local dates whose nights a stay covers.
+
+    A stay that starts and ends on the same day still occupies that day.
+    Pass ``tz`` when converting many stays to skip the per-call current
+    timezone lookup.
+    """
+    first = timezone.localtime(check_in, tz).date()
+    last = timezone.localtime(check_out, tz).date()
+    return first, max(last, first + timedelta(days=1))
+
+
+def day_index(day):
+    return day.toordinal() - date(day.year, 1, 1).toordinal()
+
+
+def set_nights(bitmaps, first, last):
+    """Set the bits for ``[first, last)`` in a ``{year: bytearray}`` mapping."""
+    day = first
+    while day < last:
+        bitmap = bitmaps.get(day.year)
+        if bitmap is None:
+            bitmap = bitmaps[day.year] = bytearray(BITMAP_SIZE)
+        index = day_index(day)
+        bitmap[index >> 3] |= 1 << (index & 7)
+        day += timedelta(days=1)
+
+
+def clear_nights(bitmaps, first, last):
+    """Clear the bits for ``[first, last)`` in a ``{year: bytearray}`` mapping."""
+    day = first
+    while day < last:
+        if day.year in bitmaps:
+            index = day_index(day)
+            bitmaps[day.year][index >> 3] &= ~(1 << (index & 7)) & 0xFF
+        day += timedelta(days=1)
+
+
+def refresh_room_calendar(room_id, first, last):
+    """
+    Recompute the nights ``[first, last)`` of one room's calendar.
+
+    Only the bookings overlapping that window are read, so saving or deleting
+    a booking costs one indexed range query plus one row per touched year.
+    """
+    if room_id is None:
+        return
+    window_start = timezone.make_aware(datetime.combine(first - timedelta(days=1), time.min))
+    window_end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+    stays = Booking.objects.filter(
+        room_id=room_id, check_in__lt=window_end, check_out__gt=window_start
+    ).values_list("check_in", "check_out")
+
+    with transaction.atomic():
+        years = range(first.year, (last - timedelta(days=1)).year + 1)
+        calendars = {
+            calendar.year: calendar
+            for calendar in RoomCalendar.objects.select_for_update().filter(room_id=room_id, year__in=years)
+        }
+        bitmaps = {
+            year: bytearray(calendars[year].days) if year in calendars else bytearray(BITMAP_SIZE)
+            for year in years
+        }
+
+        clear_nights(bitmaps, first, last)
+        for check_in, check_out in stays:
+            stay_first, stay_last = stay_nights(check_in, check_out)
+            set_nights(bitmaps, max(stay_first, first), min(stay_last, last))
+
+        for year, bitmap in bitmaps.items():
+            if year in calendars:
+                calendars[year].days = bytes(bitmap)
+                calendars[year].save(update_fields=["days"])
+            elif any(bitmap):
+                RoomCalendar.objects.create(room_id=room_id, year=year, days=bytes(bitmap))
+
+
+def mark_stays(stays):
+    """
+    Set the nights of freshly inserted ``(room_id, check_in, check_out)`` stays.
+
+    Adding bookings only ever sets bits, so unlike ``refresh_room_calendar``
+    this reads no bookings: one query fetches the touched calendars and two
+    more write them back, however many rooms the stays cover.
+    """
+    tz = timezone.get_current_timezone()
+    bitmaps = defaultdict(dict)
+    for room_id, check_in, check_out in stays:
+        set_nights(bitmaps[room_id], *stay_nights(check_in, check_out, tz))
+    if not bitmaps:
+        return
+
+    years = {year for room_years in bitmaps.values() for year in room_years}
+    with transaction.atomic():
+        changed = []
+        for calendar in RoomCalendar.objects.select_for_update().filter(room_id__in=bitmaps, year__in=years):
+            bitmap = bitmaps[calendar.room_id].pop(calendar.year, None)
+            if bitmap is not None:
+                calendar.days = bytes(old | new for old, new in zip(bytes(calendar.days), bitmap))
+                changed.append(calendar)
+        RoomCalendar.objects.bulk_update(changed, ["days"])
+        RoomCalendar.objects.bulk_create(
+            RoomCalendar(room_id=room_id, year=year, days=bytes(bitmap))
+            for room_id, room_years in bitmaps.items()
+            for year, bitmap in room_years.items()
+        )
+
+
+def rebuild_calendars(room_ids=None, batch_size=2000):
+    """
+    Rebuild calendars from scratch by streaming every booking once.
+
+    Archived bookings are included, as archiving leaves their nights in the
+    calendars. Returns the number of calendar rows written.
+    """
+    filters = {"room_id__in": room_ids} if room_ids else {"room__isnull": False}
+    fields = ("room_id", "check_in", "check_out")
+    stays = (
+        Booking.objects.filter(**filters)
+        .values_list(*fields)
+        .union(ArchivedBooking.objects.filter(**filters).values_list(*fields), all=True)
+    )
+
+    tz = timezone.get_current_timezone()
+    bitmaps = defaultdict(dict)
+    for room_id, check_in, check_out in stays.iterator(chunk_size=batch_size):
+        set_nights(bitmaps[room_id], *stay_nights(check_in, check_out, tz))
+
+    calendars = [
+        RoomCalendar(room_id=room_id, year=year, days=bytes(bitmap))
+        for room_id, years in bitmaps.items()
+        for year, bitmap in years.items()
+    ]
+    with transaction.atomic():
+        existing = RoomCalendar.objects.all()
+        if room_ids:
+            existing = existing.filter(room_id__in=room_ids)
+        existing.delete()
+        RoomCalendar.objects.bulk_create(calendars, batch_size=batch_size)
+    return len(calendars)
+
+
+def room_calendar_payload(room_id, years):
+    """Return the JSON-ready calendar of a room as base64 bitmaps per year."""
+    stored = dict(RoomCalendar.objects.filter(room_id=room_id, year__in=years).values_list("year", "days"))
+    return {
+        "room": room_id,
+        "years": [
+            {"year": year, "days": b64encode(bytes(stored.get(year, bytes(BITMAP_SIZE)))).decode()}
+            for year in years
+        ],
+    }
@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from apps import catalogue
+from apps.models import Booking, Room
+from apps.rollups import reprice_stays, update_rows
+
+PRICE = DecimalField(max_digits=10, decimal_places=2)
+# 1 + percent / 100; percentages have two decimal places, so the factor has four.
+FACTOR = DecimalField(max_digits=10, decimal_places=4)
+
+
+def set_availability(rooms, available):
+    """
+    Open or close the ``rooms`` queryset in a single ``UPDATE``.
+
+    Rooms already in that state are left alone. Returns the number of rooms
+    changed.
+    """
+    with transaction.atomic():
+        changed = rooms.exclude(is_available=available).update(is_available=available)
+        if changed:
+            transaction.on_commit(catalogue.bump_version)
+    return changed
+
+
+def new_price(percent=None, amount=None):
+    """
+    The expression of ``price_per_night`` raised by ``percent`` or by ``amount``; negative values lower it.
+
+    Prices are rounded to cents and never drop below zero.
+    """
+    if (percent is None) == (amount is None):
+        raise ValueError("Give either a percentage or an amount")
+    if percent is not None:
+        price = F("price_per_night") * Value(1 + Decimal(percent) / 100, output_field=FACTOR)
+    else:
+        price = F("price_per_night") + Value(Decimal(amount), output_field=PRICE)
+    return Greatest(Round(price, 2, output_field=PRICE), Value(Decimal(0), output_field=PRICE))
+
+
+def reprice_rooms(rooms, percent=None, amount=None):
+    """
+    Change the nightly price of the ``rooms`` queryset in a single ``UPDATE``; see ``new_price``.
+
+    Booked stays keep their price until ``recompute_totals`` is run. Returns
+    the ids of the repriced rooms.
+    """
+    price = new_price(percent, amount)
+    with transaction.atomic():
+        room_ids = list(rooms.order_by().values_list("pk", flat=True))
+        if room_ids:
+            Room.objects.filter(pk__in=room_ids).update(price_per_night=price)
+            transaction.on_commit(catalogue.bump_version)
+    return room_ids
+
+
+def recompute_totals(room_ids, since=None, batch_size=1000):
+    """
+    Reprice the bookings of ``room_ids`` checking in from ``since`` (now by default) at today's room rates.
+
+    Bookings are read in primary key order, one transaction per batch. The
+    changed prices of a batch are written with a single ``UPDATE`` joined to
+    a ``VALUES`` list, rather than ``save()`` and its signals or the
+    ``CASE`` that ``bulk_update`` compiles per row, and the rollups move
+    their revenue with them. Returns the number of bookings repriced.
+    """
+    since = since or timezone.now()
+    bookings = Booking.objects.filter(room_id__in=room_ids, check_in__gte=since).order_by("pk")
+    fields = ("pk", "room_id", "room__room_type", "check_in", "check_out", "total_price", "room__price_per_night")
+    repriced, last = 0, 0
+    while True:
+        with transaction.atomic():
+            rows = list(bookings.select_for_update(of=("self",)).filter(pk__gt=last).values_list(*fields)[:batch_size])
+            if not rows:
+                break
+            changed, stays = [], []
+            for pk, room_id, room_type, check_in, check_out, old_total, price_per_night in rows:
+                total = Booking.price_for(check_in, check_out, price_per_night)
+                if total != old_total:
+                    changed.append((total, pk))
+                    stays.append((room_id, room_type, check_in, check_out, old_total, total))
+            update_rows(Booking, "total_price = v.total_price", ("total_price", "id"), ("id",), changed)
+            reprice_stays(stays)
+        repriced += len(changed)
+        last = rows[-1][0]
+    return repriced
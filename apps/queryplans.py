@@ -0,0 +1,137 @@
+import re
+from datetime import datetime, time, timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.models import Room, User
+
+SQLITE_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\S+)$")
+SQLITE_SORT = re.compile(r"USE TEMP B-TREE FOR (.+)$")
+POSTGRESQL_SCAN = re.compile(r"Seq Scan on (\S+)")
+POSTGRESQL_SORT = re.compile(r"^\s*(?:->\s*)?((?:Incremental )?Sort)\b")
+
+# A fresh local cache, so cached pages such as the room grid hit the database.
+EMPTY_CACHE = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "queryplans"}
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min)).isoformat(" ")
+
+
+def pages(room_id, room_type, today):
+    """
+    ``(name, url, allowed)`` of the public and admin pages whose queries are checked.
+
+    ``allowed`` lists findings accepted for that page.
+    """
+    stay = {"check_in": f"{today + timedelta(days=30)}T14:00", "check_out": f"{today + timedelta(days=33)}T12:00"}
+    month = {"__gte": _midnight(today.replace(day=1)), "__lt": _midnight(today + timedelta(days=1))}
+    return [
+        ("index", "/", ()),
+        ("booking", f"/booking/?room_id={room_id}", ()),
+        ("availability", f"/rooms/available/?{urlencode(stay)}", ()),
+        ("availability by type", f"/api/rooms/available/?{urlencode({**stay, 'room_type': room_type})}", ()),
+        ("room calendar", f"/api/rooms/{room_id}/calendar/", ()),
+        ("user autocomplete", "/api/users/autocomplete/?cursor=1000000000", ()),
+        ("room autocomplete", "/api/rooms/autocomplete/?cursor=1000000000", ()),
+        # Matches are ranked, so they are sorted; the search itself is an index lookup.
+        ("room search", f"/api/rooms/search/?{urlencode({'q': room_type})}", ("sort (order by)",)),
+        ("admin rooms", "/admin/apps/room/", ()),
+        (
+            "admin rooms by type",
+            f"/admin/apps/room/?{urlencode({'room_type': room_type, 'is_available__exact': 1})}",
+            (),
+        ),
+        ("admin bookings", "/admin/apps/booking/", ()),
+        ("admin bookings search", f"/admin/apps/booking/?{urlencode({'q': room_type})}", ("sort (order by)",)),
+        (
+            "admin bookings by check-in",
+            f"/admin/apps/booking/?{urlencode({f'check_in{key}': value for key, value in month.items()})}",
+            (),
+        ),
+        (
+            "admin bookings by check-out",
+            f"/admin/apps/booking/?{urlencode({f'check_out{key}': value for key, value in month.items()})}",
+            # The list is ordered by check-in, so the filtered rows (a month at most) are sorted.
+            ("sort (order by)",),
+        ),
+        ("admin archived bookings", "/admin/apps/archivedbooking/", ()),
+        ("admin users", "/admin/apps/user/", ()),
+        ("admin occupancy", "/admin/apps/dailyrollup/", ()),
+    ]
+
+
+def explain(sql):
+    """Plan lines the database reports for an already interpolated ``sql`` statement."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        rows = cursor.fetchall()
+    if connection.vendor == "sqlite":
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def findings(sql, plan):
+    """
+    Return what is wrong with a plan: ``"sequential scan of <table>"`` and ``"sort (<detail>)"``.
+
+    Scans are only reported for statements with a ``WHERE`` clause; reading a
+    whole table is expected for unfiltered counts and primary key pages.
+    """
+    if connection.vendor == "sqlite":
+        scan, sort = SQLITE_SCAN, SQLITE_SORT
+    elif connection.vendor == "postgresql":
+        scan, sort = POSTGRESQL_SCAN, POSTGRESQL_SORT
+    else:
+        raise NotImplementedError(f"Query plans are not checked on {connection.vendor}")
+
+    found = []
+    filtered = " WHERE " in sql.upper()
+    for line in plan:
+        line = line.strip()
+        match = scan.search(line)
+        if match and filtered:
+            found.append(f"sequential scan of {match.group(1)}")
+        match = sort.search(line)
+        if match:
+            found.append(f"sort ({match.group(1).lower()})")
+    return found
+
+
+def check_pages(urls=None):
+    """
+    Request every page as a superuser and explain each ``SELECT`` it issued.
+
+    Returns ``{"page", "url", "sql", "plan", "findings"}`` dicts, leaving out
+    the page's allowed findings. Everything
+    runs in a transaction that is rolled back, so the temporary superuser,
+    its session and anything a page writes are discarded.
+    """
+    results = []
+    with transaction.atomic(), override_settings(CACHES={**settings.CACHES, "default": EMPTY_CACHE}):
+        admin = User.objects.create_superuser(username="queryplan-admin", password=None, email="")
+        client = Client()
+        client.force_login(admin)
+        if urls is None:
+            room = Room.objects.order_by("pk").only("pk", "room_type").first()
+            urls = pages(room.pk if room else 1, room.room_type if room else "", timezone.localdate())
+
+        for name, url, allowed in urls:
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{name} ({url}) returned {response.status_code}")
+            for query in captured.captured_queries:
+                sql = query["sql"]
+                if not sql.lstrip().upper().startswith("SELECT"):
+                    continue
+                plan = explain(sql)
+                found = [finding for finding in findings(sql, plan) if finding not in allowed]
+                results.append({"page": name, "url": url, "sql": sql, "plan": plan, "findings": found})
+        transaction.set_rollback(True)
+    return results
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+
+from apps.models import Booking, Room
+
+IDEMPOTENCY_KEY_LENGTH = 64
+
+
+class ReservationError(Exception):
+    """Raised when a booking cannot be made; the message is meant for the guest."""
+
+
+class RoomUnavailable(ReservationError):
+    """The room is already booked for some of the requested nights."""
+
+
+class RoomClosed(ReservationError):
+    """The room has been taken off sale (``Room.is_available`` is False)."""
+
+
+class RoomBusy(ReservationError):
+    """Another reservation held the room's lock for longer than ``RESERVATION_LOCK_TIMEOUT``."""
+
+
+class IdempotencyConflict(ReservationError):
+    """The idempotency key was already used for a different booking."""
+
+
+def lock_room(room_id):
+    """
+    Lock one room for the rest of the transaction, so reservations of other rooms proceed in parallel.
+
+    Databases with row locks use ``SELECT ... FOR UPDATE`` with a lock
+    timeout. SQLite has no row locks: a no-op ``UPDATE`` takes its write lock
+    before the overlap check reads, so concurrent reservations queue on the
+    busy timeout instead of failing to upgrade a read lock. Returns whether
+    the room is open for booking, as read under the lock.
+    """
+    if connection.features.has_select_for_update:
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = %s", [f"{settings.RESERVATION_LOCK_TIMEOUT}ms"])
+        found = list(Room.objects.select_for_update().filter(pk=room_id).values_list("is_available", flat=True))
+        if not found:
+            raise Room.DoesNotExist(f"Room {room_id} does not exist")
+        return found[0]
+    if Room.objects.filter(pk=room_id, is_available=True).update(is_available=F("is_available")):
+        return True
+    # Closed or missing; a closed room is refused, so it need not be locked.
+    if not Room.objects.filter(pk=room_id).exists():
+        raise Room.DoesNotExist(f"Room {room_id} does not exist")
+    return False
+
+
+def reserve(user, room, check_in, check_out, idempotency_key=None, on_created=None):
+    """
+    Book ``room`` for ``[check_in, check_out)`` unless it is taken, returning ``(booking, created)``.
+
+    Serializes only on the room. A retried request with the same
+    ``idempotency_key`` and details returns the booking made by the first one
+    with ``created`` False. Raises ``RoomClosed`` when the room is off sale,
+    ``RoomUnavailable`` for overlapping stays, ``RoomBusy`` when the room
+    stays locked past the timeout and ``IdempotencyConflict`` when the key
+    was used for another booking.
+    ``on_created(booking)`` runs in the same transaction as the insert.
+    """
+    if check_out <= check_in:
+        raise ReservationError("Check-out must be after check-in.")
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_LENGTH:
+        raise ReservationError("Invalid idempotency key.")
+
+    try:
+        with transaction.atomic():
+            is_open = lock_room(room.pk)
+            if idempotency_key:
+                existing = Booking.objects.filter(idempotency_key=idempotency_key).first()
+                if existing is not None:
+                    if (existing.user_id, existing.room_id, existing.check_in, existing.check_out) != (
+                        user.pk, room.pk, check_in, check_out
+                    ):
+                        raise IdempotencyConflict("This request was already used for a different booking.")
+                    return existing, False
+
+            if not is_open:
+                raise RoomClosed(f"Room {room.room_number} is not available for booking.")
+            if Booking.objects.filter(room_id=room.pk, check_in__lt=check_out, check_out__gt=check_in).exists():
+                raise RoomUnavailable(f"Room {room.room_number} is already booked for some of these nights.")
+
+            booking = Booking(
+                user=user, room=room, check_in=check_in, check_out=check_out, idempotency_key=idempotency_key or None
+            )
+            try:
+                with transaction.atomic():
+                    booking.save()
+            except IntegrityError:
+                # The same key was used at the same moment for another room.
+                raise IdempotencyConflict("This request was already used for a different booking.")
+            if on_created is not None:
+                on_created(booking)
+            return booking, True
+    except OperationalError as e:
+        if not is_lock_timeout(e):
+            raise
+        raise RoomBusy(f"Room {room.room_number} is being booked by someone else, please try again.")
+
+
+def is_lock_timeout(error):
+    """Whether an ``OperationalError`` means a lock wait timed out rather than a broken query."""
+    # PostgreSQL's lock_not_available, SQLite's "database is locked" / "database table is locked".
+    return getattr(error.__cause__, "pgcode", None) == "55P03" or "is locked" in str(error)
@@ -0,0 +1,337 @@
+from datetime import datetime, time, timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.models import CENT, ArchivedBooking, Booking, DailyRollup, Room, RoomTypeRollup
+from apps.occupancy import stay_nights
+
+FIGURES = ("nights", "revenue", "bookings")
+STAY_FIELDS = ("room_id", "room__room_type", "check_in", "check_out", "total_price")
+
+
+def night_revenue(total_price, first, last):
+    """
+    Yield ``(day, revenue)`` for the nights ``[first, last)`` of a stay.
+
+    The price is split into whole cents and the remainder is put on the first
+    night, so the nights always add up to the booking's total.
+    """
+    nights = (last - first).days
+    total = total_price or Decimal(0)
+    share = (total / nights).quantize(CENT, ROUND_DOWN)
+    remainder = total - share * nights
+    for offset in range(nights):
+        yield first + timedelta(days=offset), share + remainder if offset == 0 else share
+
+
+def accumulate(figures, stays, tz, first=None, last=None):
+    """
+    Add ``(room_id, room_type, check_in, check_out, total_price)`` stays to ``figures``.
+
+    ``figures`` maps ``(room_id, day)`` to ``[room_type, nights, revenue, bookings]``.
+    With ``first`` and ``last`` only the days in ``[first, last)`` are counted.
+    """
+    for room_id, room_type, check_in, check_out, total_price in stays:
+        stay_first, stay_last = stay_nights(check_in, check_out, tz)
+        for day, revenue in night_revenue(total_price, stay_first, stay_last):
+            if first is not None and not first <= day < last:
+                continue
+            row = figures.get((room_id, day))
+            if row is None:
+                row = figures[room_id, day] = [room_type, 0, Decimal(0), 0]
+            row[1] += 1
+            row[2] += revenue
+            row[3] += day == stay_first
+
+
+def all_stays(**filters):
+    """``STAY_FIELDS`` of the live and the archived bookings matching ``filters``."""
+    return (
+        Booking.objects.filter(**filters)
+        .values_list(*STAY_FIELDS)
+        .union(ArchivedBooking.objects.filter(**filters).values_list(*STAY_FIELDS), all=True)
+    )
+
+
+def update_rows(model, assignments, columns, keys, rows):
+    """
+    Update ``model`` rows from ``rows`` of ``columns`` values in one statement per batch.
+
+    The rows are joined in as a ``VALUES`` list named ``v`` on the ``keys``
+    columns, so ``assignments`` is the ``SET`` clause written against ``v``,
+    e.g. ``"revenue = revenue + v.delta"``. Unlike ``executemany``, which
+    sends one ``UPDATE`` per row, this is a single round trip per batch.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    join = " AND ".join(f"{table}.{connection.ops.quote_name(key)} = v.{key}" for key in keys)
+    placeholders = f"({', '.join(['%s'] * len(columns))})"
+    batch_size = min(1000, (connection.features.max_query_params or 100000) // len(columns))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            cursor.execute(
+                f"WITH v ({', '.join(columns)}) AS (VALUES {', '.join([placeholders] * len(batch))}) "
+                f"UPDATE {table} SET {assignments} FROM v WHERE {join}",
+                [value for row in batch for value in row],
+            )
+
+
+def _add(totals, key, nights, revenue, bookings, sign=1):
+    row = totals.get(key)
+    if row is None:
+        row = totals[key] = [0, Decimal(0), 0]
+    row[0] += sign * nights
+    row[1] += sign * revenue
+    row[2] += sign * bookings
+
+
+def _rollups(figures):
+    return [
+        DailyRollup(room_id=room_id, day=day, room_type=room_type, nights=nights, revenue=revenue, bookings=bookings)
+        for (room_id, day), (room_type, nights, revenue, bookings) in figures.items()
+    ]
+
+
+def apply_type_deltas(deltas):
+    """
+    Add ``{(room_type, day): [nights, revenue, bookings]}`` to the room type rollups.
+
+    One query reads the touched rows and a few write them back; rows left
+    empty are deleted, as a rebuild would not have written them.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    days = [day for _, day in deltas]
+    changed, emptied = [], []
+    existing = RoomTypeRollup.objects.select_for_update().filter(
+        room_type__in={room_type for room_type, _ in deltas}, day__gte=min(days), day__lte=max(days)
+    )
+    for rollup in existing:
+        delta = deltas.pop((rollup.room_type, rollup.day), None)
+        if delta is not None:
+            rollup.nights += delta[0]
+            rollup.revenue += delta[1]
+            rollup.bookings += delta[2]
+            (changed if rollup.nights else emptied).append(rollup)
+    RoomTypeRollup.objects.bulk_update(changed, FIGURES)
+    if emptied:
+        RoomTypeRollup.objects.filter(pk__in=[rollup.pk for rollup in emptied]).delete()
+    RoomTypeRollup.objects.bulk_create(
+        RoomTypeRollup(room_type=room_type, day=day, nights=nights, revenue=revenue, bookings=bookings)
+        for (room_type, day), (nights, revenue, bookings) in deltas.items()
+    )
+
+
+def refresh_room_rollups(room_id, first, last):
+    """
+    Recompute one room's rollups for the days ``[first, last)``.
+
+    Reads only the bookings overlapping that window, the same way
+    ``refresh_room_calendar`` does, and moves the room type totals by the
+    difference.
+    """
+    if room_id is None:
+        return
+    window_start = timezone.make_aware(datetime.combine(first - timedelta(days=1), time.min))
+    window_end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+    window = all_stays(room_id=room_id, check_in__lt=window_end, check_out__gt=window_start)
+
+    figures = {}
+    accumulate(figures, window, timezone.get_current_timezone(), first, last)
+    with transaction.atomic():
+        stored = DailyRollup.objects.select_for_update().filter(room_id=room_id, day__gte=first, day__lt=last)
+        deltas = {}
+        for room_type, day, nights, revenue, bookings in stored.values_list("room_type", "day", *FIGURES):
+            _add(deltas, (room_type, day), nights, revenue, bookings, sign=-1)
+        for (_, day), (room_type, nights, revenue, bookings) in figures.items():
+            _add(deltas, (room_type, day), nights, revenue, bookings)
+
+        stored.delete()
+        DailyRollup.objects.bulk_create(_rollups(figures))
+        apply_type_deltas(deltas)
+
+
+def add_stays(stays):
+    """
+    Add freshly inserted ``(room_id, room_type, check_in, check_out, total_price)`` stays.
+
+    For bulk inserts: a fixed handful of queries however many rooms and days
+    the stays cover.
+    """
+    figures = {}
+    accumulate(figures, stays, timezone.get_current_timezone())
+    if not figures:
+        return
+
+    deltas = {}
+    for (_, day), (room_type, nights, revenue, bookings) in figures.items():
+        _add(deltas, (room_type, day), nights, revenue, bookings)
+
+    days = [day for _, day in figures]
+    with transaction.atomic():
+        changed = []
+        existing = DailyRollup.objects.select_for_update().filter(
+            room_id__in={room_id for room_id, _ in figures}, day__gte=min(days), day__lte=max(days)
+        )
+        for rollup in existing:
+            row = figures.pop((rollup.room_id, rollup.day), None)
+            if row is not None:
+                rollup.nights += row[1]
+                rollup.revenue += row[2]
+                rollup.bookings += row[3]
+                changed.append(rollup)
+        DailyRollup.objects.bulk_update(changed, FIGURES)
+        DailyRollup.objects.bulk_create(_rollups(figures))
+        apply_type_deltas(deltas)
+
+
+def reprice_stays(stays):
+    """
+    Move ``(room_id, room_type, check_in, check_out, old_price, new_price)`` stays to their new price.
+
+    Only the revenue of the nights changes, so the rows are updated in place
+    by their unique keys with one ``update_rows`` statement per table,
+    instead of the ``CASE`` per row and field that ``bulk_update`` builds.
+    """
+    tz = timezone.get_current_timezone()
+    rooms, types = {}, {}
+    for room_id, room_type, check_in, check_out, old_price, new_price in stays:
+        first, last = stay_nights(check_in, check_out, tz)
+        old_nights = night_revenue(old_price, first, last)
+        for (day, revenue), (_, old_revenue) in zip(night_revenue(new_price, first, last), old_nights):
+            if revenue != old_revenue:
+                rooms[room_id, day] = rooms.get((room_id, day), 0) + revenue - old_revenue
+                types[room_type, day] = types.get((room_type, day), 0) + revenue - old_revenue
+    rooms = [(delta, room_id, day) for (room_id, day), delta in rooms.items() if delta]
+    types = [(delta, room_type, day) for (room_type, day), delta in types.items() if delta]
+    if not rooms:
+        return
+
+    with transaction.atomic():
+        update_rows(DailyRollup, "revenue = revenue + v.delta", ("delta", "room_id", "day"), ("room_id", "day"), rooms)
+        update_rows(
+            RoomTypeRollup, "revenue = revenue + v.delta", ("delta", "room_type", "day"), ("room_type", "day"), types
+        )
+
+
+def change_room_type(room_id, room_type):
+    """Move a room's rollups to its new type after the room was edited."""
+    with transaction.atomic():
+        moved = DailyRollup.objects.select_for_update().filter(room_id=room_id).exclude(room_type=room_type)
+        deltas = {}
+        for old_type, day, nights, revenue, bookings in moved.values_list("room_type", "day", *FIGURES):
+            _add(deltas, (old_type, day), nights, revenue, bookings, sign=-1)
+            _add(deltas, (room_type, day), nights, revenue, bookings)
+        if deltas:
+            moved.update(room_type=room_type)
+            apply_type_deltas(deltas)
+
+
+def remove_room(room_id):
+    """Take a room that is about to be deleted out of the room type totals."""
+    with transaction.atomic():
+        deltas = {}
+        stored = DailyRollup.objects.select_for_update().filter(room_id=room_id)
+        for room_type, day, nights, revenue, bookings in stored.values_list("room_type", "day", *FIGURES):
+            _add(deltas, (room_type, day), nights, revenue, bookings, sign=-1)
+        stored.delete()
+        apply_type_deltas(deltas)
+
+
+def rebuild_rollups(room_ids=None, batch_size=2000):
+    """
+    Rebuild rollups from scratch, streaming the bookings one room at a time.
+
+    Archived bookings are included. The room type totals are then summed
+    again from the room rollups. Returns the number of room rollup rows
+    written.
+    """
+    filters = {"room_id__in": room_ids} if room_ids else {"room__isnull": False}
+    booked = all_stays(**filters).order_by("room_id")
+    tz = timezone.get_current_timezone()
+
+    written = 0
+    with transaction.atomic():
+        existing = DailyRollup.objects.all()
+        if room_ids:
+            existing = existing.filter(room_id__in=room_ids)
+        existing.delete()
+
+        figures, current_room = {}, None
+        for stay in booked.iterator(chunk_size=batch_size):
+            if stay[0] != current_room and len(figures) >= batch_size:
+                written += len(DailyRollup.objects.bulk_create(_rollups(figures), batch_size=batch_size))
+                figures = {}
+            current_room = stay[0]
+            accumulate(figures, [stay], tz)
+        written += len(DailyRollup.objects.bulk_create(_rollups(figures), batch_size=batch_size))
+
+        RoomTypeRollup.objects.all().delete()
+        totals = DailyRollup.objects.values("room_type", "day").annotate(
+            total_nights=Sum("nights"), total_revenue=Sum("revenue"), total_bookings=Sum("bookings")
+        )
+        RoomTypeRollup.objects.bulk_create(
+            (
+                RoomTypeRollup(
+                    room_type=row["room_type"],
+                    day=row["day"],
+                    nights=row["total_nights"],
+                    revenue=row["total_revenue"],
+                    bookings=row["total_bookings"],
+                )
+                for row in totals.order_by().iterator(chunk_size=batch_size)
+            ),
+            batch_size=batch_size,
+        )
+    return written
+
+
+def dashboard(first, last, room_type=None):
+    """
+    Return the daily and per room type figures for ``[first, last]``.
+
+    Reads only the room type rollups, at most one row per type and day, so
+    the cost is the same whatever the number of bookings or rooms.
+    """
+    rollups = RoomTypeRollup.objects.filter(day__gte=first, day__lte=last)
+    rooms = Room.objects.all()
+    if room_type:
+        rollups = rollups.filter(room_type=room_type)
+        rooms = rooms.filter(room_type=room_type)
+    room_count = rooms.count()
+
+    totals, by_type = {}, {}
+    for row_type, day, nights, revenue, bookings in rollups.values_list("room_type", "day", *FIGURES):
+        _add(totals, day, nights, revenue, bookings)
+        _add(by_type, row_type, nights, revenue, bookings)
+
+    days = []
+    day = first
+    while day <= last:
+        nights, revenue, bookings = totals.get(day, (0, Decimal(0), 0))
+        days.append(
+            {
+                "day": day.isoformat(),
+                "nights": nights,
+                "revenue": str(revenue),
+                "bookings": bookings,
+                "occupancy": round(100 * nights / room_count, 1) if room_count else 0.0,
+            }
+        )
+        day += timedelta(days=1)
+
+    return {
+        "rooms": room_count,
+        "days": days,
+        "room_types": [
+            {"room_type": row_type, "nights": nights, "revenue": revenue, "bookings": bookings}
+            for row_type, (nights, revenue, bookings) in sorted(by_type.items())
+        ],
+        "nights": sum(row[0] for row in totals.values()),
+        "revenue": sum((row[1] for row in totals.values()), Decimal(0)),
+        "bookings": sum(row[2] for row in totals.values()),
+    }
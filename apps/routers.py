@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_current = ContextVar("replica_reads", default=None)
+
+
+class ReplicaReads:
+    """
+    Routing state of one request.
+
+    Attributes:
+        enabled (bool): Reads may go to the replica.
+        pinned (bool): Something was written, so later reads stay on the primary.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.pinned = False
+
+
+@contextmanager
+def replica_reads(enabled=False):
+    """
+    Track routing state for the code run inside, usually one request.
+
+    The state is shared by reference, so worker threads started with
+    ``sync_to_async`` see a write pinning the request to the primary.
+    """
+    state = ReplicaReads(enabled)
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads of read-only requests to ``REPLICA_DATABASE`` and everything else to the primary.
+
+    Reads go to the replica only inside :func:`replica_reads` with ``enabled``
+    set (see ``ReplicaMiddleware``) and until the first write. Sessions are
+    always read from the primary, so a fresh login is never lost to
+    replication lag. Without a replica configured every query uses the
+    primary.
+    """
+
+    primary_apps = {"sessions"}
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        replica = getattr(settings, "REPLICA_DATABASE", None)
+        if not replica or state is None or not state.enabled or state.pinned:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in self.primary_apps:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Always the primary, even for objects that were read from the replica.
+        state = _current.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == getattr(settings, "REPLICA_DATABASE", None):
+            return False
+        return None
@@ -0,0 +1,157 @@
+from django.db import connections, transaction
+from django.db.models.expressions import RawSQL
+
+from apps.models import Booking, Room, SearchDocument, User
+
+# Shorter terms have no trigram to look up and are matched by scanning the documents.
+MIN_INDEXED_LENGTH = 3
+FTS_TABLE = "apps_searchdocument_fts"
+# How much more a match in the title counts than one in the body when ranking.
+TITLE_WEIGHT = 10.0
+
+# Per kind: the model, then the fields joined into the document's title and body.
+SOURCES = {
+    SearchDocument.ROOM: (Room, ("name", "room_number", "room_type"), ("description",)),
+    SearchDocument.USER: (User, ("first_name", "last_name", "username"), ("email", "phone")),
+    SearchDocument.BOOKING: (
+        Booking,
+        ("user__first_name", "user__last_name", "room__room_number"),
+        ("user__username", "user__email", "room__name"),
+    ),
+}
+
+
+def _join(values):
+    return " ".join(str(value) for value in values if value)
+
+
+def documents(kind, queryset=None, chunk_size=2000):
+    """Yield unsaved ``SearchDocument`` rows for ``queryset``, all rows of the kind's model by default."""
+    model, title, body = SOURCES[kind]
+    if queryset is None:
+        queryset = model.objects.all()
+    rows = queryset.order_by().values_list("pk", *title, *body)
+    for pk, *values in rows.iterator(chunk_size=chunk_size):
+        yield SearchDocument(
+            kind=kind, object_id=pk, title=_join(values[: len(title)]), body=_join(values[len(title) :])
+        )
+
+
+def index(kind, ids, batch_size=2000):
+    """Write the documents of the ``kind`` rows with primary keys ``ids``, replacing stale ones."""
+    model = SOURCES[kind][0]
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        SearchDocument.objects.bulk_create(
+            documents(kind, model.objects.filter(pk__in=ids[start : start + batch_size])),
+            update_conflicts=True,
+            unique_fields=("kind", "object_id"),
+            update_fields=("title", "body"),
+        )
+
+
+def unindex(kind, ids):
+    SearchDocument.objects.filter(kind=kind, object_id__in=list(ids)).delete()
+
+
+def reindex_object(kind, pk):
+    """
+    Refresh one row's document and report whether its title changed.
+
+    Booking documents repeat the guest's and the room's names, so a changed
+    title means the related bookings need refreshing too.
+    """
+    before = SearchDocument.objects.filter(kind=kind, object_id=pk).values_list("title", flat=True).first()
+    index(kind, [pk])
+    after = SearchDocument.objects.filter(kind=kind, object_id=pk).values_list("title", flat=True).first()
+    return before is not None and before != after
+
+
+def rebuild(kinds=None, batch_size=2000):
+    """
+    Recreate the documents of ``kinds`` (all of them by default) from scratch.
+
+    Returns the number of documents written.
+    """
+    written = 0
+    for kind in kinds or SOURCES:
+        with transaction.atomic():
+            SearchDocument.objects.filter(kind=kind).delete()
+            batch = []
+            for document in documents(kind, chunk_size=batch_size):
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    written += len(SearchDocument.objects.bulk_create(batch))
+                    batch = []
+            written += len(SearchDocument.objects.bulk_create(batch))
+    return written
+
+
+def _like(word):
+    escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _matching_sql(vendor, kind, term, ranked=False):
+    """
+    Return ``(sql, params)`` selecting ``d.object_id`` of the ``kind`` documents containing every word of ``term``.
+
+    Words are matched as case-insensitive substrings, like ``icontains``.
+    With ``ranked`` the SQL also selects a ``rank`` column, lower is better.
+    """
+    words = term.split()
+    indexed = [word for word in words if len(word) >= MIN_INDEXED_LENGTH]
+    short = [word for word in words if len(word) < MIN_INDEXED_LENGTH]
+    document = "(d.title || ' ' || d.body)"
+    where, params = ["d.kind = %s"], [kind]
+    rank, rank_params = "0", []
+
+    if vendor == "sqlite" and indexed:
+        # CROSS JOIN keeps SQLite from walking every document of the kind and matching each one.
+        source = f"{FTS_TABLE} CROSS JOIN apps_searchdocument d ON d.id = {FTS_TABLE}.rowid"
+        where.append(f"{FTS_TABLE} MATCH %s")
+        params.append(" AND ".join('"{}"'.format(word.replace('"', '""')) for word in indexed))
+        rank = f"bm25({FTS_TABLE}, {TITLE_WEIGHT}, 1.0)"
+    else:
+        # PostgreSQL's trigram index serves LIKE on the indexed expression.
+        source = "apps_searchdocument d"
+        short = words
+        if vendor == "postgresql" and indexed:
+            rank = f"-({TITLE_WEIGHT} * word_similarity(%s, d.title) + word_similarity(%s, d.body))"
+            rank_params = [" ".join(indexed)] * 2
+    for word in short:
+        where.append(f"{document} {'ILIKE' if vendor == 'postgresql' else 'LIKE'} %s ESCAPE '\\'")
+        params.append(_like(word))
+
+    if ranked:
+        return f"SELECT d.object_id, {rank} AS rank FROM {source} WHERE {' AND '.join(where)}", rank_params + params
+    return f"SELECT d.object_id FROM {source} WHERE {' AND '.join(where)}", params
+
+
+def filter_queryset(queryset, kind, term):
+    """Narrow ``queryset`` to the rows whose ``kind`` document contains every word of ``term``."""
+    if not term.split():
+        return queryset
+    vendor = connections[queryset.db].vendor
+    sql, params = _matching_sql(vendor, kind, term)
+    return queryset.filter(pk__in=RawSQL(sql, params))
+
+
+def search_rooms(term, limit=20, using="default"):
+    """
+    Ids of available rooms matching ``term``, best match first.
+
+    Matches in the room's name, number or type rank above matches in its
+    description.
+    """
+    if not term.split():
+        return []
+    connection = connections[using]
+    sql, params = _matching_sql(connection.vendor, SearchDocument.ROOM, term, ranked=True)
+    sql = (
+        f"SELECT m.object_id FROM ({sql}) m JOIN apps_room r ON r.id = m.object_id "
+        f"WHERE r.is_available ORDER BY m.rank, m.object_id LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return [row[0] for row in cursor.fetchall()]
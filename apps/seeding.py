@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import random
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from faker import Faker
+
+from apps.models import Booking, Room, User
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+DERIVATIVE_NAME = re.compile(r"\.(w\d+|placeholder)\.webp$")
+ROOM_TYPES = [choice for choice, _ in Room.ROOM_TYPE_CHOICES]
+CHECK_IN_TIME = time(14)
+CHECK_OUT_TIME = time(12)
+STAY_NIGHTS = (1, 2, 3, 4, 5, 7, 10, 14)
+STAY_WEIGHTS = (20, 25, 18, 12, 9, 9, 4, 3)
+GAP_DAYS = (0, 1, 2, 3, 5, 8, 13, 21)
+GAP_WEIGHTS = (25, 20, 15, 12, 10, 8, 6, 4)
+
+_fake = None
+_user_ids = None
+
+
+def _generators(seed, kind, index):
+    """
+    Return a ``(random.Random, Faker)`` pair seeded for one batch.
+
+    Seeding per batch rather than per process makes the generated data
+    depend only on ``seed`` and the batch layout, not on the worker count.
+    """
+    global _fake
+    if _fake is None:
+        _fake = Faker()
+    _fake.seed_instance(f"{seed}-{kind}-{index}")
+    return random.Random(f"{seed}-{kind}-{index}"), _fake
+
+
+def room_number(number):
+    """``Room-<n>`` like the hand-made rooms, shortened once it would overflow the column."""
+    label = f"Room-{number}"
+    return label if len(label) <= Room._meta.get_field("room_number").max_length else f"R{number}"
+
+
+def source_images(folder):
+    """Image files in ``folder``, skipping the WebP renditions rendered from them."""
+    return sorted(
+        filename
+        for filename in os.listdir(folder)
+        if filename.lower().endswith(IMAGE_EXTENSIONS) and not DERIVATIVE_NAME.search(filename)
+    )
+
+
+def store_seed_images(folder):
+    """Save every source image in ``folder`` to storage once and return the stored names."""
+    names = []
+    for filename in source_images(folder):
+        with open(os.path.join(folder, filename), "rb") as f:
+            upload_to = Room._meta.get_field("image").generate_filename(None, filename)
+            names.append(default_storage.save(upload_to, ContentFile(f.read(), name=filename)))
+    return names
+
+
+def seed_users(seed, index, first_number, count, password_hash):
+    """Insert ``count`` users sharing one precomputed password hash."""
+    rng, fake = _generators(seed, "users", index)
+    users = []
+    for number in range(first_number, first_number + count):
+        first_name, last_name = fake.first_name(), fake.last_name()
+        username = f"{fake.user_name()}.{number}"
+        users.append(
+            User(
+                username=username,
+                password=password_hash,
+                email=f"{username}@{fake.free_email_domain()}",
+                first_name=first_name,
+                last_name=last_name,
+                is_superuser=False,
+                is_staff=True,
+                date_joined=timezone.now() - timedelta(days=rng.randrange(1000)),
+            )
+        )
+    User.objects.bulk_create(users)
+    return len(users)
+
+
+def seed_rooms(seed, index, first_number, count, image_names):
+    rng, fake = _generators(seed, "rooms", index)
+    rooms = [
+        Room(
+            room_number=room_number(number),
+            name=fake.catch_phrase(),
+            room_type=rng.choice(ROOM_TYPES),
+            description=fake.paragraph(),
+            price_per_night=Decimal(rng.randrange(5000, 50001)) / 100,
+            image=rng.choice(image_names),
+            is_available=rng.choice([True, False]),
+        )
+        for number in range(first_number, first_number + count)
+    ]
+    Room.objects.bulk_create(rooms)
+    return len(rooms)
+
+
+def seed_bookings(seed, index, rooms):
+    """
+    Insert back-to-back, non-overlapping stays for each ``(room_id, price, first_day, count)``.
+
+    Guests check in at 14:00 and out at 12:00, so a stay may start on the day
+    the previous one ends. Booking ``user`` ids are drawn from the ids handed
+    to the worker by :func:`_init_worker`.
+    """
+    rng, _ = _generators(seed, "bookings", index)
+    tz = timezone.get_current_timezone()
+    bookings = []
+    for room_id, price, day, count in rooms:
+        for _ in range(count):
+            day += timedelta(days=rng.choices(GAP_DAYS, GAP_WEIGHTS)[0])
+            nights = rng.choices(STAY_NIGHTS, STAY_WEIGHTS)[0]
+            check_in = datetime.combine(day, CHECK_IN_TIME, tzinfo=tz)
+            day += timedelta(days=nights)
+            check_out = datetime.combine(day, CHECK_OUT_TIME, tzinfo=tz)
+            bookings.append(
+                Booking(
+                    user_id=rng.choice(_user_ids),
+                    room_id=room_id,
+                    check_in=check_in,
+                    check_out=check_out,
+                    total_price=Booking.price_for(check_in, check_out, price),
+                )
+            )
+    Booking.objects.bulk_create(bookings)
+    return len(bookings)
+
+
+def _init_worker(user_ids):
+    global _user_ids
+    _user_ids = user_ids
+
+
+def _run(task):
+    function, args = task
+    return function(*args)
+
+
+def run_tasks(tasks, workers=1, user_ids=None):
+    """
+    Run ``(function, args)`` tasks inline or across forked worker processes, yielding row counts.
+
+    Every worker opens its own database connection, so the parent's
+    connections are closed before forking.
+    """
+    if workers <= 1:
+        _init_worker(user_ids)
+        for task in tasks:
+            yield _run(task)
+        return
+
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(user_ids,)) as executor:
+        yield from executor.map(_run, tasks)
+
+
+def user_tasks(seed, first_number, count, password_hash, batch_size):
+    return [
+        (seed_users, (seed, index, first_number + offset, min(batch_size, count - offset), password_hash))
+        for index, offset in enumerate(range(0, count, batch_size))
+    ]
+
+
+def room_tasks(seed, first_number, count, image_names, batch_size):
+    return [
+        (seed_rooms, (seed, index, first_number + offset, min(batch_size, count - offset), image_names))
+        for index, offset in enumerate(range(0, count, batch_size))
+    ]
+
+
+def booking_tasks(seed, rooms, count, batch_size):
+    """
+    Spread ``count`` bookings evenly over ``rooms`` (``(room_id, price, first_day)``).
+
+    Rooms are grouped so that each task inserts roughly ``batch_size`` rows.
+    """
+    tasks, chunk, rows = [], [], 0
+    per_room, remainder = divmod(count, len(rooms))
+    for position, (room_id, price, first_day) in enumerate(rooms):
+        room_count = per_room + (1 if position < remainder else 0)
+        if not room_count:
+            continue
+        chunk.append((room_id, price, first_day, room_count))
+        rows += room_count
+        if rows >= batch_size:
+            tasks.append((seed_bookings, (seed, len(tasks), chunk)))
+            chunk, rows = [], 0
+    if chunk:
+        tasks.append((seed_bookings, (seed, len(tasks), chunk)))
+    return tasks
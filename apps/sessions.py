@@ -0,0 +1,147 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.base import CreateError, SessionBase, UpdateError
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import SuspiciousOperation
+from django.db import DatabaseError, IntegrityError, router, transaction
+from django.utils import timezone
+
+COOKIE_SALT = "apps.sessions.cookie"
+CACHE_KEY_PREFIX = "apps.sessions."
+
+
+class SessionStore(SessionBase):
+    """
+    Signed-cookie sessions for visitors, cached sessions with a delayed database copy for signed-in users.
+
+    A session without a logged-in user lives entirely in its cookie, like
+    Django's ``signed_cookies`` backend, so the public pages never touch the
+    session table. Once a user logs in the data moves server side: it is
+    read from and written to ``SESSION_CACHE_ALIAS`` on every request and
+    copied to ``django_session`` when created and then at most every
+    ``SESSION_DB_WRITE_INTERVAL`` seconds. A cold cache falls back to that
+    copy, so a cache restart does not log anyone out.
+
+    Cookie values carry a signature with ``:`` separators, which server side
+    keys never contain, so both kinds of cookie are told apart on load.
+    Sessions created by the database backend keep working and move to the
+    cookie or the cache the next time they are saved.
+    """
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._persisted = None
+
+    @staticmethod
+    def is_cookie(session_key):
+        return bool(session_key) and ":" in session_key
+
+    def cache_key(self, session_key=None):
+        return CACHE_KEY_PREFIX + (session_key or self._session_key)
+
+    def load(self):
+        if self.is_cookie(self.session_key):
+            try:
+                return signing.loads(
+                    self.session_key,
+                    serializer=self.serializer,
+                    max_age=self.get_session_cookie_age(),
+                    salt=COOKIE_SALT,
+                )
+            except Exception:
+                # A bad signature or an unreadable payload starts a new session.
+                self._session_key = None
+                return {}
+
+        cached = self._cache.get(self.cache_key())
+        if cached is not None:
+            self._persisted = cached["persisted"]
+            return cached["data"]
+        try:
+            session = Session.objects.get(session_key=self.session_key, expire_date__gt=timezone.now())
+        except (Session.DoesNotExist, SuspiciousOperation):
+            self._session_key = None
+            return {}
+        data = self.decode(session.session_data)
+        self._persisted = time.time()
+        self._cache.set(
+            self.cache_key(), {"data": data, "persisted": self._persisted}, self.get_expiry_age(expiry=session.expire_date)
+        )
+        return data
+
+    def exists(self, session_key):
+        if self.is_cookie(session_key):
+            return False
+        return self._cache.has_key(self.cache_key(session_key)) or Session.objects.filter(
+            session_key=session_key
+        ).exists()
+
+    def create(self):
+        if SESSION_KEY not in self._get_session(no_load=True):
+            # Visitors get their key, the signed data, when the session is saved.
+            self._session_key = None
+            self.modified = True
+            return
+        while True:
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                continue
+            self.modified = True
+            return
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        if SESSION_KEY not in data:
+            if self._session_key and not self.is_cookie(self._session_key):
+                # A visitor session left server side by the database backend.
+                self.delete(self._session_key)
+            self._session_key = signing.dumps(data, compress=True, salt=COOKIE_SALT, serializer=self.serializer)
+            self.modified = True
+            return
+        if self._session_key is None or self.is_cookie(self._session_key):
+            self.create()
+            return
+
+        now = time.time()
+        if must_create or self._persisted is None or now - self._persisted >= settings.SESSION_DB_WRITE_INTERVAL:
+            self._persist(data, must_create)
+            self._persisted = now
+        self._cache.set(self.cache_key(), {"data": data, "persisted": self._persisted}, self.get_expiry_age())
+
+    def _persist(self, data, must_create):
+        session = Session(
+            session_key=self._session_key, session_data=self.encode(data), expire_date=self.get_expiry_date()
+        )
+        using = router.db_for_write(Session, instance=session)
+        try:
+            with transaction.atomic(using=using):
+                session.save(force_insert=must_create, using=using)
+        except IntegrityError:
+            if must_create:
+                raise CreateError
+            raise
+        except DatabaseError:
+            if not must_create:
+                raise UpdateError
+            raise
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        if self.is_cookie(session_key):
+            return
+        self._cache.delete(self.cache_key(session_key))
+        Session.objects.filter(session_key=session_key).delete()
+
+    @classmethod
+    def clear_expired(cls):
+        Session.objects.filter(expire_date__lt=timezone.now()).delete()
@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps import catalogue, images, metrics, search
+from apps.archive import is_archiving
+from apps.middleware import count_queries
+from apps.models import Booking, Room, SearchDocument, User
+from apps.occupancy import refresh_room_calendar, stay_nights
+from apps.rollups import change_room_type, refresh_room_rollups, remove_room
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_stay(sender, instance, **kwargs):
+    """
+    Keep the stored stay of an edited booking so its old nights can be released.
+
+    Bookings loaded from the database remember their stay, so only one built
+    by hand with an existing primary key is looked up.
+    """
+    instance._previous_stay = instance.stored_stay()
+    if instance._previous_stay is None and instance.pk:
+        instance._previous_stay = (
+            Booking.objects.filter(pk=instance.pk).values_list("room_id", "check_in", "check_out").first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+def update_calendar_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_stay", None)
+    for refresh in (refresh_room_calendar, refresh_room_rollups):
+        if previous and previous != (instance.room_id, instance.check_in, instance.check_out):
+            refresh(previous[0], *stay_nights(previous[1], previous[2]))
+        refresh(instance.room_id, *stay_nights(instance.check_in, instance.check_out))
+
+
+@receiver(post_delete, sender=Booking)
+def update_calendar_on_delete(sender, instance, **kwargs):
+    if is_archiving():
+        # Archived stays still count in the calendars and rollups.
+        return
+    for refresh in (refresh_room_calendar, refresh_room_rollups):
+        refresh(instance.room_id, *stay_nights(instance.check_in, instance.check_out))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def bump_catalogue_version(sender, instance, **kwargs):
+    transaction.on_commit(catalogue.bump_version)
+
+
+@receiver(post_save, sender=Room)
+def update_rollup_room_type(sender, instance, created, **kwargs):
+    if not created:
+        change_room_type(instance.pk, instance.room_type)
+
+
+@receiver(pre_delete, sender=Room)
+def remove_room_rollups(sender, instance, **kwargs):
+    remove_room(instance.pk)
+
+
+@receiver(post_save, sender=Room)
+def render_room_image_derivatives(sender, instance, **kwargs):
+    name = instance.image.name
+    if name and not default_storage.exists(images.placeholder_name(name)):
+        transaction.on_commit(lambda: schedule_derivatives_and_refresh(name))
+
+
+def schedule_derivatives_and_refresh(name):
+    """Render derivatives in the background, then refresh the cached room grid to use them."""
+    future = images.schedule_derivatives(name)
+    future.add_done_callback(lambda _: catalogue.bump_version())
+
+
+@receiver(post_save, sender=Booking)
+def index_booking(sender, instance, **kwargs):
+    search.index(SearchDocument.BOOKING, [instance.pk])
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=User)
+def index_room_or_user(sender, instance, created, **kwargs):
+    kind = SearchDocument.ROOM if sender is Room else SearchDocument.USER
+    if search.reindex_object(kind, instance.pk) and not created:
+        # Booking documents repeat the room number and the guest's name.
+        search.index(SearchDocument.BOOKING, instance_bookings(instance).values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Room)
+@receiver(pre_delete, sender=User)
+def remember_bookings(sender, instance, **kwargs):
+    """Keep the bookings that are about to lose their room or guest, so their documents can be refreshed."""
+    instance._search_bookings = list(instance_bookings(instance).values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=User)
+def unindex_deleted(sender, instance, **kwargs):
+    if sender is Booking and is_archiving():
+        # archive_rows unindexes the whole batch at once.
+        return
+    kind = {Booking: SearchDocument.BOOKING, Room: SearchDocument.ROOM, User: SearchDocument.USER}[sender]
+    search.unindex(kind, [instance.pk])
+    search.index(SearchDocument.BOOKING, getattr(instance, "_search_bookings", ()))
+
+
+def instance_bookings(instance):
+    return instance.bookings.all() if isinstance(instance, Room) else instance.booked_rooms.all()
+
+
+@receiver(connection_created)
+def wrap_queries(sender, connection, **kwargs):
+    """Count every statement on the new connection for ``QueryCountMiddleware`` and time it for the metrics."""
+    wrappers = [count_queries, *([metrics.time_query] if settings.METRICS_ENABLED else [])]
+    for wrapper in wrappers:
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -0,0 +1,118 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+# Optional dependencies that only some code paths use; a worker should boot without them.
+LAZY_MODULES = ("requests", "faker", "PIL")
+PHASES = ("settings", "apps", "middleware", "urls")
+
+# Boots Django the way root.asgi does, then resolves the URLconf like the first request would.
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+marks = {}
+from django.conf import settings
+settings.INSTALLED_APPS
+marks["settings"] = time.perf_counter()
+import django
+django.setup(set_prefix=False)
+marks["apps"] = time.perf_counter()
+from django.core.handlers.asgi import ASGIHandler
+ASGIHandler()
+marks["middleware"] = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+marks["urls"] = time.perf_counter()
+print(json.dumps({
+    "started": started,
+    "marks": marks,
+    "modules": sorted(name for name in sys.modules if "." not in name),
+}))
+"""
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class StartupReport:
+    """
+    Cold start of a worker process, in milliseconds.
+
+    Attributes:
+        interpreter (float): Python starting up before the first Django import,
+            and shutting down.
+        phases (dict): Time spent loading the settings, readying the apps,
+            loading the middleware and importing the URLconf, in that order.
+        total (float): Wall time of the whole process.
+        modules (list): ``(module, self ms, cumulative ms, nesting depth)`` of
+            every import, slowest first; measured in a separate run with
+            ``-X importtime``, which slows imports down somewhat.
+        loaded (set): Top-level packages imported once booted.
+    """
+
+    def __init__(self):
+        self.interpreter = 0.0
+        self.phases = {}
+        self.total = 0.0
+        self.modules = []
+        self.loaded = set()
+
+    @property
+    def lazy_loaded(self):
+        """The ``LAZY_MODULES`` imported during boot; should be empty."""
+        return [name for name in LAZY_MODULES if name in self.loaded]
+
+    def packages(self):
+        """Cumulative import time per top-level package, slowest first."""
+        totals = {}
+        for name, _, cumulative, depth in self.modules:
+            if depth == 0:
+                package = name.split(".")[0]
+                totals[package] = totals.get(package, 0.0) + cumulative
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def _probe(importtime=False):
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", PROBE]
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(f"Booting a worker failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.splitlines()[-1]), result.stderr, elapsed
+
+
+def profile_startup(repeat=5):
+    """
+    Boot fresh worker processes and report where their start-up time goes.
+
+    The phase timings are the fastest of ``repeat`` runs, so that they
+    reflect warm OS file caches rather than one unlucky run.
+    """
+    report = StartupReport()
+    for _ in range(repeat):
+        probe, _, elapsed = _probe()
+        if report.total and elapsed * 1000 >= report.total:
+            continue
+        marks = probe["marks"]
+        previous = probe["started"]
+        report.phases = {}
+        for phase in PHASES:
+            report.phases[phase] = (marks[phase] - previous) * 1000
+            previous = marks[phase]
+        report.total = elapsed * 1000
+        report.interpreter = report.total - (marks[PHASES[-1]] - probe["started"]) * 1000
+        report.loaded = set(probe["modules"])
+
+    _, stderr, _ = _probe(importtime=True)
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            report.modules.append((name, int(own) / 1000, int(cumulative) / 1000, len(indent) // 2))
+    report.modules.sort(key=lambda module: -module[2])
+    return report
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    File storage that names every file after the SHA-256 of its content.
+
+    The upload is streamed chunk by chunk into a temporary file in the target
+    directory while it is hashed, then moved to ``<dir>/<sha256>.<ext>``. If
+    a file with that name already exists the temporary copy is dropped and
+    the existing file is touched, so identical uploads share one file on disk.
+    """
+
+    hash_algorithm = "sha256"
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is decided by the content in _save, never by a suffix.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+
+        digest = hashlib.new(self.hash_algorithm)
+        fd, temp_path = tempfile.mkstemp(dir=full_directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            name = os.path.join(directory, f"{digest.hexdigest()}{extension}").replace("\\", "/")
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+                # Mark the shared file as fresh, so collect_media_garbage --min-age spares it
+                # until the room that reuses it is saved.
+                os.utime(full_path)
+            else:
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
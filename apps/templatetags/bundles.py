@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import format_html
+
+from apps.bundles import bundle_url
+
+register = template.Library()
+
+
+class BundleNode(template.Node):
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+
+    def render(self, context):
+        url = bundle_url(self.name)
+        if url is None:
+            return self.nodelist.render(context)
+        if self.name.endswith(".css"):
+            return format_html('<link rel="stylesheet" href="{}">', url)
+        return format_html('<script src="{}"></script>', url)
+
+
+@register.tag
+def bundle(parser, token):
+    """
+    Replace the enclosed ``{% static %}`` assets with their built bundle.
+
+    Usage::
+
+        {% bundle "advanced.css" %}<link rel="stylesheet" href="{% static 'a.css' %}">{% endbundle %}
+
+    Without a built manifest, or with ``STATIC_BUNDLES`` off, the block renders unchanged.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2 or bits[1][0] not in "\"'" or bits[1][0] != bits[1][-1]:
+        raise template.TemplateSyntaxError("'bundle' takes a single quoted bundle name")
+    nodelist = parser.parse(("endbundle",))
+    parser.delete_first_token()
+    return BundleNode(bits[1][1:-1], nodelist)
@@ -0,0 +1,26 @@
+from django import template
+
+from apps import images
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail_url(image, width):
+    if not image:
+        return ""
+    return images.thumbnail_url(image.name, int(width))
+
+
+@register.filter
+def srcset(image):
+    if not image:
+        return ""
+    return images.srcset(image.name)
+
+
+@register.filter
+def placeholder(image):
+    if not image:
+        return ""
+    return images.placeholder_data_uri(image.name)
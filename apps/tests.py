@@ -1,3 +1,1381 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from unittest import mock, skipUnless
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import Permission
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Sum
+from django.http import Http404
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from apps import benchmarks, catalogue, images, notifications, pricing, search
+from apps.bundles import minify_css, read_manifest
+from apps.exports import HEADER
+from apps.imports import BookingImporter, read_rows
+from apps.metrics import registry, time_query
+from apps.middleware import MetricsMiddleware, QueryCountMiddleware, ReplicaMiddleware
+from apps.models import (ArchivedBooking, Booking, DailyRollup, NotificationOutbox, Room, RoomCalendar, RoomTypeRollup,
+                         SearchDocument, User)
+from apps.queryplans import check_pages
+from apps.reservations import ReservationError, RoomBusy, RoomClosed, reserve
+from apps.rollups import rebuild_rollups
+from apps.routers import replica_reads
+from apps.serving import serve
+from apps.sessions import SessionStore
+from apps.startup import profile_startup
+from apps.views import AutocompleteView
+
+
+class QueryBudgetMixin:
+    """
+    Assert how many queries a URL may issue, as reported by ``QueryCountMiddleware``.
+
+    Methods:
+        assertQueryBudget(url, budget): Fetch ``url`` and fail if it issues more than ``budget`` queries.
+    """
+
+    def assertQueryBudget(self, url, budget, status_code=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        count = int(response["X-DB-Query-Count"])
+        self.assertLessEqual(
+            count, budget, f"{url} issued {count} queries in {response['X-DB-Time-Ms']} ms, budget is {budget}"
+        )
+        return response
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    rows = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+        now = timezone.now()
+        for i in range(cls.rows):
+            user = User.objects.create(username=f"guest{i}", first_name="Guest", last_name=str(i))
+            room = Room.objects.create(
+                room_number=f"Room-{i}", name=f"Room {i}", price_per_night=100, image="images/room.webp"
+            )
+            Booking.objects.create(
+                user=user, room=room, check_in=now + timedelta(days=i), check_out=now + timedelta(days=i + 2)
+            )
+        cls.room = room
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index(self):
+        self.assertQueryBudget("/", 1)
+        self.assertQueryBudget("/", 0)
+
+    def test_booking_page(self):
+        self.assertQueryBudget("/booking/", 0)
+        self.assertQueryBudget(f"/booking/?room_id={self.room.id}", 1)
+
+    def test_public_api(self):
+        self.assertQueryBudget("/api/users/autocomplete/?q=guest", 1)
+        self.assertQueryBudget("/api/rooms/autocomplete/?q=room", 1)
+        self.assertQueryBudget("/api/rooms/search/?q=room", 2)
+        self.assertQueryBudget("/api/rooms/available/?check_in=2024-01-01&check_out=2024-01-03", 1)
+        self.assertQueryBudget(f"/api/rooms/{self.room.id}/calendar/", 2)
+
+    async def test_async_requests_are_counted(self):
+        response = await self.async_client.get("/api/rooms/search/?q=room")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response["X-DB-Query-Count"]), 0)
+
+    def test_middleware_is_async_capable(self):
+        async def get_response(request):
+            return None
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for middleware in (MetricsMiddleware, QueryCountMiddleware, ReplicaMiddleware):
+            with self.subTest(middleware=middleware.__name__), self.settings(
+                METRICS_ENABLED=True, METRICS_DIR=directory.name
+            ):
+                self.assertTrue(iscoroutinefunction(middleware(get_response)))
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+        for url in ("/admin/apps/room/", "/admin/apps/booking/", "/admin/apps/user/"):
+            with self.subTest(url=url):
+                self.assertQueryBudget(url, 6)
+
+    def test_query_plans(self):
+        flagged = [(result["page"], result["findings"]) for result in check_pages() if result["findings"]]
+        self.assertEqual(flagged, [])
+
+
+class CatalogueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # No image, so saving the room does not start rendering renditions.
+        cls.room = Room.objects.create(room_number="Room-1", name="Sea View", price_per_night=100)
+
+    def setUp(self):
+        cache.clear()
+
+    def read(self):
+        """Render the grid; return it and whether it was a cache miss."""
+        misses = catalogue.get_stats()["misses"]
+        grid = catalogue.get_room_grid()
+        return grid, catalogue.get_stats()["misses"] > misses
+
+    def test_room_changes_invalidate_the_grid(self):
+        self.assertTrue(self.read()[1])
+        self.assertFalse(self.read()[1])
+
+        version = catalogue.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.name = "Garden View"
+            self.room.save()
+        self.assertNotEqual(catalogue.get_version(), version)
+        grid, missed = self.read()
+        self.assertTrue(missed)
+        self.assertIn("Garden View", grid)
+        self.assertFalse(self.read()[1])
+
+        version = catalogue.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.delete()
+        self.assertNotEqual(catalogue.get_version(), version)
+        grid, missed = self.read()
+        self.assertTrue(missed)
+        self.assertNotIn("Garden View", grid)
+
+    def test_version_is_kept_in_the_shared_cache(self):
+        catalogue.bump_version()
+        version = caches["shared"].get(catalogue.VERSION_KEY)
+        cache.clear()
+        self.assertEqual(catalogue.get_version(), version)
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rooms = [
+            Room.objects.create(room_number=f"Room-{i}", name="Room", price_per_night=100, image="images/room.webp")
+            for i in range(2 * AutocompleteView.page_size + 1)
+        ]
+
+    def walk(self, url):
+        """Follow ``next`` from the first page to the last, returning the ids of each page."""
+        pages, cursor = [], ""
+        while cursor is not None:
+            data = self.client.get(url, {"cursor": cursor}).json()
+            self.assertEqual(data["pagination"]["more"], data["next"] is not None)
+            pages.append([result["id"] for result in data["results"]])
+            cursor = data["next"]
+        return pages
+
+    def test_pages(self):
+        ids = sorted((room.pk for room in self.rooms), reverse=True)
+        size = AutocompleteView.page_size
+        pages = self.walk("/api/rooms/autocomplete/")
+        self.assertEqual(pages, [ids[:size], ids[size : 2 * size], ids[2 * size :]])
+
+        # A last page that is exactly full reports no further page.
+        self.rooms[0].delete()
+        self.assertEqual(self.walk("/api/rooms/autocomplete/"), [ids[:size], ids[size : 2 * size]])
+
+        for cursor in ("abc", "²", "-1", "9" * 30):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get("/api/rooms/autocomplete/", {"cursor": cursor}).status_code, 400)
+        self.assertEqual(self.client.get("/api/rooms/autocomplete/", {"cursor": ids[-1]}).json()["results"], [])
+
+    def test_subclasses_must_be_complete(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "must define search_kind, get_text"):
+            type("GuestAutocompleteView", (AutocompleteView,), {"queryset": User.objects.all()})
+
+
+class RoomAvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.check_in = timezone.make_aware(datetime(2030, 3, 10, 14))
+        cls.check_out = timezone.make_aware(datetime(2030, 3, 13, 12))
+        user = User.objects.create(username="guest", first_name="Guest", last_name="One")
+        stays = {
+            "free": None,
+            "leaves on check-in": (datetime(2030, 3, 8, 14), datetime(2030, 3, 10, 14)),
+            "arrives on check-out": (datetime(2030, 3, 13, 12), datetime(2030, 3, 15, 12)),
+            "overlaps check-in": (datetime(2030, 3, 8, 14), datetime(2030, 3, 11, 12)),
+            "contains the range": (datetime(2030, 3, 1, 14), datetime(2030, 3, 20, 12)),
+            "inside the range": (datetime(2030, 3, 11, 14), datetime(2030, 3, 12, 12)),
+        }
+        cls.rooms = {}
+        for i, (label, stay) in enumerate(stays.items()):
+            room = Room.objects.create(
+                room_number=f"Room-{i}", name=label, price_per_night=100, image="images/room.webp"
+            )
+            if stay:
+                check_in, check_out = map(timezone.make_aware, stay)
+                Booking.objects.create(user=user, room=room, check_in=check_in, check_out=check_out)
+            cls.rooms[label] = room
+        cls.rooms["closed"] = Room.objects.create(
+            room_number="Room-closed", name="closed", price_per_night=100, image="images/room.webp", is_available=False
+        )
+
+    def test_available_between(self):
+        available = set(Room.objects.available_between(self.check_in, self.check_out).values_list("name", flat=True))
+        self.assertEqual(available, {"free", "leaves on check-in", "arrives on check-out"})
+
+
+class RoomCalendarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rooms = [
+            Room.objects.create(room_number=f"Room-{i}", name="Room", price_per_night=100, image="images/room.webp")
+            for i in range(2)
+        ]
+
+    def nights(self, room):
+        """The dates whose bit is set in the room's calendars."""
+        return {
+            date(year, 1, 1) + timedelta(days=index)
+            for year, days in RoomCalendar.objects.filter(room=room).values_list("year", "days")
+            for index in range(len(days) * 8)
+            if days[index >> 3] & 1 << (index & 7)
+        }
+
+    def book(self, room, first, last):
+        check_in = timezone.make_aware(datetime.combine(first, datetime.min.time()).replace(hour=14))
+        check_out = timezone.make_aware(datetime.combine(last, datetime.min.time()).replace(hour=12))
+        return Booking.objects.create(room=room, check_in=check_in, check_out=check_out)
+
+    def test_stays_across_new_year(self):
+        room = self.rooms[0]
+        booking = self.book(room, date(2029, 12, 30), date(2030, 1, 2))
+        self.book(room, date(2030, 1, 5), date(2030, 1, 6))
+        stay = {date(2029, 12, 30), date(2029, 12, 31), date(2030, 1, 1)}
+        self.assertEqual(self.nights(room), stay | {date(2030, 1, 5)})
+        self.assertEqual(set(RoomCalendar.objects.filter(room=room).values_list("year", flat=True)), {2029, 2030})
+
+        booking.delete()
+        self.assertEqual(self.nights(room), {date(2030, 1, 5)})
+        self.assertFalse(any(RoomCalendar.objects.get(room=room, year=2029).days))
+
+    def test_moved_stays_release_their_nights(self):
+        booking = self.book(self.rooms[0], date(2029, 12, 31), date(2030, 1, 2))
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.check_in += timedelta(days=3)
+        booking.check_out += timedelta(days=3)
+        with CaptureQueriesContext(connection) as queries:
+            booking.save()
+        self.assertEqual(self.nights(self.rooms[0]), {date(2030, 1, 3), date(2030, 1, 4)})
+        # The stay loaded with the booking is used; the booking is not read back.
+        reads = [query for query in queries if 'FROM "apps_booking" WHERE "apps_booking"."id" =' in query["sql"]]
+        self.assertEqual(reads, [])
+
+        booking.room = self.rooms[1]
+        booking.save()
+        self.assertEqual(self.nights(self.rooms[0]), set())
+        self.assertEqual(self.nights(self.rooms[1]), {date(2030, 1, 3), date(2030, 1, 4)})
+
+        # A booking built by hand has no loaded stay, so the stored one is read.
+        moved = Booking(
+            pk=booking.pk,
+            room=self.rooms[1],
+            check_in=booking.check_in - timedelta(days=10),
+            check_out=booking.check_out - timedelta(days=10),
+            created_at=booking.created_at,
+        )
+        moved.save()
+        self.assertEqual(self.nights(self.rooms[1]), {date(2029, 12, 24), date(2029, 12, 25)})
+
+
+    def test_rebuild_keeps_archived_nights(self):
+        room = self.rooms[0]
+        self.book(room, date(2030, 1, 5), date(2030, 1, 7))
+        self.book(room, date(2030, 2, 1), date(2030, 2, 2))
+        call_command("archive_bookings", "--before", "2030-01-20", stdout=io.StringIO())
+        self.assertEqual(ArchivedBooking.objects.count(), 1)
+        nights = self.nights(room)
+
+        call_command("rebuild_occupancy", stdout=io.StringIO())
+        self.assertEqual(self.nights(room), nights)
+        self.assertEqual(nights, {date(2030, 1, 5), date(2030, 1, 6), date(2030, 2, 1)})
+
+    def test_calendar_api(self):
+        room = self.rooms[0]
+        self.book(room, date(2030, 1, 5), date(2030, 1, 6))
+        url = f"/api/rooms/{room.pk}/calendar/"
+        data = self.client.get(url, {"year": 2030}).json()
+        self.assertEqual(data["years"][0]["year"], 2030)
+        self.assertEqual(base64.b64decode(data["years"][0]["days"])[0], 0b10000)
+        for year in ("abc", "0", "99999999"):
+            with self.subTest(year=year):
+                self.assertEqual(self.client.get(url, {"year": year}).status_code, 400)
+        self.assertContains(self.client.get("/booking/"), 'data-calendar-url="/api/rooms/0/calendar/"')
+
+class BookingImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+        cls.guest = User.objects.create(username="guest", first_name="Guest", last_name="One")
+        cls.room = Room.objects.create(
+            room_number="Room-1", name="Room 1", price_per_night=Decimal("123.45"), image="images/room.webp"
+        )
+        Booking.objects.create(
+            user=cls.guest,
+            room=cls.room,
+            check_in=timezone.make_aware(datetime(2030, 1, 10, 14)),
+            check_out=timezone.make_aware(datetime(2030, 1, 12, 12)),
+        )
+
+    def test_import_prices_and_rejects_overlaps(self):
+        rows = [
+            {"username": "guest", "room_number": "Room-1", "check_in": "2030-01-01T14:00", "check_out": "2030-01-04T12:00"},
+            {"user_id": self.guest.id, "room_id": self.room.id, "check_in": "2030-01-03T14:00", "check_out": "2030-01-05"},
+            {"username": "guest", "room_number": "Room-1", "check_in": "2030-01-11T14:00", "check_out": "2030-01-13"},
+            {"username": "nobody", "room_number": "Room-1", "check_in": "2030-02-01T14:00", "check_out": "2030-02-02"},
+        ]
+        report = BookingImporter(batch_size=2).run(read_rows(io.StringIO(json.dumps(rows)), "json"))
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual([number for number, _ in report.errors], [2, 3, 4])
+        booking = Booking.objects.get(check_in=timezone.make_aware(datetime(2030, 1, 1, 14)))
+        self.assertEqual(booking.total_price, Decimal("360.06"))
+        self.assertTrue(RoomCalendar.objects.filter(room=self.room, year=2030).exists())
+
+    def test_overlapping_stored_bookings_and_oversized_totals_are_rejected(self):
+        # Stored bookings of one room may overlap each other; a short one must not hide a long one.
+        for check_in, check_out in ((datetime(2030, 2, 1, 14), datetime(2030, 2, 20, 12)),
+                                    (datetime(2030, 2, 2, 14), datetime(2030, 2, 3, 12))):
+            Booking.objects.create(
+                user=self.guest,
+                room=self.room,
+                check_in=timezone.make_aware(check_in),
+                check_out=timezone.make_aware(check_out),
+            )
+        suite = Room.objects.create(
+            room_number="Room-2", name="Room 2", price_per_night=Decimal("9999999.99"), image="images/room.webp"
+        )
+        rows = [
+            {"username": "guest", "room_number": "Room-1", "check_in": "2030-02-04T14:00", "check_out": "2030-02-05T12:00"},
+            {"username": "guest", "room_number": "Room-2", "check_in": "2030-02-01T14:00", "check_out": "2030-03-01T12:00"},
+            {"username": "guest", "room_number": "Room-2", "check_in": "2030-03-01T14:00", "check_out": "2030-03-02T12:00"},
+        ]
+        report = BookingImporter().run(read_rows(io.StringIO(json.dumps(rows)), "json"))
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.errors[0], (1, "overlaps another booking of room Room-1"))
+        self.assertEqual(report.errors[1][0], 2)
+        self.assertIn("does not fit", report.errors[1][1])
+        self.assertTrue(Booking.objects.filter(room=suite).exists())
+
+    def test_admin_upload(self):
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile(
+            "bookings.csv", b"username,room_number,check_in,check_out\nguest,Room-1,2030-03-01 14:00,2030-03-02 12:00\n"
+        )
+        response = self.client.post("/admin/apps/booking/import/", {"file": upload, "dry_run": "on"}, follow=True)
+        self.assertContains(response, "1 of 1 bookings would be created")
+        self.assertEqual(Booking.objects.count(), 1)
+
+        upload.seek(0)
+        response = self.client.post("/admin/apps/booking/import/", {"file": upload}, follow=True)
+        self.assertContains(response, "1 of 1 bookings imported")
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_add_permission_gates_the_import(self):
+        clerk = User.objects.create(username="clerk", is_staff=True)
+        clerk.user_permissions.add(Permission.objects.get(codename="view_booking"))
+        self.client.force_login(clerk)
+        self.assertNotContains(self.client.get("/admin/apps/booking/"), "/admin/apps/booking/import/")
+        self.assertEqual(self.client.get("/admin/apps/booking/import/").status_code, 403)
+        self.assertEqual(self.client.get("/admin/apps/booking/add/").status_code, 403)
+
+        clerk.user_permissions.add(Permission.objects.get(codename="add_booking"))
+        clerk = User.objects.get(pk=clerk.pk)
+        self.client.force_login(clerk)
+        self.assertContains(self.client.get("/admin/apps/booking/"), "/admin/apps/booking/import/")
+        self.assertEqual(self.client.get("/admin/apps/booking/import/").status_code, 200)
+        self.assertRedirects(self.client.get("/admin/apps/booking/add/"), "/admin/apps/booking/import/")
+
+    def test_export(self):
+        self.client.force_login(self.admin)
+        booking = Booking.objects.get()
+        response = self.client.post(
+            "/admin/apps/booking/", {"action": "export_csv", "select_across": 1, "index": 0, "_selected_action": [booking.pk]}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["user_full_name"], "Guest One")
+        self.assertEqual(rows[0]["room_number"], "Room-1")
+        self.assertEqual(rows[0]["total_price"], str(booking.total_price))
+        self.assertEqual(parse_datetime(rows[0]["check_in"]), booking.check_in)
+
+        out = io.StringIO()
+        call_command("export_bookings", "-", "--format", "jsonl", "--since", "2030-01-10", "--chunk-size", 1, stdout=out)
+        (line,) = out.getvalue().splitlines()
+        self.assertEqual(json.loads(line)["user_id"], self.guest.pk)
+        out = io.StringIO()
+        call_command("export_bookings", "-", "--until", "2030-01-10", stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), [",".join(HEADER)])
+
+
+class DailyRollupTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+        cls.room = Room.objects.create(
+            room_number="Room-1", name="Room 1", price_per_night=Decimal("100.00"), image="images/room.webp"
+        )
+
+    def book(self, day, nights):
+        check_in = timezone.make_aware(datetime(2030, 1, day, 14))
+        return Booking.objects.create(room=self.room, check_in=check_in, check_out=check_in + timedelta(days=nights))
+
+    def test_rollups_follow_bookings(self):
+        booking = self.book(1, 3)
+        self.book(10, 1)
+        self.assertEqual(DailyRollup.objects.filter(room=self.room).aggregate(total=Sum("revenue"))["total"], 400)
+
+        booking.check_out -= timedelta(days=1)
+        booking.save()
+        booking.refresh_from_db()
+        self.assertEqual(
+            list(DailyRollup.objects.order_by("day").values_list("day", "nights", "revenue", "bookings")),
+            [(date(2030, 1, 1), 1, 100, 1), (date(2030, 1, 2), 1, 100, 0), (date(2030, 1, 10), 1, 100, 1)],
+        )
+
+        self.room.room_type = Room.JUNIOR_SUITE_TWIN
+        self.room.save()
+        booking.delete()
+        incremental = list(RoomTypeRollup.objects.order_by("day").values_list("room_type", "day", "nights", "revenue"))
+        self.assertEqual(incremental, [(Room.JUNIOR_SUITE_TWIN, date(2030, 1, 10), 1, 100)])
+
+        self.assertEqual(rebuild_rollups(), 1)
+        self.assertEqual(DailyRollup.objects.get().day, date(2030, 1, 10))
+        self.assertEqual(
+            list(RoomTypeRollup.objects.order_by("day").values_list("room_type", "day", "nights", "revenue")), incremental
+        )
+
+    def test_archive_keeps_the_figures(self):
+        old, recent = self.book(1, 3), self.book(10, 1)
+        figures = list(DailyRollup.objects.order_by("day").values_list("day", "nights", "revenue"))
+
+        def derived():
+            return (
+                list(DailyRollup.objects.order_by("day").values_list("day", "nights", "revenue", "bookings")),
+                list(RoomTypeRollup.objects.order_by("day").values_list("room_type", "day", "nights", "revenue")),
+                list(RoomCalendar.objects.order_by("year").values_list("year", "days")),
+            )
+
+        before = derived()
+        call_command("archive_bookings", "--before", "2030-01-05", "--batch-size", 1, stdout=io.StringIO())
+        self.assertEqual(list(Booking.objects.values_list("pk", flat=True)), [recent.pk])
+        self.assertEqual(ArchivedBooking.objects.get().total_price, old.total_price)
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchDocument.BOOKING, object_id=old.pk).exists())
+        self.assertEqual(derived(), before)
+
+        rebuild_rollups()
+        recent.save()
+        self.assertEqual(list(DailyRollup.objects.order_by("day").values_list("day", "nights", "revenue")), figures)
+        self.client.force_login(self.admin)
+        self.assertQueryBudget("/admin/apps/archivedbooking/", 6)
+
+    def test_dashboard(self):
+        for day in range(1, 20):
+            self.book(day, 1)
+        self.client.force_login(self.admin)
+        response = self.assertQueryBudget("/admin/apps/dailyrollup/?start=2030-01-01&end=2030-12-31", 7)
+        self.assertEqual(response.context["figures"]["nights"], 19)
+
+
+class RoomBulkUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+        cls.rooms = [
+            Room.objects.create(
+                room_number=f"Room-{i}", name=f"Room {i}", room_type=Room.STANDARD_TWIN,
+                price_per_night=Decimal("100.00"), image="images/room.webp",
+            )
+            for i in range(3)
+        ]
+        cls.suite = Room.objects.create(
+            room_number="Suite", name="Suite", room_type=Room.JUNIOR_SUITE_TWIN, price_per_night=Decimal("300.00"),
+            image="images/room.webp",
+        )
+        for year in (2020, 2030):
+            for room in [*cls.rooms, cls.suite]:
+                check_in = timezone.make_aware(datetime(year, 1, 1, 14))
+                Booking.objects.create(room=room, check_in=check_in, check_out=check_in + timedelta(days=2, hours=-2))
+
+    def rollups(self):
+        return (
+            list(DailyRollup.objects.order_by("room_id", "day").values_list("room_id", "day", "nights", "revenue")),
+            list(RoomTypeRollup.objects.order_by("room_type", "day").values_list("room_type", "day", "revenue")),
+        )
+
+    def test_reprice_action(self):
+        self.client.force_login(self.admin)
+        selected = {"action": "reprice", "_selected_action": [room.pk for room in self.rooms[:2]]}
+        response = self.client.post("/admin/apps/room/", selected)
+        self.assertTemplateUsed(response, "admin/apps/room/reprice.html")
+        self.assertEqual(response.context["rooms"], 2)
+
+        change = {"apply": "1", "change": "percent", "value": "12.5", "update_bookings": "on"}
+        self.client.post("/admin/apps/room/", {**selected, **change})
+        self.assertEqual(
+            list(Room.objects.order_by("pk").values_list("price_per_night", flat=True)),
+            [Decimal("112.50"), Decimal("112.50"), Decimal("100.00"), Decimal("300.00")],
+        )
+        prices = {
+            (booking.room_id, booking.check_in.year): booking.total_price
+            for booking in Booking.objects.select_related("room")
+        }
+        self.assertEqual(prices[self.rooms[0].pk, 2030], Decimal("215.63"))
+        self.assertEqual(prices[self.rooms[0].pk, 2020], Decimal("191.67"))
+        self.assertEqual(prices[self.rooms[2].pk, 2030], Decimal("191.67"))
+
+        figures = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), figures)
+
+    def test_recompute_totals_updates_each_table_once_per_batch(self):
+        for offset in range(1, 6):
+            check_in = timezone.make_aware(datetime(2030, 2, 1, 14)) + timedelta(days=3 * offset)
+            check_out = check_in + timedelta(days=2, hours=-2)
+            Booking.objects.create(room=self.rooms[0], check_in=check_in, check_out=check_out)
+        room_ids = pricing.reprice_rooms(Room.objects.filter(pk=self.rooms[0].pk), percent=10)
+        since = timezone.make_aware(datetime(2029, 1, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(pricing.recompute_totals(room_ids, since=since), 6)
+        # One statement for the bookings and one per rollup table, however many bookings changed.
+        updates = [query for query in queries.captured_queries if query["sql"].startswith(("UPDATE", "WITH"))]
+        self.assertEqual(len(updates), 3)
+        totals = Booking.objects.filter(room=self.rooms[0], check_in__gte=since).values_list("total_price", flat=True)
+        self.assertEqual(set(totals), {Decimal("210.83")})
+
+        figures = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), figures)
+
+    def test_update_rooms_command(self):
+        call_command("update_rooms", "--room-type", Room.STANDARD_TWIN, "--close", stdout=io.StringIO())
+        self.assertEqual(list(Room.objects.filter(is_available=True)), [self.suite])
+        call_command("update_rooms", "--room", "Room-1", "--open", stdout=io.StringIO())
+        self.assertTrue(Room.objects.get(room_number="Room-1").is_available)
+
+        call_command("update_rooms", "--all", "--amount", "-150", "--keep-booking-prices", stdout=io.StringIO())
+        self.assertEqual(
+            sorted(Room.objects.values_list("price_per_night", flat=True)), [0, 0, 0, Decimal("150.00")]
+        )
+        self.assertEqual(Booking.objects.filter(total_price=0).count(), 0)
+        with self.assertRaises(CommandError):
+            call_command("update_rooms", "--all", "--percent", "-100", stdout=io.StringIO())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+        cls.guest = User.objects.create(username="marta.l", first_name="Marta", last_name="Lovelace")
+        cls.suite = Room.objects.create(
+            room_number="A-101", name="Sea View Suite", price_per_night=300, image="images/room.webp"
+        )
+        cls.twin = Room.objects.create(
+            room_number="B-7", name="Garden Twin", description="Next to the suite", price_per_night=90,
+            image="images/room.webp",
+        )
+        Room.objects.create(
+            room_number="C-1", name="Closed Suite", is_available=False, price_per_night=90, image="images/room.webp"
+        )
+        now = timezone.now()
+        cls.booking = Booking.objects.create(
+            user=cls.guest, room=cls.twin, check_in=now, check_out=now + timedelta(days=2)
+        )
+
+    def search_admin(self, model, term):
+        response = self.client.get(f"/admin/apps/{model}/", {"q": term})
+        return [obj.pk for obj in response.context["cl"].result_list]
+
+    def test_admin_search_follows_edits(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.search_admin("booking", "lovelace b-7"), [self.booking.pk])
+        self.assertEqual(self.search_admin("booking", "b-"), [self.booking.pk])
+        self.assertEqual(self.search_admin("user", "marta"), [self.guest.pk])
+        self.assertEqual(self.search_admin("room", "100%"), [])
+
+        self.guest.last_name = "Hopper"
+        self.guest.save()
+        self.assertEqual(self.search_admin("booking", "lovelace"), [])
+        self.assertEqual(self.search_admin("booking", "hopper"), [self.booking.pk])
+
+        self.twin.delete()
+        self.assertEqual(self.search_admin("booking", "b-7"), [])
+        self.assertEqual(self.search_admin("booking", "hopper"), [self.booking.pk])
+        documents = set(SearchDocument.objects.values_list("kind", "object_id", "title", "body"))
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        self.assertEqual(set(SearchDocument.objects.values_list("kind", "object_id", "title", "body")), documents)
+
+    def test_room_search_ranks_names_first(self):
+        response = self.client.get("/api/rooms/search/", {"q": "SUITE"})
+        self.assertEqual([room["id"] for room in response.json()["rooms"]], [self.suite.pk, self.twin.pk])
+        response = self.client.get("/api/rooms/search/", {"q": "a-1"})
+        self.assertEqual([room["id"] for room in response.json()["rooms"]], [self.suite.pk])
+        self.assertEqual(self.client.get("/api/rooms/search/").status_code, 400)
+
+
+class SearchMigrationTests(TransactionTestCase):
+    before = [("apps", "0007_booking_idempotency_key")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_existing_rows_are_indexed(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        old = executor.loader.project_state(self.before).apps
+        guest = old.get_model("apps", "User").objects.create(
+            username="marta.l", first_name="Marta", last_name="Lovelace"
+        )
+        room = old.get_model("apps", "Room").objects.create(
+            room_number="A-101", name="Sea View Suite", price_per_night=300, image=""
+        )
+        now = timezone.now()
+        old.get_model("apps", "Booking").objects.create(
+            user=guest, room=room, check_in=now, check_out=now + timedelta(days=2)
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        self.assertEqual(SearchDocument.objects.count(), 3)
+        self.assertEqual(search.search_rooms("sea view"), [room.pk])
+        bookings = search.filter_queryset(Booking.objects.all(), SearchDocument.BOOKING, "lovelace")
+        self.assertEqual(bookings.count(), 1)
+
+class ReplicaRoutingTests(TestCase):
+    @override_settings(REPLICA_DATABASE="replica")
+    def test_reads_stay_on_primary_after_a_write(self):
+        room = Room.objects.create(room_number="Room-1", name="Room", price_per_night=100, image="images/room.webp")
+        self.assertEqual(Room.objects.all().db, "default")
+        with replica_reads(enabled=True):
+            self.assertEqual(Room.objects.all().db, "replica")
+            Room.objects.filter(pk=room.pk).update(name="Renamed")
+            self.assertEqual(Room.objects.all().db, "default")
+
+    def test_read_only_requests(self):
+        admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+        room = Room.objects.create(room_number="Room-1", name="Room", price_per_night=100, image="images/room.webp")
+        self.client.force_login(admin)
+        for method, url, read_only in (
+            ("get", "/", True),
+            ("get", "/api/users/autocomplete/", True),
+            ("get", "/admin/apps/booking/", True),
+            ("get", f"/admin/apps/room/{room.pk}/change/", False),
+            ("get", f"/booking/?room_id={room.pk}", False),
+            ("post", "/admin/apps/room/", False),
+        ):
+            with self.subTest(method=method, url=url):
+                response = getattr(self.client, method)(url)
+                self.assertEqual(response.wsgi_request.replica_reads.enabled, read_only)
+
+
+@skipUnless(settings.REPLICA_DATABASE, "set DB_REPLICA_NAME to route requests to a replica")
+class ReplicaRequestTests(TransactionTestCase):
+    # The replica mirrors the test database but has its own connection, so
+    # rows must be committed for it to see them. Run this class on its own:
+    # TestCase data is invisible to the replica.
+    databases = {"default", "replica"} if settings.REPLICA_DATABASE else {"default"}
+
+    def test_read_only_requests_use_the_replica(self):
+        admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+        room = Room.objects.create(room_number="Room-1", name="Room", price_per_night=100, image="images/room.webp")
+        self.client.force_login(admin)
+        for url, replica in (
+            ("/", True),
+            ("/api/rooms/autocomplete/", True),
+            ("/admin/apps/room/", True),
+            (f"/admin/apps/room/{room.pk}/change/", False),
+            (f"/booking/?room_id={room.pk}", False),
+        ):
+            cache.clear()
+            with self.subTest(url=url), CaptureQueriesContext(connections["replica"]) as captured:
+                self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertEqual(bool(captured.captured_queries), replica)
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            METRICS_ENABLED=True, METRICS_DIR=directory.name, METRICS_TOKEN="scraper-token"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # The connection was opened with metrics off, so it has no query timing yet.
+        self.enterContext(connection.execute_wrapper(time_query))
+        registry.clear()
+        self.addCleanup(registry.clear)
+
+    def test_requests_are_recorded_by_route(self):
+        self.client.get("/")
+        self.client.get("/no-such-page/")
+        self.client.force_login(self.admin)
+        body = self.client.get("/metrics/").content.decode()
+        self.assertIn('http_requests_total{route="index",method="GET",status="200"} 1', body)
+        self.assertIn('http_requests_total{route="<unmatched>",method="GET",status="404"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{route="index",method="GET"} 1', body)
+        self.assertIn('db_query_duration_seconds_count{alias="default",operation="SELECT"}', body)
+        self.assertIn('template_render_duration_seconds_count{template="index.html"} 1', body)
+
+    def test_staff_or_token_only(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.assertEqual(self.client.get("/metrics/", headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        response = self.client.get("/metrics/", headers={"Authorization": "Bearer scraper-token"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+    def test_other_processes_are_added_up(self):
+        self.client.get("/")
+        with open(os.path.join(settings.METRICS_DIR, "999999-0123456789ab.json"), "w") as f:
+            json.dump({
+                "histograms": [["http_request_duration_seconds", ["index", "GET"], [1] + [0] * 11 + [0.004]]],
+                "counters": [["http_requests_total", ["index", "GET", "200"], 2]],
+            }, f)
+        registry.flush()
+        self.assertTrue(os.path.exists(registry.path()))
+        self.client.force_login(self.admin)
+        body = self.client.get("/metrics/").content.decode()
+        self.assertIn('http_requests_total{route="index",method="GET",status="200"} 3', body)
+        self.assertIn('http_request_duration_seconds_bucket{route="index",method="GET",le="+Inf"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{route="index",method="GET"} 2', body)
+
+    def test_file_names_do_not_repeat_across_processes(self):
+        name = os.path.basename(registry.path())
+        self.assertTrue(name.startswith(f"{os.getpid()}-"))
+        self.assertEqual(os.path.basename(registry.path()), name)
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            self.assertNotEqual(os.path.basename(registry.path()), name)
+
+
+class StartupTests(TestCase):
+    def test_workers_boot_without_optional_dependencies(self):
+        report = profile_startup(repeat=1)
+        self.assertEqual(report.lazy_loaded, [])
+        self.assertEqual(list(report.phases), ["settings", "apps", "middleware", "urls"])
+        self.assertIn("django", dict(report.packages()))
+
+
+@override_settings(SESSION_ENGINE="apps.sessions")
+class SessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="password123", email="admin@example.com")
+
+    def test_visitor_session_lives_in_the_cookie(self):
+        session = SessionStore()
+        session["room_id"] = 7
+        with self.assertNumQueries(0):
+            session.save()
+            self.assertEqual(SessionStore(session.session_key)["room_id"], 7)
+        self.assertEqual(SessionStore(session.session_key[:-1] + "x").load(), {})
+        self.assertFalse(Session.objects.exists())
+
+    def test_signed_in_session_is_cached_and_written_behind(self):
+        self.client.force_login(self.admin)
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertTrue(Session.objects.filter(session_key=session_key).exists())
+
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get("/admin/apps/room/")
+        self.assertFalse([query for query in captured.captured_queries if "django_session" in query["sql"]])
+
+        session = SessionStore(session_key)
+        session["theme"] = "dark"
+        with self.assertNumQueries(0):
+            session.save()
+        with override_settings(SESSION_DB_WRITE_INTERVAL=0):
+            session.save()
+        self.assertEqual(SessionStore().decode(Session.objects.get().session_data)["theme"], "dark")
+
+        self.client.logout()
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(SessionStore(session_key).load(), {})
+
+    def test_prune_sessions(self):
+        encode = SessionStore().encode
+        expires = timezone.now() + timedelta(days=1)
+        Session.objects.create(session_key="visitor", session_data=encode({"room_id": 7}), expire_date=expires)
+        Session.objects.create(session_key="staff", session_data=encode({SESSION_KEY: "1"}), expire_date=expires)
+        Session.objects.create(session_key="expired", session_data=encode({SESSION_KEY: "1"}), expire_date=timezone.now())
+
+        call_command("prune_sessions", stdout=io.StringIO())
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["staff"])
+
+
+class ReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="guest", first_name="Guest", last_name="One")
+        cls.room = Room.objects.create(room_number="Room-1", name="Room", price_per_night=100, image="images/room.webp")
+
+    def post(self, reservation_time, idempotency_key):
+        return self.client.post(
+            "/booking/",
+            {
+                "user_id": self.user.pk,
+                "room_id": self.room.pk,
+                "reservationtime": reservation_time,
+                "idempotency_key": idempotency_key,
+            },
+        )
+
+    def test_retries_are_deduplicated_and_overlaps_rejected(self):
+        stay = "03/01/2030 02:00 PM - 03/03/2030 12:00 PM"
+        self.assertEqual(self.post(stay, "first").status_code, 302)
+        queued = NotificationOutbox.objects.count()
+        self.assertEqual(self.post(stay, "first").status_code, 302)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(NotificationOutbox.objects.count(), queued)
+
+        response = self.post("03/02/2030 02:00 PM - 03/04/2030 12:00 PM", "second")
+        self.assertContains(response, "already booked", status_code=409)
+        response = self.post("04/01/2030 02:00 PM - 04/02/2030 12:00 PM", "first")
+        self.assertContains(response, "different booking", status_code=409)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    @mock.patch.dict(os.environ, {"TELEGRAM_USER_IDS": "1 2"})
+    def test_booking_query_budget(self):
+        # Lock, idempotency and overlap checks, the insert, the calendar, both rollups, the
+        # search document and the outbox rows, plus the savepoints around them.
+        with self.assertNumQueries(26):
+            response = self.post("03/01/2030 02:00 PM - 03/03/2030 12:00 PM", "budget")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["X-DB-Query-Count"], "26")
+
+    def test_closed_room_is_refused(self):
+        pricing.set_availability(Room.objects.filter(pk=self.room.pk), False)
+        check_in = timezone.make_aware(datetime(2030, 3, 1, 14))
+        with self.assertRaises(RoomClosed):
+            reserve(self.user, self.room, check_in, check_in + timedelta(days=2))
+        response = self.post("03/01/2030 02:00 PM - 03/03/2030 12:00 PM", "closed")
+        self.assertContains(response, "not available for booking", status_code=409)
+        self.assertFalse(Booking.objects.exists())
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        cache.clear()
+
+    def upload(self, width, height):
+        buffer = io.BytesIO()
+        Image.new("RGB", (width, height), "teal").save(buffer, "PNG")
+        return default_storage.save("images/room.png", ContentFile(buffer.getvalue()))
+
+    def render(self, name):
+        """Render in the background and wait for the done callbacks; the executor has one thread."""
+        future = images.schedule_derivatives(name)
+        images._executor.submit(int).result()
+        return future
+
+    def test_renditions(self):
+        name = self.upload(700, 350)
+        self.render(name)
+
+        for width in (320, 640):
+            with default_storage.open(images.derivative_name(name, width)) as f, Image.open(f) as rendition:
+                self.assertEqual((rendition.format, rendition.size), ("WEBP", (width, width // 2)))
+        self.assertFalse(default_storage.exists(images.derivative_name(name, 960)))
+        self.assertEqual(images.thumbnail_url(name, 400), default_storage.url(images.derivative_name(name, 640)))
+        self.assertEqual(images.thumbnail_url(name, 900), default_storage.url(images.derivative_name(name, 640)))
+        self.assertEqual(images.srcset(name).count("w, "), 1)
+        self.assertTrue(images.placeholder_data_uri(name).startswith("data:image/webp;base64,"))
+
+    def test_falls_back_to_the_original(self):
+        name = self.upload(200, 100)
+        self.assertEqual(images.thumbnail_url(name, 400), default_storage.url(name))
+        self.assertEqual((images.srcset(name), images.placeholder_data_uri(name)), ("", ""))
+
+        with mock.patch.object(default_storage, "exists") as exists:
+            images.thumbnail_url(name, 400)
+        exists.assert_not_called()
+
+        # Narrower than every width: only the placeholder is rendered.
+        self.render(name)
+        self.assertEqual(images.thumbnail_url(name, 400), default_storage.url(name))
+        self.assertTrue(images.placeholder_data_uri(name))
+
+    def test_failed_render_is_logged(self):
+        name = default_storage.save("images/broken.png", ContentFile(b"not an image"))
+        with self.assertLogs("apps.images", "ERROR"):
+            future = self.render(name)
+        self.assertIsInstance(future.exception(), OSError)
+
+    def test_missing_original_is_one_warning(self):
+        with self.assertLogs("apps.images", "WARNING") as logs:
+            future = self.render("images/missing.png")
+        self.assertEqual(future.result(), [])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIsNone(logs.records[0].exc_info)
+
+
+class ContentHashStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, SEED_IMAGES_DIR=os.path.join(media.name, "seed")))
+
+    def save(self, content, name="images/upload.webp", age_hours=0):
+        name = default_storage.save(name, ContentFile(content))
+        self.age(name, age_hours)
+        return name
+
+    def write(self, name, age_hours=0):
+        """Write a file under exactly ``name``, as the renderer does for renditions."""
+        with open(default_storage.path(name), "wb") as f:
+            f.write(name.encode())
+        self.age(name, age_hours)
+        return name
+
+    def age(self, name, hours):
+        if hours:
+            past = time.time() - hours * 3600
+            os.utime(default_storage.path(name), (past, past))
+
+    def collect(self, *args):
+        out = io.StringIO()
+        call_command("collect_media_garbage", *args, stdout=out)
+        return out.getvalue()
+
+    def test_identical_uploads_share_a_file(self):
+        first = self.save(b"same bytes", age_hours=5)
+        second = self.save(b"same bytes", name="images/other.WEBP")
+        self.assertEqual(first, second)
+        self.assertRegex(first, r"^images/[0-9a-f]{64}\.webp$")
+        self.assertEqual(default_storage.listdir("images"), ([], [os.path.basename(first)]))
+        # The reuse refreshed the file, so the collector treats it as a new upload.
+        self.assertGreater(os.path.getmtime(default_storage.path(first)), time.time() - 60)
+        self.assertNotEqual(self.save(b"other bytes"), first)
+
+    def test_garbage_collection(self):
+        image = self.save(b"room image", age_hours=5)
+        rendition = self.write(images.derivative_name(image, 320), age_hours=5)
+        Room.objects.create(room_number="Room-1", name="Room", price_per_night=100, image=image)
+        orphan = self.save(b"orphan", age_hours=5)
+        self.write(images.placeholder_name(orphan), age_hours=5)
+        legacy = self.write("images/6f081e70-ae10-4d5c-8e92-90ee64127db3.webp", age_hours=5)
+
+        self.assertIn("Would delete 2 files", self.collect("--dry-run"))
+        self.assertTrue(default_storage.exists(orphan))
+        self.assertIn("Deleted 2 files", self.collect())
+        self.assertEqual(
+            sorted(default_storage.listdir("images")[1]),
+            sorted(os.path.basename(name) for name in (image, rendition, legacy)),
+        )
+        self.assertIn("Deleted 1 files", self.collect("--include-legacy"))
+        self.assertFalse(default_storage.exists(legacy))
+
+    def test_seed_images_are_never_collected(self):
+        os.mkdir(settings.SEED_IMAGES_DIR)
+        seed = self.write("seed/6f081e70-ae10-4d5c-8e92-90ee64127db3.webp", age_hours=5)
+        orphan = self.save(b"orphan", age_hours=5)
+        self.assertIn("Deleted 1 files", self.collect("--directory", "", "--include-legacy"))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(seed))
+        with self.assertRaisesMessage(CommandError, "seed images"):
+            self.collect("--directory", "seed", "--include-legacy")
+
+    def test_min_age_spares_recent_uploads(self):
+        recent = self.save(b"uploaded a moment ago")
+        older = self.save(b"uploaded earlier", age_hours=2)
+        self.assertIn("Deleted 0 files", self.collect("--min-age", "3"))
+        self.assertIn("Deleted 1 files", self.collect("--min-age", "1"))
+        self.assertEqual(default_storage.listdir("images")[1], [os.path.basename(recent)])
+        self.assertFalse(default_storage.exists(older))
+
+
+class StaticServingTests(TestCase):
+    body = b"abcdefghijklmnopqrstuvwxyz"
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        for name, content in (("app.css", self.body), ("app.css.gz", b"gzip"), ("app.css.br", b"brotli")):
+            with open(os.path.join(self.root, name), "wb") as f:
+                f.write(content)
+        self.factory = RequestFactory()
+
+    def get(self, path="app.css", method="get", **headers):
+        response = serve(getattr(self.factory, method)(f"/static/{path}", headers=headers), path, self.root)
+        self.addCleanup(response.close)
+        return response
+
+    def content(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_etag_and_not_modified(self):
+        response = self.get()
+        self.assertEqual((response.status_code, self.content(response)), (200, self.body))
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+        self.assertEqual(self.get(If_None_Match=response["ETag"]).status_code, 304)
+        self.assertEqual(self.get(If_None_Match='"stale"').status_code, 200)
+        self.assertNotEqual(self.get(Accept_Encoding="gzip")["ETag"], response["ETag"])
+
+    def test_ranges(self):
+        response = self.get(Range="bytes=0-9")
+        self.assertEqual((response.status_code, self.content(response)), (206, b"abcdefghij"))
+        self.assertEqual(response["Content-Range"], "bytes 0-9/26")
+        response = self.get(Range="bytes=-4")
+        self.assertEqual((response.status_code, self.content(response)), (206, b"wxyz"))
+        response = self.get(Range="bytes=26-")
+        self.assertEqual((response.status_code, response["Content-Range"]), (416, "bytes */26"))
+        # Multiple ranges are not supported: the whole file is sent instead.
+        response = self.get(Range="bytes=0-1,4-5")
+        self.assertEqual((response.status_code, self.content(response)), (200, self.body))
+        response = self.get(Range="bytes=0-9", If_Range='"stale"')
+        self.assertEqual((response.status_code, self.content(response)), (200, self.body))
+
+    def test_precompressed_variants(self):
+        for accept_encoding, encoding, body in (
+            ("gzip, deflate, br", "br", b"brotli"),
+            ("br;q=0, gzip;q=0.5", "gzip", b"gzip"),
+            ("*", "br", b"brotli"),
+            ("*;q=0, identity", None, self.body),
+            ("gzip;q=0", None, self.body),
+            ("", None, self.body),
+        ):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get(Accept_Encoding=accept_encoding)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertEqual(self.content(response), body)
+                self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(self.get(If_None_Match=response["ETag"])["Vary"], "Accept-Encoding")
+
+    def test_immutable_hashed_names(self):
+        name = f"{'0' * 64}.webp"
+        with open(os.path.join(self.root, name), "wb") as f:
+            f.write(self.body)
+        self.assertEqual(self.get(name)["Cache-Control"], "public, max-age=31536000, immutable")
+
+    def test_only_get_and_head(self):
+        self.assertEqual(self.get(method="head").status_code, 200)
+        for method in ("post", "put", "delete"):
+            with self.subTest(method=method):
+                response = self.get(method=method)
+                self.assertEqual((response.status_code, response["Allow"]), (405, "GET, HEAD"))
+        with self.assertRaises(Http404):
+            self.get("../etc/passwd")
+
+
+class StaticBundleTests(TestCase):
+    template = (
+        '{% load bundles static %}{% bundle "site.css" %}'
+        '<link rel="stylesheet" href="{% static \'plugins/a.css\' %}">{% endbundle %}'
+    )
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(STATIC_ROOT=root.name, STATIC_BUNDLES=True))
+        self.addCleanup(read_manifest.cache_clear)
+        read_manifest.cache_clear()
+        self.root = root.name
+
+    def render(self):
+        return Template(self.template).render(Context())
+
+    def test_tag_uses_the_manifest(self):
+        os.makedirs(os.path.join(self.root, "bundles"))
+        with open(os.path.join(self.root, "bundles", "manifest.json"), "w") as f:
+            json.dump({"site.css": "bundles/site.0123456789ab.css"}, f)
+        self.assertEqual(self.render(), '<link rel="stylesheet" href="/static/bundles/site.0123456789ab.css">')
+        with self.settings(STATIC_BUNDLES=False):
+            self.assertEqual(self.render(), '<link rel="stylesheet" href="/static/plugins/a.css">')
+
+    def test_tag_falls_back_without_a_manifest(self):
+        self.assertEqual(self.render(), '<link rel="stylesheet" href="/static/plugins/a.css">')
+
+    def test_minify_css_keeps_strings(self):
+        css = """/*! License: it's MIT */
+        a::before { content: "a  /* b */ ;}" ; }
+        /* a "comment" */
+        .icon > .b , .c { background : url( "x  y.png" ) ; content: 'it\\'s' ; }"""
+        self.assertEqual(
+            minify_css(css),
+            """/*! License: it's MIT */ a::before{content: "a  /* b */ ;}"}"""
+            """.icon>.b,.c{background : url( "x  y.png" );content: 'it\\'s'}""",
+        )
+
+
+class StubResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = headers or {}
+        self.text = json.dumps(self.body)
+
+    def json(self):
+        return self.body
+
+
+class StubSession:
+    """Answer every Telegram request with ``response``, or raise ``error``."""
+
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        self.posted = []
+
+    def post(self, url, json, timeout):
+        self.posted.append(json)
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.row = NotificationOutbox.objects.create(chat_id="1", message="New reservation")
+        self.addCleanup(setattr, notifications, "_session", notifications._session)
+
+    def drain(self, **stub):
+        notifications._session = StubSession(**stub)
+        start = timezone.now()
+        result = notifications.drain_outbox(batch_size=10, workers=2)
+        self.row.refresh_from_db()
+        return result, start
+
+    def test_sent(self):
+        self.assertEqual(self.drain(response=StubResponse(200))[0], (1, 0, 0))
+        self.assertEqual(self.row.status, NotificationOutbox.SENT)
+        self.assertIsNotNone(self.row.sent_at)
+
+    def test_rate_limit_reschedules_after_retry_after(self):
+        response = StubResponse(429, {"ok": False, "parameters": {"retry_after": 30}})
+        result, start = self.drain(response=response)
+        self.assertEqual(result, (0, 1, 0))
+        self.assertEqual(self.row.status, NotificationOutbox.PENDING)
+        self.assertEqual(self.row.attempts, 1)
+        self.assertGreaterEqual(self.row.next_attempt_at, start + timedelta(seconds=30))
+        self.assertLess(self.row.next_attempt_at, start + timedelta(seconds=31))
+
+    def test_server_and_network_errors_back_off(self):
+        from requests.exceptions import ConnectionError
+
+        for attempts, stub in enumerate([{"response": StubResponse(502)}, {"error": ConnectionError("reset")}], 1):
+            NotificationOutbox.objects.filter(pk=self.row.pk).update(next_attempt_at=timezone.now())
+            result, start = self.drain(**stub)
+            self.assertEqual(result, (0, 1, 0))
+            self.assertEqual(self.row.status, NotificationOutbox.PENDING)
+            self.assertEqual(self.row.attempts, attempts)
+            self.assertLessEqual(self.row.next_attempt_at, start + timedelta(seconds=2**attempts + 1))
+            self.assertTrue(self.row.last_error)
+
+    def test_client_error_fails_permanently(self):
+        self.assertEqual(self.drain(response=StubResponse(400, {"description": "chat not found"}))[0], (0, 0, 1))
+        self.assertEqual(self.row.status, NotificationOutbox.FAILED)
+        self.assertIn("chat not found", self.row.last_error)
+        self.assertEqual(notifications.claim_batch(10), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        self.assertEqual(notifications.claim_batch(10), [self.row])
+        self.assertEqual(notifications.claim_batch(10), [])
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(notifications.claim_batch(10), [self.row])
+
+    def test_lease_covers_a_batch_of_timeouts(self):
+        # 100 rows over 8 connections take 13 rounds of connect and read timeouts at worst.
+        rounds = 13 * (notifications.CONNECT_TIMEOUT + notifications.READ_TIMEOUT)
+        self.assertGreater(notifications.claim_lease(100, 8), timedelta(seconds=rounds))
+        self.assertLess(notifications.claim_lease(8, 8), notifications.claim_lease(100, 8))
+
+    def test_expired_claim_does_not_overwrite_a_newer_one(self):
+        [stale] = notifications.claim_batch(10)
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        [current] = notifications.claim_batch(10)
+        self.assertNotEqual(stale.claim_token, current.claim_token)
+
+        with self.assertLogs("apps.notifications", "WARNING"):
+            self.assertEqual(notifications.record_results([(stale, None)]), (1, 0, 0))
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.status, NotificationOutbox.PENDING)
+
+        notifications.record_results([(current, None)])
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.status, NotificationOutbox.SENT)
+
+    @mock.patch.dict(os.environ, {"TELEGRAM_USER_IDS": "1 2"})
+    def test_rolled_back_booking_leaves_no_notification(self):
+        NotificationOutbox.objects.all().delete()
+        user = User.objects.create(username="guest", first_name="Guest", last_name="One")
+        room = Room.objects.create(room_number="Room-1", name="Room", price_per_night=100, image="images/room.webp")
+        check_in = timezone.make_aware(datetime(2030, 3, 1, 14))
+
+        def enqueue_then_fail(booking):
+            notifications.enqueue_message("New reservation")
+            self.assertEqual(NotificationOutbox.objects.count(), 2)
+            raise RuntimeError("crashed after queueing")
+
+        with self.assertRaises(RuntimeError):
+            reserve(user, room, check_in, check_in + timedelta(days=2), on_created=enqueue_then_fail)
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+class SeedingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.images = os.path.join(media.name, "seed")
+        os.mkdir(self.images)
+        Image.new("RGB", (64, 48), "teal").save(os.path.join(self.images, "room.png"))
+        User.objects.create_superuser(username="admin", password="!", email="admin@example.com")
+
+    def populate(self, *args):
+        call_command("populate_db", "--images", self.images, *args, stdout=io.StringIO())
+
+    def assertNoOverlaps(self):
+        stays = Booking.objects.order_by("room_id", "check_in").values_list("room_id", "check_in", "check_out")
+        previous_room, previous_check_out = None, None
+        for room_id, check_in, check_out in stays:
+            self.assertLess(check_in, check_out)
+            if room_id == previous_room:
+                self.assertGreaterEqual(check_in, previous_check_out)
+            previous_room, previous_check_out = room_id, check_out
+
+    def test_seeded_bookings_never_overlap(self):
+        self.populate("--users", 3, "--rooms", 4, "--bookings", 40, "--batch-size", 7)
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(Room.objects.count(), 4)
+        self.assertEqual(Booking.objects.count(), 40)
+        self.assertFalse(Booking.objects.filter(user__is_superuser=True).exists())
+        self.assertNoOverlaps()
+
+        # A second run continues every room's schedule after its last stay.
+        self.populate("--users", 0, "--rooms", 0, "--bookings", 20)
+        self.assertEqual(Booking.objects.count(), 60)
+        self.assertNoOverlaps()
+        self.assertEqual(RoomCalendar.objects.values("room_id").distinct().count(), 4)
+
+    def test_bookings_need_a_regular_user(self):
+        with self.assertRaisesMessage(CommandError, "non-superuser"):
+            self.populate("--users", 0, "--rooms", 1, "--bookings", 5)
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        seed = os.path.join(media.name, "seed")
+        self.enterContext(override_settings(SEED_IMAGES_DIR=seed))
+        os.mkdir(seed)
+        Image.new("RGB", (64, 48), "teal").save(os.path.join(seed, "room.png"))
+        self.admin = User.objects.create_superuser(username="admin", password="!", email="admin@example.com")
+
+    def test_grow_to(self):
+        rows = benchmarks.grow_to(3, 2, 30, batch_size=7)
+        self.assertEqual(rows, {"users": 3, "rooms": 2, "bookings": 30})
+        self.assertFalse(Booking.objects.filter(user=self.admin).exists())
+        for room in Room.objects.all():
+            stays = list(room.bookings.order_by("check_in").values_list("check_in", "check_out"))
+            for (_, check_out), (check_in, _) in zip(stays, stays[1:]):
+                self.assertGreaterEqual(check_in, check_out)
+
+    def test_booking_jobs_skip_superusers(self):
+        benchmarks.grow_to(3, 2, 0)
+        jobs = benchmarks.booking_jobs(50, rooms=1)
+        self.assertNotIn(self.admin.pk, {job["user_id"] for job in jobs})
+        self.assertEqual({job["room_id"] for job in jobs}, {Room.objects.order_by("id").first().pk})
+        self.assertEqual(len({job["reservationtime"][:19] for job in jobs}), 50)
+
+    def test_bench_booking_post_needs_seeded_data(self):
+        Room.objects.create(room_number="Room-1", price_per_night=Decimal("100.00"), image="")
+        with self.assertRaisesMessage(CommandError, "populate_db"):
+            call_command("bench_booking_post", "--url", "http://127.0.0.1:1", stdout=io.StringIO())
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    workers = 8
+
+    def setUp(self):
+        # The rooms' image does not exist; rendering its derivatives after the commit would only log warnings.
+        self.enterContext(mock.patch("apps.images.schedule_derivatives"))
+        self.user = User.objects.create(username="guest", first_name="Guest", last_name="One")
+        self.rooms = [
+            Room.objects.create(room_number=f"Room-{i}", name="Room", price_per_night=100, image="images/room.webp")
+            for i in range(self.workers)
+        ]
+        self.check_in = timezone.make_aware(datetime(2030, 3, 1, 14))
+        self.check_out = self.check_in + timedelta(days=2, hours=-2)
+
+    def race(self, rooms, keys):
+        """Reserve every room at once; retry ``RoomBusy`` with the same key like a client would."""
+        barrier = threading.Barrier(len(rooms))
+
+        def attempt(room, key):
+            barrier.wait()
+            try:
+                for _ in range(50):
+                    try:
+                        return reserve(self.user, room, self.check_in, self.check_out, idempotency_key=key)[1]
+                    except RoomBusy:
+                        time.sleep(0.01)
+                    except ReservationError:
+                        return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(len(rooms)) as executor:
+            return list(executor.map(attempt, rooms, keys))
+
+    def test_one_room_is_booked_once(self):
+        created = self.race([self.rooms[0]] * self.workers, [f"key-{i}" for i in range(self.workers)])
+        self.assertEqual(created.count(True), 1)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_duplicate_submissions_book_once(self):
+        created = self.race([self.rooms[0]] * self.workers, ["same"] * self.workers)
+        self.assertEqual(created.count(True), 1)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_different_rooms_all_succeed(self):
+        created = self.race(self.rooms, [f"key-{i}" for i in range(self.workers)])
+        self.assertEqual(created, [True] * self.workers)
+        self.assertEqual(Booking.objects.count(), self.workers)
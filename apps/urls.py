@@ -1,8 +1,19 @@
 from django.urls import path
 
-from apps.views import BookingView, IndexView
+from apps.views import (AvailabilityApiView, AvailabilitySearchView,
+                        BookingView, CatalogueStatsView, IndexView,
+                        MetricsView, RoomAutocompleteView, RoomCalendarApiView,
+                        RoomSearchApiView, UserAutocompleteView)
 
 urlpatterns = [
     path("", IndexView.as_view(), name="index"),
     path("booking/", BookingView.as_view(), name="booking"),
+    path("rooms/available/", AvailabilitySearchView.as_view(), name="room_availability"),
+    path("api/rooms/available/", AvailabilityApiView.as_view(), name="api_room_availability"),
+    path("api/rooms/search/", RoomSearchApiView.as_view(), name="api_room_search"),
+    path("api/rooms/<int:pk>/calendar/", RoomCalendarApiView.as_view(), name="api_room_calendar"),
+    path("api/users/autocomplete/", UserAutocompleteView.as_view(), name="api_user_autocomplete"),
+    path("api/rooms/autocomplete/", RoomAutocompleteView.as_view(), name="api_room_autocomplete"),
+    path("api/catalogue/stats/", CatalogueStatsView.as_view(), name="api_catalogue_stats"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
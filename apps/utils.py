@@ -3,6 +3,8 @@ import uuid
 from django.forms import FileInput
 from django.utils.html import format_html
 
+from apps.images import thumbnail_url
+
 
 def generate_unique_filename(instance, filename):
     extension = filename.split(".")[-1]
@@ -16,7 +18,7 @@ class ImagePreviewAdminWidget(FileInput):
         if value and hasattr(value, "url"):
             image_html = format_html(
                 '<img src="{}"style=" border:1px solid #00000040; border-radius:5px; max-width:300px; max-height:300px;" />',
-                value.url,
+                thumbnail_url(value.name, 300),
             )
             output.append(image_html)
         output.append(super().render(name, value, attrs, renderer))
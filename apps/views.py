@@ -1,38 +1,82 @@
-import os
+import hmac
+import re
+import uuid
 
-import requests
-from django.http import HttpResponseRedirect
-from django.shortcuts import get_object_or_404
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.views import View
-from django.views.generic import ListView, TemplateView
+from django.views.generic import TemplateView
 
-from apps.forms import BookingForm
-from apps.models import Booking, Room, User
+from apps import catalogue, metrics, search
+from apps.forms import AvailabilitySearchForm, BookingForm
+from apps.models import Room, SearchDocument, User
+from apps.notifications import enqueue_message
+from apps.occupancy import room_calendar_payload
+from apps.reservations import ReservationError, reserve
+
+CURSOR = re.compile(r"[0-9]{1,18}")
+# How far from the current year the room calendar API looks.
+CALENDAR_YEARS = 100
 
 
 class BasePostView(View):
-    """Parse reservation time, create reservation message, send message to Telegram, and create a booking entry in the database."""
+    """
+    Parse reservation time, create a booking entry in the database and queue the reservation message for Telegram.
+
+    The handler is async: user and room lookups use the async ORM, and the
+    booking plus its outbox rows are written in one transaction on a worker
+    thread, so an ASGI server keeps serving other requests meanwhile.
 
-    def post(self, request, *args, **kwargs):
+    Bookings go through ``apps.reservations.reserve``, which locks only the
+    requested room. The form's ``idempotency_key`` (or an ``Idempotency-Key``
+    header) makes a double-clicked or retried submission return the first
+    booking without a second notification. A reservation that cannot be made
+    re-renders the page with the reason and HTTP 409.
+    """
+
+    async def post(self, request, *args, **kwargs):
         user_id = request.POST.get("user_id")
         room_id = request.POST.get("room_id")
         reservation_time = request.POST.get("reservationtime")
+        idempotency_key = request.POST.get("idempotency_key") or request.headers.get("Idempotency-Key")
 
         check_in, check_out = self.parse_reservation_time(reservation_time)
 
-        user = get_object_or_404(User, id=user_id)
-        room = get_object_or_404(Room, id=room_id)
+        user = await aget_object_or_404(User, id=user_id)
+        room = await aget_object_or_404(Room, id=room_id)
 
         message = self.create_reservation_message(user, room, check_in, check_out)
 
-        self.send_message_to_telegram(message)
-
-        self.create_booking(user, room, check_in, check_out)
+        try:
+            await sync_to_async(self.reserve)(user, room, check_in, check_out, message, idempotency_key)
+        except ReservationError as e:
+            return self.reservation_failed(request, room, e)
 
         return HttpResponseRedirect("/")
 
+    def reserve(self, user, room, check_in, check_out, message, idempotency_key=None):
+        """Create the booking and queue its notification atomically."""
+        return reserve(
+            user,
+            room,
+            check_in,
+            check_out,
+            idempotency_key=idempotency_key,
+            on_created=lambda booking: self.send_message_to_telegram(message),
+        )
+
+    def reservation_failed(self, request, room, error):
+        messages.error(request, str(error))
+        context = self.get_context_data(selected_room=room, idempotency_key=uuid.uuid4().hex)
+        return self.render_to_response(context, status=409)
+
     def parse_reservation_time(self, reservation_time):
         """Parse the reservation time into check-in and check-out timezone-aware datetime objects."""
         check_in_str, check_out_str = reservation_time.split(" - ")
@@ -57,54 +101,211 @@ class BasePostView(View):
         )
 
     def send_message_to_telegram(self, message):
-        """Send the reservation message to Telegram."""
-        bot_token = os.environ.get("BOT_TOKEN")
-        user_ids = os.environ.get("TELEGRAM_USER_IDS").split(" ")
-
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        """Queue the reservation message in the outbox; ``send_notifications`` delivers it."""
+        enqueue_message(message)
 
-        for user_id in user_ids:
-            payload = {"chat_id": user_id, "text": message, "parse_mode": "Markdown"}
-            try:
-                response = requests.post(url, json=payload)
-                response.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                print(f"Request to Telegram API failed: {e}")
-
-    def create_booking(self, user, room, check_in, check_out):
-        """Create a booking entry in the database."""
-        booking = Booking(user=user, room=room, check_in=check_in, check_out=check_out)
-        booking.save()
 
 
 class IndexView(TemplateView):
     template_name = "index.html"
+    replica_reads = True
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(object_list=object_list, **kwargs)
-        context["rooms"] = Room.objects.order_by("-created_at")
+        context["room_grid"] = catalogue.get_room_grid()
+        context["search_form"] = AvailabilitySearchForm()
 
         return context
 
 
-class BookingView(BasePostView, ListView):
-    model = Booking
+class BookingView(BasePostView, TemplateView):
     form_class = BookingForm
     template_name = "advanced.html"
     success_url = reverse_lazy("index")
 
-    def get_context_data(self, *, object_list=None, **kwargs):
-        context = super().get_context_data(object_list=object_list, **kwargs)
-        context["users"] = User.objects.filter(is_superuser=False).order_by("-date_joined")
-        context["rooms"] = Room.objects.order_by("-created_at")
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        context["selected_room"] = await self.get_selected_room()
+        # One key per rendered form, so resubmitting it cannot book twice.
+        context["idempotency_key"] = uuid.uuid4().hex
+        return self.render_to_response(context)
 
+    async def get_selected_room(self):
         selected_room_id = self.request.GET.get("room_id")
-        context["selected_room"] = None
+        if not selected_room_id:
+            return None
+        try:
+            return await Room.objects.only("id", "name").aget(id=selected_room_id)
+        except (Room.DoesNotExist, ValueError):
+            return None
+
 
-        if selected_room_id:
-            try:
-                context["selected_room"] = Room.objects.get(id=selected_room_id)
-            except Room.DoesNotExist:
-                context["selected_room"] = None
+class AvailabilitySearchView(TemplateView):
+    """Render the room grid filtered to rooms free for the requested stay."""
+
+    template_name = "index.html"
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(object_list=object_list, **kwargs)
+        form = AvailabilitySearchForm(self.request.GET)
+        context["search_form"] = form
+        context["rooms"] = form.search() if form.is_valid() else Room.objects.none()
 
         return context
+
+
+class AvailabilityApiView(View):
+    """Return rooms free for the requested stay as JSON."""
+
+    max_results = 100
+    fields = ("id", "room_number", "name", "room_type", "price_per_night")
+
+    def get(self, request, *args, **kwargs):
+        form = AvailabilitySearchForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+
+        rooms = form.search().values(*self.fields)[: self.max_results]
+        return JsonResponse({"rooms": list(rooms)})
+
+
+class RoomSearchApiView(View):
+    """Return available rooms matching ``q`` as JSON, best match first."""
+
+    max_results = 20
+    fields = ("id", "room_number", "name", "room_type", "price_per_night")
+    replica_reads = True
+
+    def get(self, request, *args, **kwargs):
+        term = request.GET.get("q", "").strip()
+        if not term:
+            return JsonResponse({"errors": {"q": ["This field is required."]}}, status=400)
+
+        ids = search.search_rooms(term, self.max_results, using=router.db_for_read(Room))
+        rooms = {room["id"]: room for room in Room.objects.filter(pk__in=ids).values(*self.fields)}
+        return JsonResponse({"rooms": [rooms[pk] for pk in ids if pk in rooms]})
+
+
+class RoomCalendarApiView(View):
+    """Return a room's occupancy bitmaps so the date picker can disable booked nights."""
+
+    def get(self, request, pk, *args, **kwargs):
+        room = get_object_or_404(Room.objects.only("id"), pk=pk)
+        this_year = timezone.localdate().year
+        try:
+            years = [int(year) for year in request.GET.getlist("year")] or [this_year, this_year + 1]
+        except ValueError:
+            return JsonResponse({"errors": {"year": ["Enter a whole number."]}}, status=400)
+        if any(abs(year - this_year) > CALENDAR_YEARS for year in years):
+            message = f"Enter a year within {CALENDAR_YEARS} years of {this_year}."
+            return JsonResponse({"errors": {"year": [message]}}, status=400)
+
+        return JsonResponse(room_calendar_payload(room.id, years[:5]))
+
+
+class CatalogueStatsView(View):
+    """Return the room catalogue cache version and hit/miss counters to staff."""
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_staff:
+            return JsonResponse({"detail": "Staff only."}, status=403)
+
+        return JsonResponse(catalogue.get_stats())
+
+
+class MetricsView(View):
+    """
+    Serve the metrics of every worker process in the Prometheus text format.
+
+    Staff users are let in, and so is a scraper sending
+    ``Authorization: Bearer <METRICS_TOKEN>`` when that setting is set.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not (request.user.is_staff or self.has_token(request)):
+            return JsonResponse({"detail": "Staff only."}, status=403)
+
+        return HttpResponse(
+            metrics.render(*metrics.registry.collect()), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    @staticmethod
+    def has_token(request):
+        token = settings.METRICS_TOKEN
+        header = request.headers.get("Authorization", "")
+        return bool(token) and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+
+
+class AutocompleteView(View):
+    """
+    Keyset-paginated JSON search used by the select2 dropdowns.
+
+    Results are ordered newest first by primary key and each page returns the
+    cursor to pass back as ``cursor`` for the next one, so deep pages cost the
+    same as the first. A cursor that is not a whole number gets a 400.
+
+    Attributes:
+        queryset (QuerySet): Rows that may be returned; required.
+        search_kind (str): The search documents ``q`` is matched against; required.
+        fields (tuple): Columns loaded to build each result.
+        page_size (int): Number of results per page.
+        replica_reads (bool): Served from the replica database when one is configured.
+
+    Methods:
+        get_text(obj): The label shown for one result; required.
+    """
+
+    queryset = None
+    search_kind = None
+    fields = ()
+    page_size = 20
+    replica_reads = True
+    required_attributes = ("queryset", "search_kind", "get_text")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        missing = [name for name in cls.required_attributes if getattr(cls, name, None) is None]
+        if missing:
+            raise ImproperlyConfigured(f"{cls.__name__} must define {', '.join(missing)}.")
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.queryset.only("pk", *self.fields).order_by("-pk")
+
+        queryset = search.filter_queryset(queryset, self.search_kind, request.GET.get("q", ""))
+
+        cursor = request.GET.get("cursor")
+        if cursor:
+            # ASCII digits only, as str.isdigit() accepts "²", which int() rejects; 18 of them fit a 64-bit key.
+            if not CURSOR.fullmatch(cursor):
+                return JsonResponse({"errors": {"cursor": ["Enter a whole number."]}}, status=400)
+            queryset = queryset.filter(pk__lt=int(cursor))
+
+        objects = list(queryset[: self.page_size + 1])
+        more = len(objects) > self.page_size
+        objects = objects[: self.page_size]
+
+        return JsonResponse(
+            {
+                "results": [{"id": obj.pk, "text": self.get_text(obj)} for obj in objects],
+                "pagination": {"more": more},
+                "next": objects[-1].pk if more else None,
+            }
+        )
+
+
+class UserAutocompleteView(AutocompleteView):
+    queryset = User.objects.filter(is_superuser=False)
+    search_kind = SearchDocument.USER
+    fields = ("first_name", "last_name")
+
+    def get_text(self, obj):
+        return obj.full_name
+
+
+class RoomAutocompleteView(AutocompleteView):
+    queryset = Room.objects.all()
+    search_kind = SearchDocument.ROOM
+    fields = ("name", "room_number", "room_type")
+
+    def get_text(self, obj):
+        return f"{obj.name} ({obj.room_number}, {obj.room_type})"
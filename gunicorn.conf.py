@@ -0,0 +1,30 @@
+"""
+gunicorn settings, read from the working directory when the server starts.
+
+Metrics are recorded by the web server only (``METRICS_ENABLED`` is off by
+default). Each server run writes them to a directory of its own under
+``METRICS_DIR``, created before the workers start and removed when the
+master stops, so ``/metrics/`` adds up the workers of this run only and
+never the files left behind by an earlier run or another command.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault("METRICS_ENABLED", "true")
+
+_metrics_dir = None
+
+
+def on_starting(server):
+    global _metrics_dir
+    if os.environ["METRICS_ENABLED"].lower() != "true":
+        return
+    parent = os.environ.get("METRICS_DIR") or tempfile.gettempdir()
+    os.makedirs(parent, exist_ok=True)
+    _metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="room-metrics-", dir=parent)
+
+
+def on_exit(server):
+    if _metrics_dir:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
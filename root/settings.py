@@ -1,11 +1,14 @@
 import os
+import tempfile
 from pathlib import Path
 
-from dotenv import load_dotenv
-
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-load_dotenv()
+# Containers get their environment from the orchestrator; only import python-dotenv for a local .env file.
+if (BASE_DIR / ".env").exists():
+    from dotenv import load_dotenv
+
+    load_dotenv(BASE_DIR / ".env")
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
 DEBUG = bool(os.environ.get("DEBUG", default="False").lower() == "true")
@@ -24,6 +27,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apps.middleware.MetricsMiddleware",
+    "apps.middleware.QueryCountMiddleware",
+    "apps.middleware.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -33,11 +39,23 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+QUERY_COUNT_WARNING = int(os.environ.get("QUERY_COUNT_WARNING", 50))
+
+# Request, query, template and outbound HTTP timings, served to staff at /metrics/. Off by default, so that
+# tests and management commands record nothing; gunicorn.conf.py turns them on for the web server.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() == "true"
+# Each process writes its totals here every METRICS_FLUSH_INTERVAL seconds; /metrics/ adds them up.
+# gunicorn.conf.py replaces it with a directory of its own for every server run.
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "room-metrics"))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+# Lets a Prometheus scraper in with "Authorization: Bearer <token>"; staff users are always let in.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
 ROOT_URLCONF = "root.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "apps.metrics.DjangoTemplates",
         "DIRS": [BASE_DIR / 'templates']
         ,
         "APP_DIRS": True,
@@ -62,9 +80,77 @@ DATABASES = {
         "PASSWORD": os.environ.get("DB_PASS"),
         "HOST": os.environ.get("DB_HOST"),
         "PORT": os.environ.get("DB_PORT"),
+        # Keep connections open between requests and ping them before reuse.
+        # Set DB_CONN_MAX_AGE=0 under ASGI and pool with PgBouncer instead.
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.environ.get("DB_CONN_HEALTH_CHECKS", "true").lower() == "true",
+        # Required behind PgBouncer in transaction pooling mode.
+        "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DB_DISABLE_SERVER_SIDE_CURSORS", "false").lower() == "true",
     }
 }
 
+# Optional read replica; unset DB_REPLICA_* fall back to the primary's values.
+if os.environ.get("DB_REPLICA_HOST") or os.environ.get("DB_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ.get("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "USER": os.environ.get("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.environ.get("DB_REPLICA_PASS", DATABASES["default"]["PASSWORD"]),
+        "HOST": os.environ.get("DB_REPLICA_HOST", DATABASES["default"]["HOST"]),
+        "PORT": os.environ.get("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+REPLICA_DATABASE = "replica" if "replica" in DATABASES else None
+# Milliseconds a reservation waits for another one holding the same room.
+RESERVATION_LOCK_TIMEOUT = int(os.environ.get("RESERVATION_LOCK_TIMEOUT", 2000))
+# Days after check-out before ``archive_bookings`` moves a booking to the archive.
+BOOKING_RETENTION_DAYS = int(os.environ.get("BOOKING_RETENTION_DAYS", 365))
+DATABASE_ROUTERS = ["apps.routers.PrimaryReplicaRouter"]
+
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", ""),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", os.path.join(BASE_DIR, "cache")),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379"),
+}
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[os.environ.get("CACHE_BACKEND", "locmem")]
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.environ.get("CACHE_LOCATION", CACHE_LOCATION),
+    }
+}
+# Server-side sessions must be visible to every worker process, so a
+# per-process memory cache is replaced by files shared on the host.
+CACHES["sessions"] = CACHES["default"]
+if CACHE_BACKEND == CACHE_BACKENDS["locmem"][0]:
+    CACHES["sessions"] = {
+        "BACKEND": CACHE_BACKENDS["file"][0],
+        "LOCATION": os.environ.get("SESSION_CACHE_LOCATION", os.path.join(tempfile.gettempdir(), "room-sessions")),
+    }
+
+# Small values every worker process must agree on, such as the catalogue
+# version (apps.catalogue), use files too when the default cache is per process.
+CACHES["shared"] = CACHES["default"]
+if CACHE_BACKEND == CACHE_BACKENDS["locmem"][0]:
+    CACHES["shared"] = {
+        "BACKEND": CACHE_BACKENDS["file"][0],
+        "LOCATION": os.environ.get("SHARED_CACHE_LOCATION", os.path.join(tempfile.gettempdir(), "room-shared")),
+    }
+
+# "hybrid" keeps visitors' sessions in a signed cookie and signed-in users'
+# sessions in the cache with a periodic database copy (apps.sessions);
+# "cookie", "cache" and "db" select Django's own backends.
+SESSION_ENGINES = {
+    "hybrid": "apps.sessions",
+    "cookie": "django.contrib.sessions.backends.signed_cookies",
+    "cache": "django.contrib.sessions.backends.cached_db",
+    "db": "django.contrib.sessions.backends.db",
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get("SESSION_MODE", "hybrid")]
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_DB_WRITE_INTERVAL = int(os.environ.get("SESSION_DB_WRITE_INTERVAL", 300))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -92,9 +178,21 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "static")  # noqa
+STATIC_BUNDLES = os.environ.get("STATIC_BUNDLES", str(not DEBUG)).lower() == "true"
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")  # noqa
+# Sample room images for populate_db and the benchmarks, kept apart from the uploads collect_media_garbage sweeps.
+SEED_IMAGES_DIR = os.path.join(MEDIA_ROOT, "seed")
+
+STORAGES = {
+    "default": {
+        "BACKEND": "apps.storage.ContentHashStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 JAZZMIN_SETTINGS = {
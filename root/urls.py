@@ -1,23 +1,12 @@
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, re_path, include
-from django.views.static import serve
+from django.urls import include, path, re_path
 
+from apps.serving import serve
 from root.settings import MEDIA_ROOT, MEDIA_URL, STATIC_ROOT, STATIC_URL
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("apps.urls")),
-
-]
-urlpatterns += static(MEDIA_URL, document_root=MEDIA_ROOT)
-urlpatterns += static(STATIC_URL, document_root=STATIC_ROOT)
-urlpatterns += [
-    re_path(
-        r"^media/(?P<path>.*)$",
-        serve,
-        {
-            "document_root": MEDIA_ROOT,
-        },
-    ),
+    re_path(rf"^{MEDIA_URL.lstrip('/')}(?P<path>.*)$", serve, {"document_root": MEDIA_ROOT}),
+    re_path(rf"^{STATIC_URL.lstrip('/')}(?P<path>.*)$", serve, {"document_root": STATIC_ROOT}),
 ]